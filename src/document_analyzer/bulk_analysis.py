@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentException
+from utils.config_loader import load_config
+from src.document_analyzer.data_ingestion import extract_pdf_text
+from src.document_analyzer.data_analysis import DocumentAnalyzer
+from utils.admission import Priority
+
+
+class BulkDocumentAnalyzer:
+    """
+    Runs text extraction and Metadata analysis over a directory or manifest of PDFs.
+    Results stream to a JSONL file that doubles as the checkpoint: a restarted run skips
+    every document already recorded with status "ok" and retries the failed ones.
+    """
+
+    def __init__(self, output_path: str, concurrency: Optional[int] = None, extraction_workers: Optional[int] = None, analyzer: Optional[DocumentAnalyzer] = None):
+        try:
+            self.log = CustomLogger().get_logger(__name__)
+            settings = load_config().get("bulk_analysis", {}) or {}
+            self.output_path = Path(output_path)
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.concurrency = concurrency or settings.get("concurrency", 8)
+            self.extraction_workers = extraction_workers or settings.get("extraction_workers", os.cpu_count())
+            self.fsync_every = settings.get("fsync_every", 50)
+            self.analyzer = analyzer or DocumentAnalyzer()
+            self.run_id = f"bulk_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            self.log.info("BulkDocumentAnalyzer initialized", output=str(self.output_path), concurrency=self.concurrency, run_id=self.run_id)
+        except Exception as e:
+            self.log.error("Error initializing BulkDocumentAnalyzer", error=str(e))
+            raise DocumentException("Error initializing BulkDocumentAnalyzer", sys)
+
+    @staticmethod
+    def collect_inputs(source: str) -> list[Path]:
+        """
+        A directory is searched recursively for PDFs. A manifest is JSONL ({"path": ...} per line)
+        or plain text with one path per line.
+        """
+        source_path = Path(source)
+        if source_path.is_dir():
+            return sorted(p for p in source_path.rglob("*") if p.suffix.lower() == ".pdf")
+        paths = []
+        for line in source_path.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            paths.append(Path(json.loads(line)["path"] if line.startswith("{") else line))
+        return paths
+
+    @staticmethod
+    def document_key(path: Path) -> str:
+        # Cheap identity: a file replaced in place gets a new key and is analyzed again
+        stat = path.stat()
+        return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _records(self):
+        """
+        Yield every complete record in the output file, skipping a torn line left by a crash.
+        """
+        if not self.output_path.exists():
+            return
+        with open(self.output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+    def _completed_keys(self) -> set[str]:
+        return {record["key"] for record in self._records() if record.get("status") == "ok"}
+
+    def _truncate_torn_tail(self):
+        """
+        Cut a partial last line written before a crash, so the next appended record starts on
+        its own line instead of being glued onto the fragment.
+        """
+        if not self.output_path.exists():
+            return
+        with open(self.output_path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Scan back in blocks for the last newline
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            f.truncate(end)
+            self.log.warning("Torn last record removed from bulk output", output=str(self.output_path), bytes_removed=size - end)
+
+    def _process(self, extraction_pool: ProcessPoolExecutor, path: Path, key: str) -> dict:
+        start = time.perf_counter()
+        record = {"key": key, "path": str(path), "run_id": self.run_id}
+        try:
+            text, pages = extraction_pool.submit(extract_pdf_text, str(path)).result()
+            record.update(pages=pages, metadata=self.analyzer.analyze_document(text, session_id=self.run_id, priority=Priority.BATCH), status="ok")
+        except Exception as e:
+            record.update(status="error", error=str(e)[:500])
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return record
+
+    def run(self, source: str) -> dict:
+        """
+        Analyze every pending document with at most `concurrency` in flight. Returns run counts.
+        """
+        try:
+            inputs = self.collect_inputs(source)
+            completed = self._completed_keys()
+            pending = []
+            for path in inputs:
+                try:
+                    key = self.document_key(path)
+                except FileNotFoundError:
+                    self.log.warning("Listed document not found", path=str(path))
+                    continue
+                if key not in completed:
+                    pending.append((path, key))
+            self.log.info("Bulk analysis started", total=len(inputs), already_done=len(inputs) - len(pending), pending=len(pending), run_id=self.run_id)
+
+            counts = {"ok": 0, "error": 0, "skipped": len(inputs) - len(pending)}
+            self._truncate_torn_tail()
+            queue = iter(pending)
+            with ProcessPoolExecutor(max_workers=self.extraction_workers) as extraction_pool, \
+                    ThreadPoolExecutor(max_workers=self.concurrency) as analysis_pool, \
+                    open(self.output_path, "a", encoding="utf-8") as out:
+                in_flight = set()
+
+                def submit_next() -> bool:
+                    item = next(queue, None)
+                    if item is None:
+                        return False
+                    in_flight.add(analysis_pool.submit(self._process, extraction_pool, *item))
+                    return True
+
+                # Keep a bounded window of work queued so memory stays flat for huge manifests
+                while len(in_flight) < self.concurrency * 2 and submit_next():
+                    pass
+                written = 0
+                while in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record = future.result()
+                        out.write(json.dumps(record, default=str) + "\n")
+                        out.flush()
+                        written += 1
+                        if written % self.fsync_every == 0:
+                            os.fsync(out.fileno())
+                        counts[record["status"]] += 1
+                        if record["status"] == "error":
+                            self.log.warning("Document analysis failed", path=record["path"], error=record["error"])
+                        submit_next()
+                os.fsync(out.fileno())
+
+            self.log.info("Bulk analysis finished", run_id=self.run_id, **counts)
+            return counts
+        except Exception as e:
+            self.log.error("Error running bulk analysis", error=str(e))
+            raise DocumentException("Error running bulk analysis", sys)
+
+    def results_frame(self) -> pd.DataFrame:
+        """
+        The latest successful record per document, with Metadata fields flattened into columns.
+        """
+        records = [r for r in self._records() if r.get("status") == "ok"]
+        if not records:
+            return pd.DataFrame(columns=["key", "path", "run_id", "pages", "status", "seconds"])
+        df = pd.DataFrame(records).drop_duplicates("key", keep="last").reset_index(drop=True)
+        metadata = pd.json_normalize(df.pop("metadata").tolist())
+        return pd.concat([df, metadata], axis=1)
+
+    def export_parquet(self, parquet_path: str) -> str:
+        """
+        Write `results_frame()` to Parquet (pyarrow engine); an output with no successes writes an empty file.
+        """
+        try:
+            df = self.results_frame()
+            df.to_parquet(parquet_path, index=False, engine="pyarrow")
+            self.log.info("Bulk results exported", parquet=parquet_path, rows=len(df))
+            return parquet_path
+        except Exception as e:
+            self.log.error("Error exporting bulk results", error=str(e))
+            raise DocumentException("Error exporting bulk results", sys)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract Metadata for a directory or manifest of PDFs.")
+    parser.add_argument("source", help="Directory of PDFs, or a JSONL/text manifest of paths")
+    parser.add_argument("--output", default="data/bulk_analysis/results.jsonl")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--parquet", default=None, help="Also export results to this Parquet file")
+    args = parser.parse_args()
+
+    bulk = BulkDocumentAnalyzer(args.output, concurrency=args.concurrency)
+    print(bulk.run(args.source))
+    if args.parquet:
+        bulk.export_parquet(args.parquet)
@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Optional
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentException
@@ -7,6 +8,9 @@ from model.models import *
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.output_parsers import OutputFixingParser
 from prompt.prompt_library import PROMPT_REGISTRY
+from utils.instrumentation import span, traced
+from utils.structured_output import bind_native_json, parse_structured_output
+from utils.admission import admit, estimate_prompt_tokens, Priority
 
 class DocumentAnalyzer:
     """
@@ -22,6 +26,7 @@ class DocumentAnalyzer:
 
             self.parser = JsonOutputParser(pydantic_object=Metadata)
             self.fixing_parser = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
+            self.structured_llm = bind_native_json(self.llm, Metadata)
 
             self.prompt = PROMPT_REGISTRY["document_analysis"]
             self.log.info("Document Analyzer initialized successfully")
@@ -30,19 +35,31 @@ class DocumentAnalyzer:
             self.log.error("Error initializing DocumentAnalyzer", {e})
             raise DocumentException("Failed to initialize DocumentAnalyzer", sys) 
 
-    def analyze_document(self, document_text: str) -> dict:
+    def analyze_document(self, document_text: str, session_id: Optional[str] = None, tenant_id: Optional[str] = None,
+                         priority: Priority = Priority.ANALYSIS) -> dict:
         """
         Analyzes the document and returns the extracted metadata and summary.
+        The call waits for admission under `tenant_id` (default: the shared default tenant) before reaching the provider.
         """
         try:
-            chain = self.prompt | self.llm | self.fixing_parser
+            chain = self.prompt | traced("analysis.llm", self.structured_llm, session_id=session_id)
             self.log.info("Meta data analysis chain initalized.")
-            response = chain.invoke({
+            inputs = {
                 "format_instructions": self.parser.get_format_instructions(),
                 "document_text": document_text
-            })
+            }
+            with admit(tenant_id, priority, estimate_prompt_tokens(inputs)):
+                with span("analysis.invoke", session_id=session_id):
+                    message = chain.invoke(inputs)
+                    response = self._parse(message)
             self.log.info("Meta data extraction successful.", keys=list(response.keys()))
             return response
         except Exception as e:
             self.log.error("Error analyzing document: %s", e)
             raise DocumentException("Failed to analyze document", sys)
+
+    def _parse(self, message) -> dict:
+        """
+        Validate the LLM output against Metadata, repairing it locally before paying for the OutputFixingParser.
+        """
+        return parse_structured_output(message.content, Metadata, self.fixing_parser, chain="analysis")
@@ -4,9 +4,20 @@ print(">>> Running with Python:", sys.executable)
 import os
 import uuid
 from datetime import datetime
-import fitz  # PyMuPDF for PDF reading
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentException
+from utils.session_gc import touch_session, session_lease
+from utils.instrumentation import span
+from utils.page_cache import cached_pages
+
+
+def extract_pdf_text(pdf_path: str) -> tuple[str, int]:
+    """
+    Extract page-delimited text from a PDF. Returns the text and the page count.
+    Pages come from the parsed-page cache when this file content was seen before.
+    """
+    text_chunks = [f"\n--- Page {page_num + 1} ---\n{text}" for page_num, text in enumerate(cached_pages(pdf_path))]
+    return "\n".join(text_chunks), len(text_chunks)
 
 
 class DocumentHandler:
@@ -24,6 +35,7 @@ class DocumentHandler:
             # create session directory
             self.session_path = os.path.join(self.data_dir, self.session_id)
             os.makedirs(self.session_path, exist_ok=True)
+            touch_session(self.session_path)
             self.log.info(f"PDFHandler initialized", session_id=self.session_id, session_path=self.session_path)
 
         except Exception as e:
@@ -36,7 +48,7 @@ class DocumentHandler:
             if not filename.lower().endswith(".pdf"):
                 raise ValueError("Invalid file type. Only PDFs are allowed.")
             save_path = os.path.join(self.session_path, filename)
-            with open(save_path, "wb") as f:
+            with session_lease(self.session_path), open(save_path, "wb") as f:
                 if hasattr(uploaded_file, "read"):
                     f.write(uploaded_file.read())
                 else:
@@ -49,13 +61,10 @@ class DocumentHandler:
 
     def read_pdf(self, pdf_path: str) -> str:
         try:
-            text_chunks = []
-            with fitz.open(pdf_path) as doc:
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text_chunks.append(f"\n--- Page {page_num + 1} ---\n{page.get_text()}")  # type: ignore
-            text = "\n".join(text_chunks)
-            self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=len(text_chunks))
+            with span("analysis.read_pdf", session_id=self.session_id) as s, session_lease(self.session_path):
+                text, pages = extract_pdf_text(pdf_path)
+                s.record(chunks=pages)
+            self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=pages)
             return text
         except Exception as e:
             self.log.error("Failed to read PDF", error=str(e), pdf_path=pdf_path, session_id=self.session_id)
@@ -1,10 +1,14 @@
 from datetime import datetime, timezone
 import sys
 from pathlib import Path
-import fitz
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentException
 from typing import Optional
+from utils.session_gc import touch_session, session_lease
+from utils.config_loader import load_config
+from utils.instrumentation import span
+from utils.page_cache import cached_pages
+from src.document_compare.visual_diff import VisualDiffer
 import shutil
 import uuid
 
@@ -15,6 +19,7 @@ class DocumentIngestion:
         self.session_id = session_id or f"session_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         self.session_path = self.base_dir / self.session_id
         self.session_path.mkdir(parents=True, exist_ok=True)
+        touch_session(self.session_path)
         self.log.info("DocumentComparator initialized", session_path=str(self.session_path))
 
     def save_uploaded_files(self, reference_file, actual_file):
@@ -24,14 +29,15 @@ class DocumentIngestion:
         try:
             ref_path = self.session_path / reference_file.name
             act_path = self.session_path / actual_file.name
-            for fobj, out in ((reference_file, ref_path), (actual_file, act_path)):
-                if not fobj.name.lower().endswith(".pdf"):
-                    raise ValueError("Only PDF files are allowed.")
-                with open(out, "wb") as f:
-                    if hasattr(fobj, "read"):
-                        f.write(fobj.read())
-                    else:
-                        f.write(fobj.getbuffer())
+            with session_lease(self.session_path):
+                for fobj, out in ((reference_file, ref_path), (actual_file, act_path)):
+                    if not fobj.name.lower().endswith(".pdf"):
+                        raise ValueError("Only PDF files are allowed.")
+                    with open(out, "wb") as f:
+                        if hasattr(fobj, "read"):
+                            f.write(fobj.read())
+                        else:
+                            f.write(fobj.getbuffer())
             self.log.info("Files saved", reference=str(ref_path), actual=str(act_path), session=self.session_id)
             return ref_path, act_path
         
@@ -42,18 +48,17 @@ class DocumentIngestion:
     def read_pdf(self, pdf_path: Path) -> str:
         """
         Read the PDF file and extracts the text from each page.
+        A baseline compared before is served from the parsed-page cache instead of being re-parsed.
         """
         try:
-            with fitz.open(pdf_path) as doc:
-                if doc.is_encrypted:
-                    raise ValueError(f"PDF is encrypted: {pdf_path.name}")
+            with span("compare.read_pdf") as s:
                 all_text = []
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text = page.get_text()
-
+                page_count = 0
+                for page_num, text in enumerate(cached_pages(pdf_path)):
+                    page_count += 1
                     if text.strip():
                         all_text.append(f"\n----Page {page_num + 1}----\n{text}")
+                s.record(chunks=page_count)
                 self.log.info("PDF read successfully.", file = str(pdf_path), pages=len(all_text))
                 return "\n".join(all_text)
         except Exception as e:
@@ -63,10 +68,11 @@ class DocumentIngestion:
     def combine_documents(self) -> str:
         try:
             doc_parts = []
-            for file in sorted(self.session_path.iterdir()):
-                if file.is_file() and file.suffix.lower() == ".pdf":
-                    content = self.read_pdf(file)
-                    doc_parts.append(f"Document: {file.name}\n{content}")
+            with span("compare.combine", session_id=self.session_id), session_lease(self.session_path):
+                for file in sorted(self.session_path.iterdir()):
+                    if file.is_file() and file.suffix.lower() == ".pdf":
+                        content = self.read_pdf(file)
+                        doc_parts.append(f"Document: {file.name}\n{content}")
             combined_text = "\n\n".join(doc_parts)
             self.log.info("Documents combined", count=len(doc_parts), session=self.session_id)
             return combined_text
@@ -76,9 +82,50 @@ class DocumentIngestion:
             raise DocumentException("Error combining documents", sys)
         
         
+    def combine_changed_documents(self, reference_path: Optional[Path] = None, actual_path: Optional[Path] = None) -> tuple[str, list[int]]:
+        """
+        Like combine_documents, but only pages flagged by the visual pre-pass are included, each
+        with the reason it was flagged. Returns the text and the page numbers confirmed unchanged.
+        Without explicit paths the session's two PDFs are taken in sorted order.
+        """
+        try:
+            with span("compare.combine_changed", session_id=self.session_id), session_lease(self.session_path):
+                if reference_path is None or actual_path is None:
+                    pdfs = sorted(f for f in self.session_path.iterdir() if f.is_file() and f.suffix.lower() == ".pdf")
+                    if len(pdfs) != 2:
+                        raise ValueError(f"Expected 2 PDFs in session, found {len(pdfs)}")
+                    reference_path, actual_path = pdfs
+                settings = load_config().get("visual_diff", {}) or {}
+                differ = VisualDiffer(
+                    dpi=settings.get("dpi", 36),
+                    hash_size=settings.get("hash_size", 8),
+                    hamming_threshold=settings.get("hamming_threshold", 4),
+                    brightness_tolerance=settings.get("brightness_tolerance", 4.0),
+                )
+                diffs, ref_texts, act_texts = differ.diff(reference_path, actual_path)
+
+            changed = [d for d in diffs if d.changed]
+            unchanged_pages = [d.page for d in diffs if not d.changed]
+            doc_parts = []
+            for path, texts in ((reference_path, ref_texts), (actual_path, act_texts)):
+                content = []
+                for d in changed:
+                    if d.page <= len(texts):
+                        note = f"[Flagged: {'; '.join(d.reasons)}]\n"
+                        content.append(f"\n----Page {d.page}----\n{note}{texts[d.page - 1]}")
+                if content:
+                    doc_parts.append(f"Document: {Path(path).name}\n" + "\n".join(content))
+            combined_text = "\n\n".join(doc_parts)
+            self.log.info("Changed pages combined", changed=len(changed), unchanged=len(unchanged_pages), session=self.session_id)
+            return combined_text, unchanged_pages
+
+        except Exception as e:
+            self.log.error(f"Error combining changed pages: {e}")
+            raise DocumentException("Error combining changed pages", sys)
+
     def clean_old_sessions(self, keep_latest: int = 3):
         try:
-            sessions = sorted([f for f in self.base_dir.iterdir() if f.is_dir()], reverse=True)
+            sessions = sorted([f for f in self.base_dir.iterdir() if f.is_dir() and not f.name.startswith(".")], reverse=True)
             for folder in sessions[keep_latest:]:
                 shutil.rmtree(folder, ignore_errors=True)
                 self.log.info("Old session folder deleted", path=str(folder))
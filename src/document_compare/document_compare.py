@@ -1,4 +1,5 @@
 import sys
+from typing import Optional
 from dotenv import load_dotenv
 import pandas as pd
 from logger.custom_logger import CustomLogger
@@ -8,6 +9,9 @@ from prompt.prompt_library import PROMPT_REGISTRY
 from utils.model_loader import ModelLoader
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.output_parsers import OutputFixingParser
+from utils.instrumentation import span, traced
+from utils.structured_output import bind_native_json, parse_structured_output
+from utils.admission import admit, estimate_prompt_tokens, Priority
 
 class DocumentCompareLLM:
     def __init__(self):
@@ -18,24 +22,50 @@ class DocumentCompareLLM:
         self.parser = JsonOutputParser(pydantic_object=SummaryResponse)
         self.fixing_parser = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
         self.prompt = PROMPT_REGISTRY[PromptType.DOCUMENT_COMPARISON.value]
-        self.chain = self.prompt | self.llm | self.fixing_parser
+        self.chain = self.prompt | traced("compare.llm", bind_native_json(self.llm, SummaryResponse))
         self.log.info("DocumentCompareLLM initialized with model and parser.")
 
-    def compare_documents(self, combined_docs: str) -> pd.DataFrame:
+    def compare_documents(self, combined_docs: str, session_id: Optional[str] = None, unchanged_pages: Optional[list[int]] = None,
+                          tenant_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Compare the combined document text. `unchanged_pages` (from the visual pre-pass) are reported
+        as NO CHANGE without being sent to the LLM; when nothing is left to compare the LLM is skipped.
+        Comparisons are batch work: they queue behind chat turns for admission under `tenant_id` (default: the shared default tenant).
+        """
         try:
-            inputs = {
-                "combined_docs": combined_docs,
-                "format_instruction": self.parser.get_format_instructions()
-            }
+            unchanged_pages = unchanged_pages or []
+            response = []
+            if combined_docs.strip():
+                inputs = {
+                    "combined_docs": combined_docs,
+                    "format_instruction": self.parser.get_format_instructions()
+                }
 
-            self.log.info("Invoking document comparison LLM chain")
-            response = self.chain.invoke(inputs)
-            self.log.info("Chain invoked successfully", response_preview=str(response)[:200])
+                self.log.info("Invoking document comparison LLM chain")
+                with admit(tenant_id, Priority.BATCH, estimate_prompt_tokens(inputs)):
+                    with span("compare.invoke", session_id=session_id):
+                        message = self.chain.invoke(inputs)
+                        response = self._parse(message)
+                self.log.info("Chain invoked successfully", response_preview=str(response)[:200])
+            else:
+                self.log.info("No flagged pages, skipping comparison LLM", unchanged_pages=len(unchanged_pages))
+
+            if unchanged_pages:
+                skipped = {str(p) for p in unchanged_pages}
+                response = [row for row in response if str(row.get("Page")) not in skipped]
+                response += [{"Page": str(p), "changes": "NO CHANGE"} for p in unchanged_pages]
+                response.sort(key=lambda row: int(row["Page"]) if str(row["Page"]).isdigit() else 0)
             return self._format_response(response)
         except Exception as e:
             self.log.error("Error in compare_documents", error=str(e))
             raise DocumentException("Error comparing documents", sys)
 
+    def _parse(self, message) -> list[dict]:
+        """
+        Validate the LLM output against SummaryResponse, repairing it locally before paying for the OutputFixingParser.
+        """
+        return parse_structured_output(message.content, SummaryResponse, self.fixing_parser, chain="compare")
+
     def _format_response(self, response_parsed: list[dict]) -> pd.DataFrame: #type: ignore
         try:
             df = pd.DataFrame(response_parsed)
@@ -0,0 +1,180 @@
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+import fitz
+import numpy as np
+from logger.custom_logger import CustomLogger
+from utils.document_loaders import get_process_pool
+from utils.instrumentation import span
+from utils.page_cache import cached_pages
+
+log = CustomLogger().get_logger(__name__)
+
+# Pages per process-pool task; small enough to spread one long PDF over every worker
+_PAGES_PER_TASK = 16
+
+
+def _downsample(gray: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    # Area average onto a rows x cols grid
+    height, width = gray.shape
+    if height < rows or width < cols:
+        gray = np.kron(gray, np.ones((rows, cols)))
+        height, width = gray.shape
+    row_edges = np.linspace(0, height, rows + 1, dtype=int)
+    col_edges = np.linspace(0, width, cols + 1, dtype=int)
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float64), row_edges[:-1], axis=0), col_edges[:-1], axis=1)
+    return sums / np.outer(np.diff(row_edges), np.diff(col_edges))
+
+
+def dhash(gray: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Difference hash of a grayscale image: one bit per horizontally adjacent pair of cells that
+    gets brighter on a hash_size x (hash_size + 1) thumbnail.
+    """
+    small = _downsample(gray, hash_size, hash_size + 1)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return sum(1 << i for i, bit in enumerate(bits) if bit)
+
+
+def thumbnail(gray: np.ndarray, size: int = 16) -> bytes:
+    """
+    Coarse brightness grid. dHash only sees gradients, so it misses large uniform fills and
+    redactions; the thumbnail catches those.
+    """
+    return _downsample(gray, size, size).astype(np.uint8).tobytes()
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _pixmap_gray(pix: fitz.Pixmap) -> np.ndarray:
+    if pix.n - pix.alpha != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    elif pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def text_digest(text: str) -> str:
+    # Whitespace-insensitive, so reflowed but identical text is not a change
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def _fingerprint_pages(path: str, page_numbers: list[int], dpi: int, hash_size: int) -> list[dict]:
+    """
+    Worker: rendered-page hash, thumbnail and embedded-image hashes for the given 0-based pages.
+    """
+    fingerprints = []
+    with fitz.open(path) as doc:
+        image_cache: dict[int, int] = {}
+        for page_num in page_numbers:
+            if page_num >= doc.page_count:
+                break
+            page = doc.load_page(page_num)
+            gray = _pixmap_gray(page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False))
+            image_hashes = []
+            for image in page.get_images(full=True):
+                xref = image[0]
+                if xref not in image_cache:
+                    try:
+                        image_cache[xref] = dhash(_pixmap_gray(fitz.Pixmap(doc, xref)), hash_size)
+                    except Exception:
+                        continue  # unsupported colorspace or broken stream: the page hash still covers it
+                image_hashes.append(image_cache[xref])
+            fingerprints.append({
+                "page": page_num + 1,
+                "page_hash": dhash(gray, hash_size),
+                "thumbnail": thumbnail(gray),
+                "image_hashes": sorted(image_hashes),
+            })
+    return fingerprints
+
+
+def fingerprint_pdf(path: str, dpi: int = 36, hash_size: int = 8, pages: Optional[list[int]] = None) -> list[dict]:
+    """
+    Render and fingerprint the given 0-based pages of a PDF (all pages by default), spreading
+    page batches over the shared process pool.
+    """
+    if pages is None:
+        with fitz.open(path) as doc:
+            pages = list(range(doc.page_count))
+    batches = [pages[i:i + _PAGES_PER_TASK] for i in range(0, len(pages), _PAGES_PER_TASK)]
+    if len(batches) <= 1:
+        return _fingerprint_pages(path, pages, dpi, hash_size)
+    futures = [get_process_pool().submit(_fingerprint_pages, path, batch, dpi, hash_size) for batch in batches]
+    return [fp for future in futures for fp in future.result()]
+
+
+@dataclass
+class PageDiff:
+    page: int
+    changed: bool
+    reasons: list[str] = field(default_factory=list)
+
+
+class VisualDiffer:
+    """
+    Cheap pre-pass for document comparison. A page is confirmed unchanged only when its text is
+    identical and its rendering and embedded images are within `hamming_threshold` bits of the
+    reference page (with a coarse brightness check for fills that hashes miss); anything else is flagged for the LLM, with the visual reason attached.
+    Page text comes from the parsed-page cache, and only pages whose text matches are rendered.
+    """
+
+    def __init__(self, dpi: int = 36, hash_size: int = 8, hamming_threshold: int = 4, brightness_tolerance: float = 4.0):
+        self.dpi = dpi
+        self.hash_size = hash_size
+        self.hamming_threshold = hamming_threshold
+        self.brightness_tolerance = brightness_tolerance
+
+    def _compare_rendering(self, page: int, ref: dict, act: dict) -> PageDiff:
+        reasons = []
+        distance = hamming(ref["page_hash"], act["page_hash"])
+        if distance > self.hamming_threshold:
+            reasons.append(f"page rendering differs ({distance} of {self.hash_size * self.hash_size} hash bits)")
+        else:
+            ref_thumb = np.frombuffer(ref["thumbnail"], dtype=np.uint8).astype(np.int16)
+            act_thumb = np.frombuffer(act["thumbnail"], dtype=np.uint8).astype(np.int16)
+            shift = float(np.abs(ref_thumb - act_thumb).mean())
+            if shift > self.brightness_tolerance:
+                reasons.append(f"page shading differs (mean shift {shift:.1f}/255)")
+        if len(ref["image_hashes"]) != len(act["image_hashes"]):
+            reasons.append(f"embedded images {len(ref['image_hashes'])} -> {len(act['image_hashes'])}")
+        else:
+            changed_images = sum(hamming(a, b) > self.hamming_threshold for a, b in zip(ref["image_hashes"], act["image_hashes"]))
+            if changed_images:
+                reasons.append(f"{changed_images} embedded image(s) changed")
+        return PageDiff(page, bool(reasons), reasons)
+
+    def diff(self, reference_path: str, actual_path: str, ref_texts: Optional[list[str]] = None,
+             act_texts: Optional[list[str]] = None) -> tuple[list[PageDiff], list[str], list[str]]:
+        """
+        Returns per-page results aligned by page number, plus both documents' page texts.
+        Texts not passed in are read through the parsed-page cache.
+        """
+        with span("compare.visual_diff") as s:
+            if ref_texts is None:
+                ref_texts = list(cached_pages(reference_path))
+            if act_texts is None:
+                act_texts = list(cached_pages(actual_path))
+            total = max(len(ref_texts), len(act_texts))
+            diffs: dict[int, PageDiff] = {}
+            same_text = []
+            for i in range(total):
+                if i >= len(ref_texts) or i >= len(act_texts):
+                    diffs[i] = PageDiff(i + 1, True, ["page added" if i >= len(ref_texts) else "page removed"])
+                elif text_digest(ref_texts[i]) != text_digest(act_texts[i]):
+                    diffs[i] = PageDiff(i + 1, True, ["text differs"])
+                else:
+                    same_text.append(i)
+            if same_text:
+                ref_prints = fingerprint_pdf(str(reference_path), self.dpi, self.hash_size, same_text)
+                act_prints = fingerprint_pdf(str(actual_path), self.dpi, self.hash_size, same_text)
+                for ref, act in zip(ref_prints, act_prints):
+                    diffs[ref["page"] - 1] = self._compare_rendering(ref["page"], ref, act)
+            diffs = [diffs[i] for i in range(total)]
+            s.record(chunks=total, rendered_pages=len(same_text), changed_pages=sum(d.changed for d in diffs))
+        log.info("Visual diff complete", reference=Path(reference_path).name, actual=Path(actual_path).name,
+                 pages=total, rendered=len(same_text), changed=[d.page for d in diffs if d.changed])
+        return diffs, ref_texts, act_texts
@@ -2,15 +2,21 @@ import sys
 import uuid
 from pathlib import Path
 from datetime import datetime, timezone
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from exception.custom_exception import DocumentException
 from logger.custom_logger import CustomLogger
 from utils.model_loader import ModelLoader
+from utils.session_gc import touch_session, session_lease
+from utils.text_splitter import build_splitter
+from utils.deduplication import strip_page_furniture, build_deduplicator
+from utils.shared_index import get_shared_index, write_session_marker
+from utils.sharded_index import ShardedFaissIndex
+from utils.document_router import RoutedFaissIndex, remove_routing
+from utils.document_loaders import load_documents, supported_extensions
+from utils.instrumentation import span
 
 class DocumentIngestor:
-    SUPPORTED_EXTENSIONS = {".txt", ".pdf", ".docx", ".md"}
+    SUPPORTED_EXTENSIONS = supported_extensions()
     def __init__(self, temp_dir:str = "data/multi_document_chat", faiss_dir:str = "faiss_index", session_id: str | None = None):
         try:
             self.log = CustomLogger().get_logger()
@@ -27,6 +33,8 @@ class DocumentIngestor:
             self.session_faiss_dir = self.faiss_dir / self.session_id
             self.session_temp_dir.mkdir(parents=True, exist_ok=True)
             self.session_faiss_dir.mkdir(parents=True, exist_ok=True)
+            touch_session(self.session_temp_dir)
+            touch_session(self.session_faiss_dir)
 
             self.model_loader = ModelLoader()
             self.log.info(
@@ -44,39 +52,34 @@ class DocumentIngestor:
 
     def ingest_files(self, uploaded_files):
         try:
-            documents = []
-            for uploaded_files in uploaded_files:
-                ext = Path(uploaded_files.name).suffix.lower()
-                if ext not in self.SUPPORTED_EXTENSIONS:
-                    self.log.warning("Unsupported file skipped", filename=uploaded_files.name)
-                    continue
-
-                unique_filename = f"{uuid.uuid4().hex[:8]}{ext}"
-                temp_path = self.session_temp_dir / unique_filename
-
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_files.read())
-                
-                self.log.info("File saved", filename=unique_filename, saved_as=str(temp_path), session_id=self.session_id)
-
-                if ext == ".pdf":
-                    loader = PyPDFLoader(str(temp_path))
-                elif ext == ".docx":
-                    loader = Docx2txtLoader(str(temp_path))
-                elif ext == ".txt":
-                    loader = TextLoader(str(temp_path), encoding="utf-8")
-                else:
-                    self.log.warning("Unsupported file type", filename=uploaded_files.name)
-                    continue
-
-                docs = loader.load()
-                documents.extend(docs)
-
-            if not docs:
-                raise DocumentException("No valid documents loaded.", sys)
-
-            self.log.info("Documents loaded successfully", total_docs=len(docs), session_id=self.session_id)
-            return self._create_retriever(documents)
+            with span("multi_ingest.files", session_id=self.session_id), \
+                    session_lease(self.session_temp_dir), session_lease(self.session_faiss_dir):
+                temp_paths = []
+                with span("multi_ingest.save_uploads"):
+                    for uploaded_file in uploaded_files:
+                        ext = Path(uploaded_file.name).suffix.lower()
+                        if ext not in self.SUPPORTED_EXTENSIONS:
+                            self.log.warning("Unsupported file skipped", filename=uploaded_file.name)
+                            continue
+
+                        unique_filename = f"{uuid.uuid4().hex[:8]}{ext}"
+                        temp_path = self.session_temp_dir / unique_filename
+
+                        with open(temp_path, "wb") as f:
+                            f.write(uploaded_file.read())
+                    
+                        self.log.info("File saved", filename=unique_filename, saved_as=str(temp_path), session_id=self.session_id)
+                        temp_paths.append(temp_path)
+
+                # Parse all files concurrently; wall time tracks the largest file
+                with span("multi_ingest.load") as s:
+                    documents = load_documents(temp_paths)
+                    s.record(chunks=len(documents))
+                if not documents:
+                    raise DocumentException("No valid documents loaded.", sys)
+
+                self.log.info("Documents loaded successfully", files=len(temp_paths), total_docs=len(documents), session_id=self.session_id)
+                return self._create_retriever(documents)
 
         except Exception as e:
             self.log.error(f"Error ingesting files", error=str(e))
@@ -84,17 +87,85 @@ class DocumentIngestor:
 
     def _create_retriever(self, documents):
         try:
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=300)
-            chunks = splitter.split_documents(documents)
+            retriever_config = self.model_loader.config["retriever"]
+            dedup_config = self.model_loader.config.get("deduplication", {})
+            if dedup_config.get("enabled", False):
+                with span("multi_ingest.strip_furniture"):
+                    documents = strip_page_furniture(
+                        documents,
+                        min_pages=dedup_config.get("furniture_min_pages", 3),
+                        min_ratio=dedup_config.get("furniture_min_ratio", 0.5),
+                        edge_lines=dedup_config.get("furniture_edge_lines", 3),
+                        min_letters=dedup_config.get("furniture_min_letters", 4),
+                    )
+            with span("multi_ingest.split") as s:
+                splitter = build_splitter(retriever_config)
+                chunks = splitter.split_documents(documents)
+                s.record(chunks=len(chunks))
+            if dedup_config.get("enabled", False):
+                total_chunks = len(chunks)
+                with span("multi_ingest.dedup") as s:
+                    chunks = build_deduplicator(dedup_config).deduplicate(chunks)
+                    s.record(chunks=total_chunks - len(chunks))
+                self.log.info("Near-duplicate chunks removed", removed=total_chunks - len(chunks), session_id=self.session_id)
             self.log.info("Documents split into chunks", total_chunks=len(chunks), session_id=self.session_id)
             embeddings = self.model_loader.load_embeddings()
-            vectorstore = FAISS.from_documents(documents=chunks, embedding=embeddings)
-
-            # Save FAISS index under session folder
-            vectorstore.save_local(str(self.session_faiss_dir))
+            vector_store_config = self.model_loader.config.get("vector_store", {})
+            if vector_store_config.get("mode", "per_session") == "shared":
+                shared_index = get_shared_index(
+                    vector_store_config.get("shared_index_dir", "faiss_index/_shared"),
+                    embeddings,
+                    vector_store_config.get("shared_index_factory", "IDMap2,Flat"),
+                    vector_store_config.get("shared_max_loaded_sessions", 256),
+                )
+                with span("multi_ingest.embed_index") as s:
+                    shared_index.add_documents(self.session_id, chunks)
+                    s.record(chunks=len(chunks))
+                write_session_marker(self.session_faiss_dir, self.session_id, vector_store_config.get("shared_index_dir", "faiss_index/_shared"))
+                touch_session(self.session_faiss_dir)
+                self.log.info("Chunks added to shared FAISS index", session_id=self.session_id)
+                return shared_index.as_retriever(self.session_id, k=retriever_config.get("top_k", 5))
+            if vector_store_config.get("mode", "per_session") == "sharded":
+                with span("multi_ingest.embed_index") as s:
+                    sharded_index = ShardedFaissIndex.build(
+                        str(self.session_faiss_dir),
+                        chunks,
+                        embeddings,
+                        num_shards=vector_store_config.get("num_shards", 4),
+                        index_factory=vector_store_config.get("shard_index_factory", "Flat"),
+                        mmap=vector_store_config.get("mmap_shards", False),
+                    )
+                    s.record(chunks=len(chunks))
+                touch_session(self.session_faiss_dir)
+                self.log.info("Sharded FAISS index created and saved", session_id=self.session_id, shards=len(sharded_index.manifest["shards"]))
+                return sharded_index.as_retriever(k=retriever_config.get("top_k", 5))
+            sources = {chunk.metadata.get("source") for chunk in chunks}
+            if retriever_config.get("document_routing", False) and len(sources) >= retriever_config.get("route_min_documents", 8):
+                with span("multi_ingest.embed_index") as s:
+                    routed_index = RoutedFaissIndex.build(
+                        str(self.session_faiss_dir),
+                        chunks,
+                        embeddings,
+                        top_documents=retriever_config.get("route_top_documents", 3),
+                    )
+                    s.record(chunks=len(chunks))
+                touch_session(self.session_faiss_dir)
+                self.log.info("Routed FAISS index created and saved", session_id=self.session_id, documents=len(sources))
+                return routed_index.as_retriever(k=retriever_config.get("top_k", 5), search_type=retriever_config.get("search_type", "similarity"))
+            with span("multi_ingest.embed_index") as s:
+                vectorstore = FAISS.from_documents(documents=chunks, embedding=embeddings)
+                s.record(chunks=len(chunks))
+
+            # Save FAISS index under session folder; an earlier routed build of this session must not outlive it
+            with span("multi_ingest.save_index"):
+                remove_routing(self.session_faiss_dir)
+                vectorstore.save_local(str(self.session_faiss_dir))
             self.log.info("FAISS index created and saved", session_id=self.session_id, faiss_path=str(self.session_faiss_dir))
 
-            retriever = vectorstore.as_retriever(search_type ="similarity", search_kwargs={"k": 5})
+            retriever = vectorstore.as_retriever(
+                search_type=retriever_config.get("search_type", "similarity"),
+                search_kwargs={"k": retriever_config.get("top_k", 5)},
+            )
             self.log.info("Retriever created successfully", session_id=self.session_id)
             return retriever
         
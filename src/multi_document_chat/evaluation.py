@@ -0,0 +1,216 @@
+import sys
+import json
+import time
+import pickle
+import itertools
+from pathlib import Path
+from typing import Optional
+import faiss
+import numpy as np
+import pandas as pd
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from exception.custom_exception import DocumentException
+from logger.custom_logger import CustomLogger
+from utils.model_loader import ModelLoader
+from utils.document_loaders import load_documents
+from utils.text_splitter import SentenceTokenSplitter
+
+
+class RetrievalEvaluator:
+    """
+    Sweeps chunking, retrieval and FAISS index parameters over a labeled question set.
+    Reports recall@k (share of a question's relevant pages retrieved), hit rate@k (share of
+    questions with at least one relevant page retrieved) and MRR next to index size, ingest time
+    and query latency for every configuration.
+    Ingest time counts the full embedding cost even when vectors were reused from an earlier
+    configuration; `embed_seconds_paid` is what the sweep actually spent.
+
+    Labels are a JSON list or JSONL file of {"question": ..., "source": "<file name>", "pages": [1-based pages]}.
+    """
+
+    def __init__(self, file_paths: list[str], labels_path: str, embeddings=None):
+        try:
+            self.log = CustomLogger().get_logger(__name__)
+            self.model_loader = ModelLoader()
+            self.embeddings = embeddings or self.model_loader.load_embeddings()
+            self.documents = self._load_documents(file_paths)
+            self.labels = self._load_labels(labels_path)
+            self._embedding_cache: dict[str, list[float]] = {}
+            self._embedding_seconds: dict[str, float] = {}
+            self._query_vectors = None
+            self.log.info("RetrievalEvaluator initialized", documents=len(self.documents), questions=len(self.labels))
+        except Exception as e:
+            self.log.error("Error initializing RetrievalEvaluator", error=str(e))
+            raise DocumentException("Error initializing RetrievalEvaluator", sys)
+
+    @staticmethod
+    def _load_documents(file_paths: list[str]):
+        documents = load_documents(file_paths)
+        if not documents:
+            raise ValueError("No documents loaded for evaluation")
+        return documents
+
+    @staticmethod
+    def _load_labels(labels_path: str) -> list[dict]:
+        text = Path(labels_path).read_text(encoding="utf-8").strip()
+        records = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+        labels = []
+        for record in records:
+            pages = record.get("pages", [record["page"]] if "page" in record else [])
+            labels.append({
+                "question": record["question"],
+                "relevant": {(Path(record["source"]).name, int(page)) for page in pages},
+            })
+        if not labels:
+            raise ValueError("Label set is empty")
+        return labels
+
+    def _embed_chunks(self, chunks) -> tuple[np.ndarray, float, float]:
+        """
+        Embed chunk texts, reusing vectors of identical chunks produced by earlier configurations.
+        Returns the vectors, the embedding time this configuration would cost on its own (each
+        chunk charged its share of the request that first embedded it) and the time actually spent.
+        """
+        missing = list({c.page_content for c in chunks if c.page_content not in self._embedding_cache})
+        start = time.perf_counter()
+        if missing:
+            self._embedding_cache.update(zip(missing, self.embeddings.embed_documents(missing)))
+        elapsed = time.perf_counter() - start
+        for text in missing:
+            self._embedding_seconds[text] = elapsed / len(missing)
+        vectors = np.array([self._embedding_cache[c.page_content] for c in chunks], dtype="float32")
+        return vectors, sum(self._embedding_seconds[c.page_content] for c in chunks), elapsed
+
+    def _build_index(self, index_type: str, chunks, vectors: np.ndarray) -> FAISS:
+        index = faiss.index_factory(vectors.shape[1], index_type, faiss.METRIC_L2)
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        if isinstance(index, faiss.IndexIVF):
+            index.make_direct_map()  # needed by MMR, which reconstructs candidate vectors
+        ids = [str(i) for i in range(len(chunks))]
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(dict(zip(ids, chunks))),
+            index_to_docstore_id=dict(enumerate(ids)),
+        )
+
+    @staticmethod
+    def _index_bytes(vectorstore: FAISS) -> int:
+        index_bytes = faiss.serialize_index(vectorstore.index).nbytes
+        return index_bytes + len(pickle.dumps((vectorstore.docstore, vectorstore.index_to_docstore_id)))
+
+    @staticmethod
+    def _doc_key(doc) -> tuple[str, int]:
+        # Loader pages are 0-based, labels are 1-based
+        return Path(doc.metadata.get("source", "")).name, int(doc.metadata.get("page", 0)) + 1
+
+    def _score(self, vectorstore: FAISS, k: int, search_type: str) -> dict:
+        if self._query_vectors is None:
+            self._query_vectors = self.embeddings.embed_documents([label["question"] for label in self.labels])
+
+        hits, recall, reciprocal_ranks, latencies = 0, 0.0, 0.0, []
+        for label, vector in zip(self.labels, self._query_vectors):
+            start = time.perf_counter()
+            if search_type == "mmr":
+                docs = vectorstore.max_marginal_relevance_search_by_vector(vector, k=k)
+            else:
+                docs = vectorstore.similarity_search_by_vector(vector, k=k)
+            latencies.append(time.perf_counter() - start)
+
+            ranks = [rank for rank, doc in enumerate(docs, start=1) if self._doc_key(doc) in label["relevant"]]
+            if label["relevant"]:
+                recall += len({self._doc_key(doc) for doc in docs} & label["relevant"]) / len(label["relevant"])
+            if ranks:
+                hits += 1
+                reciprocal_ranks += 1.0 / ranks[0]
+
+        latencies_ms = np.array(latencies) * 1000
+        return {
+            "recall_at_k": recall / len(self.labels),
+            "hit_rate_at_k": hits / len(self.labels),
+            "mrr": reciprocal_ranks / len(self.labels),
+            "query_p50_ms": float(np.percentile(latencies_ms, 50)),
+            "query_p95_ms": float(np.percentile(latencies_ms, 95)),
+        }
+
+    def run(self, grid: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Evaluate every combination in the grid (defaults to the `evaluation` block of config.yaml).
+        """
+        try:
+            grid = grid or self.model_loader.config["evaluation"]
+            rows = []
+            for chunk_size, chunk_overlap in itertools.product(grid["chunk_size"], grid["chunk_overlap"]):
+                if chunk_overlap >= chunk_size:
+                    continue
+                start = time.perf_counter()
+                splitter = SentenceTokenSplitter(chunk_size, chunk_overlap, self.model_loader.config["retriever"].get("tokenizer", "cl100k_base"))
+                chunks = splitter.split_documents(self.documents)
+                split_seconds = time.perf_counter() - start
+                vectors, embed_seconds, embed_seconds_paid = self._embed_chunks(chunks)
+
+                for index_type in grid["index_type"]:
+                    start = time.perf_counter()
+                    try:
+                        vectorstore = self._build_index(index_type, chunks, vectors)
+                    except RuntimeError as e:
+                        self.log.warning("Skipping index type", index_type=index_type, chunks=len(chunks), error=str(e)[:200])
+                        continue
+                    build_seconds = time.perf_counter() - start
+                    index_bytes = self._index_bytes(vectorstore)
+
+                    for k, search_type in itertools.product(grid["k"], grid["search_type"]):
+                        rows.append({
+                            "chunk_size": chunk_size,
+                            "chunk_overlap": chunk_overlap,
+                            "index_type": index_type,
+                            "k": k,
+                            "search_type": search_type,
+                            "chunks": len(chunks),
+                            "index_bytes": index_bytes,
+                            # Uncached cost, so configurations evaluated after the first are not ranked as cheaper
+                            "ingest_seconds": split_seconds + embed_seconds + build_seconds,
+                            "embed_seconds": embed_seconds,
+                            "embed_seconds_paid": embed_seconds_paid,
+                            **self._score(vectorstore, k, search_type),
+                        })
+                self.log.info("Chunk configuration evaluated", chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunks=len(chunks))
+            return pd.DataFrame(rows)
+        except Exception as e:
+            self.log.error("Error running retrieval evaluation", error=str(e))
+            raise DocumentException("Error running retrieval evaluation", sys)
+
+    @staticmethod
+    def pick_cheapest(results: pd.DataFrame, min_recall: float, min_mrr: float = 0.0) -> Optional[pd.Series]:
+        """
+        Return the configuration with the smallest index, fewest retrieved chunks and fastest queries
+        that still meets the quality bar, or None if nothing qualifies.
+        """
+        passing = results[(results["recall_at_k"] >= min_recall) & (results["mrr"] >= min_mrr)]
+        if passing.empty:
+            return None
+        return passing.sort_values(["index_bytes", "k", "query_p95_ms"]).iloc[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep retrieval parameters over a labeled question set.")
+    parser.add_argument("--files", nargs="+", required=True, help="Documents to ingest")
+    parser.add_argument("--labels", required=True, help="JSON/JSONL question -> source page labels")
+    parser.add_argument("--output", default="retrieval_evaluation.csv")
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--min-mrr", type=float, default=0.0)
+    args = parser.parse_args()
+
+    evaluator = RetrievalEvaluator(args.files, args.labels)
+    results = evaluator.run()
+    results.to_csv(args.output, index=False)
+    print(results.sort_values(["recall_at_k", "mrr"], ascending=False).to_string(index=False))
+
+    best = RetrievalEvaluator.pick_cheapest(results, args.min_recall, args.min_mrr)
+    print("\nCheapest configuration meeting the quality bar:")
+    print(best if best is not None else "None - relax the quality bar or widen the grid.")
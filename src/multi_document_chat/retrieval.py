@@ -1,23 +1,40 @@
 import sys
 import os
+import contextvars
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from langchain_core.messages import BaseMessage
 from operator import itemgetter
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.vectorstores import FAISS
 from utils.model_loader import ModelLoader
 from exception.custom_exception import DocumentException
 from logger.custom_logger import CustomLogger
 from prompt.prompt_library import PROMPT_REGISTRY
 from model.models import PromptType
+from utils.session_gc import touch_session
+from utils.index_cache import load_faiss_index
+from utils.sharded_index import is_sharded_index, get_sharded_index
+from utils.shared_index import read_session_marker, get_shared_index
+from utils.document_router import is_routed_index, get_routed_index
+from utils.instrumentation import span, traced, estimate_tokens, get_registry, METRIC_PREFIX
+from utils.vector_search import get_vectorstore, embed_query, search_by_vector, embed_queries, search_by_vectors
+from utils.admission import admit, estimate_prompt_tokens, Priority
+
+# Runs the raw-input search while the question rewrite is in flight
+_speculative_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rag-speculative")
+
 
 class ConversationalRAG:
     def __init__(self, session_id: str, retriever=None):
         try:
             self.log = CustomLogger().get_logger(__name__)
             self.session_id = session_id
+            retriever_config = ModelLoader().config["retriever"]
+            self.speculative = retriever_config.get("speculative", False)
+            self.speculative_threshold = retriever_config.get("speculative_similarity_threshold", 0.95)
             self.llm = self._load_llm()
             self.contextualize_prompt: ChatPromptTemplate = PROMPT_REGISTRY[PromptType.CONTEXTUALIZE_QUESTION.value]
             self.qa_prompt: ChatPromptTemplate = PROMPT_REGISTRY[PromptType.CONTEXT_QA.value]
@@ -37,27 +54,60 @@ class ConversationalRAG:
         Load a FAISS vectorestore from disk and covert to retriever.
         """
         try:
-            embeddings = ModelLoader().load_embeddings()
+            model_loader = ModelLoader()
+            embeddings = model_loader.load_embeddings()
             if not os.path.isdir(index_path):
                 raise FileNotFoundError(f"FAISS Index path {index_path} does not exist.")
             
-            vectorstore = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+            retriever_config = model_loader.config["retriever"]
+            shared_marker = read_session_marker(index_path)
+            if shared_marker is not None:
+                shared_index = get_shared_index(
+                    shared_marker["index_dir"],
+                    embeddings,
+                    model_loader.config.get("vector_store", {}).get("shared_index_factory", "IDMap2,Flat"),
+                    model_loader.config.get("vector_store", {}).get("shared_max_loaded_sessions", 256),
+                )
+                self.retriever = shared_index.as_retriever(shared_marker["session_id"], k=retriever_config.get("top_k", 5))
+                touch_session(index_path)
+                self.log.info("Retriever loaded from shared FAISS index", index_path=index_path, session_id=self.session_id)
+                return self.retriever
+            if is_sharded_index(index_path):
+                mmap = model_loader.config.get("vector_store", {}).get("mmap_shards", False)
+                self.retriever = get_sharded_index(index_path, embeddings, mmap=mmap).as_retriever(k=retriever_config.get("top_k", 5))
+                touch_session(index_path)
+                self.log.info("Retriever loaded from sharded FAISS index", index_path=index_path, session_id=self.session_id)
+                return self.retriever
+            if is_routed_index(index_path):
+                routed_index = get_routed_index(index_path, embeddings, top_documents=retriever_config.get("route_top_documents", 3))
+                self.retriever = routed_index.as_retriever(k=retriever_config.get("top_k", 5), search_type=retriever_config.get("search_type", "similarity"))
+                touch_session(index_path)
+                self.log.info("Retriever loaded from routed FAISS index", index_path=index_path, session_id=self.session_id)
+                return self.retriever
 
-            self.retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
+            vectorstore = load_faiss_index(index_path, embeddings)
+            touch_session(index_path)
+
+            self.retriever = vectorstore.as_retriever(
+                search_type=retriever_config.get("search_type", "similarity"),
+                search_kwargs={"k": retriever_config.get("top_k", 5)},
+            )
             self.log.info("Retriever loaded from FAISS index", index_path=index_path, session_id=self.session_id)
             return self.retriever
         except Exception as e:
             self.log.error("Error loading retriever from FAISS", error=str(e))
             raise DocumentException("Error loading retriever from FAISS", sys)
 
-    def invoke(self, user_input: str, chat_history: Optional[list[BaseMessage]] = None) -> str:
+    def invoke(self, user_input: str, chat_history: Optional[list[BaseMessage]] = None, tenant_id: Optional[str] = None) -> str:
         try:
             chat_history = chat_history or []
             payload = {
                 "input": user_input,
                 "chat_history": chat_history
             }
-            answer = self.chain.invoke(payload)
+            with admit(tenant_id, Priority.INTERACTIVE, estimate_prompt_tokens(payload, retrieval=True)):
+                with span("rag.invoke", session_id=self.session_id):
+                    answer = self.chain.invoke(payload)
             if not answer:
                 self.log.warning("No answer generated", session_id=self.session_id, user_input=user_input)
 
@@ -68,6 +118,50 @@ class ConversationalRAG:
             raise DocumentException("Error invoking ConversationalRAG", sys)
 
 
+    def batch(self, questions: list[str], chat_history: Optional[list[BaseMessage]] = None, max_concurrency: Optional[int] = None,
+              tenant_id: Optional[str] = None) -> list[str]:
+        """
+        Answer many questions over the same index. Queries are embedded in one request and searched
+        with one multi-query FAISS call; answer prompts run concurrently up to `max_concurrency`.
+        Answers are returned in question order. Without chat history there is nothing to
+        resolve, so the rewrite step is skipped. The whole batch is admitted once, at batch priority.
+        """
+        try:
+            chat_history = chat_history or []
+            max_concurrency = max_concurrency or ModelLoader().config["retriever"].get("batch_max_concurrency", 8)
+            run_config = {"max_concurrency": max_concurrency}
+            estimated = sum(estimate_prompt_tokens(q, chat_history, retrieval=True) for q in questions)
+            with admit(tenant_id, Priority.BATCH, estimated), span("rag.batch", session_id=self.session_id) as s:
+                queries = list(questions)
+                if chat_history:
+                    queries = self.question_rewriter.batch(
+                        [{"input": q, "chat_history": chat_history} for q in questions], config=run_config
+                    )
+                if get_vectorstore(self.retriever) is None:
+                    with span("rag.retrieve") as r:
+                        doc_lists = self.retriever.batch(queries, config=run_config)
+                        r.record(chunks=sum(len(d) for d in doc_lists))
+                else:
+                    with span("rag.embed_query") as r:
+                        vectors = embed_queries(self.retriever, queries)
+                        r.record(input_tokens=estimate_tokens(queries))
+                    with span("rag.search") as r:
+                        doc_lists = search_by_vectors(self.retriever, vectors)
+                        r.record(chunks=sum(len(d) for d in doc_lists))
+                answers = self.answer_chain.batch(
+                    [
+                        {"context": self._stuff_context(docs), "input": q, "chat_history": chat_history}
+                        for q, docs in zip(questions, doc_lists)
+                    ],
+                    config=run_config,
+                )
+                s.record(chunks=len(questions))
+            self.log.info("Batch answered", session_id=self.session_id, questions=len(questions), max_concurrency=max_concurrency)
+            return answers
+        except Exception as e:
+            self.log.error("Error in ConversationalRAG batch", error=str(e))
+            raise DocumentException("Error in ConversationalRAG batch", sys)
+
     def _load_llm(self):
         try:
             llm = ModelLoader().load_llm()
@@ -83,33 +177,107 @@ class ConversationalRAG:
     def _format_docs(docs):
         return "\n\n".join(d.page_content for d in docs)
 
+    def _retrieve(self, query: str):
+        """
+        Retrieve documents for the rewritten query, timing embedding and FAISS search separately when possible.
+        """
+        if get_vectorstore(self.retriever) is None:
+            with span("rag.retrieve", session_id=self.session_id) as s:
+                docs = self.retriever.invoke(query)
+                s.record(chunks=len(docs))
+            return docs
+        with span("rag.embed_query", session_id=self.session_id) as s:
+            vector = embed_query(self.retriever, query)
+            s.record(input_tokens=estimate_tokens(query))
+        with span("rag.search", session_id=self.session_id) as s:
+            docs = search_by_vector(self.retriever, vector)
+            s.record(chunks=len(docs))
+        return docs
+
+    def _search_raw(self, query: str):
+        with span("rag.speculative_search", session_id=self.session_id) as s:
+            vector = embed_query(self.retriever, query)
+            docs = search_by_vector(self.retriever, vector)
+            s.record(input_tokens=estimate_tokens(query), chunks=len(docs))
+        return vector, docs
+
+    def _speculative_retrieve(self, payload: dict, config=None):
+        """
+        Search with the raw input while the rewrite runs. The speculative results are kept when the
+        rewrite is identical or embeds within `speculative_similarity_threshold` (cosine) of the
+        raw input; otherwise only the search is re-run with the rewritten query's vector.
+        """
+        if get_vectorstore(self.retriever) is None:
+            return self._retrieve(self.question_rewriter.invoke(payload, config=config))
+
+        raw = payload["input"]
+        speculative = _speculative_pool.submit(contextvars.copy_context().run, self._search_raw, raw)
+        rewritten = self.question_rewriter.invoke(payload, config=config)
+        try:
+            raw_vector, raw_docs = speculative.result()
+        except Exception as e:
+            # The speculative search is only an optimization: answer with the normal path
+            self.log.warning("Speculative search failed, retrieving with the rewritten query", session_id=self.session_id, error=str(e))
+            get_registry().inc(f"{METRIC_PREFIX}_speculative_retrieval_total", 1, {"outcome": "error"}, "Speculative raw-input retrievals by outcome")
+            return self._retrieve(rewritten)
+
+        if rewritten.strip() == raw.strip():
+            outcome, docs = "identical", raw_docs
+        else:
+            with span("rag.embed_query", session_id=self.session_id) as s:
+                vector = np.asarray(embed_query(self.retriever, rewritten))
+                raw_vector = np.asarray(raw_vector)
+                s.record(input_tokens=estimate_tokens(rewritten))
+            similarity = float(vector @ raw_vector / ((np.linalg.norm(vector) * np.linalg.norm(raw_vector)) or 1.0))
+            if similarity >= self.speculative_threshold:
+                outcome, docs = "similar", raw_docs
+            else:
+                outcome = "miss"
+                with span("rag.search", session_id=self.session_id) as s:
+                    docs = search_by_vector(self.retriever, vector.tolist())
+                    s.record(chunks=len(docs))
+        get_registry().inc(f"{METRIC_PREFIX}_speculative_retrieval_total", 1, {"outcome": outcome}, "Speculative raw-input retrievals by outcome")
+        return docs
+
+    def _stuff_context(self, docs):
+        with span("rag.stuff", session_id=self.session_id) as s:
+            context = self._format_docs(docs)
+            s.record(chunks=len(docs), output_tokens=estimate_tokens(context))
+        return context
+
     def _build_lcel_chain(self):
         try:
             # 1. Rewrite user query using chat history
-            question_rewriter = (
+            self.question_rewriter = question_rewriter = (
                 {
                     "input": itemgetter("input"),
                     "chat_history": itemgetter("chat_history"),
                 }
                 | self.contextualize_prompt
-                | self.llm
+                | traced("rag.rewrite", self.llm, session_id=self.session_id)
                 | StrOutputParser()
             
             )
 
-            # 2. Retrieve docs for rewritten query
-            retrieve_docs = question_rewriter | self.retriever | self._format_docs
+            # 2. Retrieve docs for rewritten query (speculatively overlapped with the rewrite when enabled)
+            if self.speculative:
+                retrieve_docs = RunnableLambda(self._speculative_retrieve) | RunnableLambda(self._stuff_context)
+            else:
+                retrieve_docs = question_rewriter | RunnableLambda(self._retrieve) | RunnableLambda(self._stuff_context)
 
             # 3. Feed Context + original input + chat history into answer prompt
+            self.answer_chain = (
+                self.qa_prompt
+                | traced("rag.answer", self.llm, session_id=self.session_id)
+                | StrOutputParser()
+            )
             self.chain = (
                 {
                     "context": retrieve_docs,
                     "input": itemgetter("input"),
                     "chat_history": itemgetter("chat_history"),
                 }
-                | self.qa_prompt
-                | self.llm
-                | StrOutputParser()
+                | self.answer_chain
             )
         except Exception as e:
             self.log.error("Error building LCEL chain", error=str(e))
@@ -1,61 +1,131 @@
 import uuid
 from pathlib import Path
 import sys
+from contextlib import ExitStack
 from datetime import datetime, timezone
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentException
 from utils.model_loader import ModelLoader
+from utils.session_gc import touch_session, session_lease
+from utils.text_splitter import build_splitter
+from utils.deduplication import strip_page_furniture, build_deduplicator
+from utils.shared_index import get_shared_index, write_session_marker
+from utils.sharded_index import ShardedFaissIndex
+from utils.document_loaders import load_documents
+from utils.instrumentation import span
 
 class SingleDocIngestor:
-    def __init__(self, data_dir:str = "data/single_document_chat", faiss_dir: str = "faiss_index"):
+    def __init__(self, data_dir:str = "data/single_document_chat", faiss_dir: str = "faiss_index", session_id: str | None = None):
         try:
             self.log = CustomLogger().get_logger(__name__)
             self.data_dir = Path(data_dir)
             self.data_dir.mkdir(parents=True, exist_ok=True)
             self.faiss_dir = Path(faiss_dir)
             self.faiss_dir.mkdir(parents=True, exist_ok=True)
+            # Each ingestion gets its own index folder instead of overwriting the faiss_dir root
+            self.session_id = session_id or f"session_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            self.session_faiss_dir = self.faiss_dir / self.session_id
             self.model_loader = ModelLoader()
-            self.log.info("SingleDocIngestor initialized successfully.", temp_path = str(self.data_dir), faiss_dir = str(self.faiss_dir))
+            self.log.info("SingleDocIngestor initialized successfully.", temp_path = str(self.data_dir), faiss_dir = str(self.session_faiss_dir), session_id=self.session_id)
         except Exception as e:
             self.log.error(f"Error initializing SingleDocIngestor: {e}")
             raise DocumentException(f"Error initializing SingleDocIngestor: {e}", sys)
 
     def ingest_files(self, uploaded_files):
         try:
-            documents = []
-
-            for uploaded_file in uploaded_files:
-                unique_filename = f"session_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-                temp_path = self.data_dir / unique_filename
-
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.read())
-                self.log.info(f"PDF saved for ingestion", filename=uploaded_file.name)
-                loader = PyPDFLoader(str(temp_path))
-                docs = loader.load()
-                documents.extend(docs)
-            self.log.info("PDF files loaded successfully.", count=len(documents))
-
-            self.log.info("Files ingested successfully.", count=len(documents))
-            return self._create_retriever(documents)
+            with span("single_ingest.files", session_id=self.session_id):
+                with ExitStack() as leases:
+                    temp_paths = []
+                    with span("single_ingest.save_uploads"):
+                        for uploaded_file in uploaded_files:
+                            ext = Path(uploaded_file.name).suffix.lower() or ".pdf"
+                            unique_filename = f"session_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}{ext}"
+                            temp_path = self.data_dir / unique_filename
+
+                            leases.enter_context(session_lease(temp_path))
+                            with open(temp_path, "wb") as f:
+                                f.write(uploaded_file.read())
+                            self.log.info(f"PDF saved for ingestion", filename=uploaded_file.name)
+                            temp_paths.append(temp_path)
+
+                    with span("single_ingest.load") as s:
+                        documents = load_documents(temp_paths)
+                        s.record(chunks=len(documents))
+                self.log.info("PDF files loaded successfully.", count=len(documents))
+
+                self.log.info("Files ingested successfully.", count=len(documents))
+                return self._create_retriever(documents)
         except Exception as e:
             self.log.error(f"Error ingesting files: {e}")
             raise DocumentException(f"Error ingesting files: {e}", sys)
 
     def _create_retriever(self, documents):
         try:
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=300)
-            chunks = splitter.split_documents(documents)
+            retriever_config = self.model_loader.config["retriever"]
+            dedup_config = self.model_loader.config.get("deduplication", {})
+            if dedup_config.get("enabled", False):
+                with span("single_ingest.strip_furniture"):
+                    documents = strip_page_furniture(
+                        documents,
+                        min_pages=dedup_config.get("furniture_min_pages", 3),
+                        min_ratio=dedup_config.get("furniture_min_ratio", 0.5),
+                        edge_lines=dedup_config.get("furniture_edge_lines", 3),
+                        min_letters=dedup_config.get("furniture_min_letters", 4),
+                    )
+            with span("single_ingest.split") as s:
+                splitter = build_splitter(retriever_config)
+                chunks = splitter.split_documents(documents)
+                s.record(chunks=len(chunks))
+            if dedup_config.get("enabled", False):
+                total_chunks = len(chunks)
+                with span("single_ingest.dedup") as s:
+                    chunks = build_deduplicator(dedup_config).deduplicate(chunks)
+                    s.record(chunks=total_chunks - len(chunks))
+                self.log.info("Near-duplicate chunks removed", removed=total_chunks - len(chunks))
             self.log.info("Documents split into chunks.", chunks=len(chunks))
 
             embeddings = self.model_loader.load_embeddings()
-            vector_store = FAISS.from_documents(documents=chunks, embedding=embeddings)
-            vector_store.save_local(str(self.faiss_dir))
+            vector_store_config = self.model_loader.config.get("vector_store", {})
+            if vector_store_config.get("mode", "per_session") == "shared":
+                shared_index = get_shared_index(
+                    vector_store_config.get("shared_index_dir", "faiss_index/_shared"),
+                    embeddings,
+                    vector_store_config.get("shared_index_factory", "IDMap2,Flat"),
+                    vector_store_config.get("shared_max_loaded_sessions", 256),
+                )
+                with span("single_ingest.embed_index") as s:
+                    shared_index.add_documents(self.session_id, chunks)
+                    s.record(chunks=len(chunks))
+                write_session_marker(self.session_faiss_dir, self.session_id, vector_store_config.get("shared_index_dir", "faiss_index/_shared"))
+                touch_session(self.session_faiss_dir)
+                self.log.info("Chunks added to shared FAISS index", session_id=self.session_id)
+                return shared_index.as_retriever(self.session_id, k=retriever_config.get("top_k", 5))
+            if vector_store_config.get("mode", "per_session") == "sharded":
+                with span("single_ingest.embed_index") as s:
+                    sharded_index = ShardedFaissIndex.build(
+                        str(self.session_faiss_dir),
+                        chunks,
+                        embeddings,
+                        num_shards=vector_store_config.get("num_shards", 4),
+                        index_factory=vector_store_config.get("shard_index_factory", "Flat"),
+                        mmap=vector_store_config.get("mmap_shards", False),
+                    )
+                    s.record(chunks=len(chunks))
+                touch_session(self.session_faiss_dir)
+                self.log.info("Sharded FAISS index created and saved", session_id=self.session_id, shards=len(sharded_index.manifest["shards"]))
+                return sharded_index.as_retriever(k=retriever_config.get("top_k", 5))
+            with span("single_ingest.embed_index") as s:
+                vector_store = FAISS.from_documents(documents=chunks, embedding=embeddings)
+                s.record(chunks=len(chunks))
+            with span("single_ingest.save_index"):
+                vector_store.save_local(str(self.session_faiss_dir))
+            touch_session(self.session_faiss_dir)
 
-            retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 5})
+            retriever = vector_store.as_retriever(
+                search_type=retriever_config.get("search_type", "similarity"),
+                search_kwargs={"k": retriever_config.get("top_k", 5)},
+            )
             self.log.info("FAISS vector store created successfully.", retriever_type=str(type(retriever)))
             return retriever
         except Exception as e:
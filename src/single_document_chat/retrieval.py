@@ -8,10 +8,18 @@ from model.models import PromptType
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.vectorstores import FAISS
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
 from utils.model_loader import ModelLoader
+from utils.session_gc import touch_session
+from utils.index_cache import load_faiss_index
+from utils.shared_index import read_session_marker, get_shared_index
+from utils.sharded_index import is_sharded_index, get_sharded_index
+from utils.instrumentation import span, traced, estimate_tokens
+from utils.vector_search import get_vectorstore, embed_queries, search_by_vectors
+from utils.admission import admit, estimate_prompt_tokens, Priority
+from langchain_core.output_parsers import StrOutputParser
+from typing import Optional
 import streamlit as st
 
 load_dotenv()
@@ -25,9 +33,13 @@ class ConversationalRAG:
         self.llm = self._load_llm()
         self.contextualize_prompt = PROMPT_REGISTRY[PromptType.CONTEXTUALIZE_QUESTION.value]
         self.qa_prompt = PROMPT_REGISTRY[PromptType.CONTEXT_QA.value]
-        self.history_aware_retriever = create_history_aware_retriever(self.llm, self.retriever, self.contextualize_prompt)
+        self.history_aware_retriever = create_history_aware_retriever(
+            traced("rag.rewrite", self.llm, session_id=session_id),
+            traced("rag.retrieve", self.retriever, session_id=session_id),
+            self.contextualize_prompt,
+        )
         self.log.info("created history aware retriever", session_id=session_id)
-        self.qa_chain = create_stuff_documents_chain(self.llm, self.qa_prompt)
+        self.qa_chain = create_stuff_documents_chain(traced("rag.answer", self.llm, session_id=session_id), self.qa_prompt)
         self.rag_chain = create_retrieval_chain(self.history_aware_retriever, self.qa_chain)
         self.log.info("created rag chain", session_id=session_id)
         self.chain = RunnableWithMessageHistory(
@@ -63,23 +75,86 @@ class ConversationalRAG:
         
     def load_retriever_from_faiss(self, index_path):
         try:
-            embeddings = ModelLoader().get_embeddings()
+            model_loader = ModelLoader()
+            embeddings = model_loader.load_embeddings()
             if not os.path.isdir(index_path):
                 raise FileNotFoundError(f"FAISS index directory not found: {index_path}")
-        
-            vectorstore = FAISS.load_local(index_path, embeddings)
+            retriever_config = model_loader.config["retriever"]
+            shared_marker = read_session_marker(index_path)
+            if shared_marker is not None:
+                shared_index = get_shared_index(
+                    shared_marker["index_dir"],
+                    embeddings,
+                    model_loader.config.get("vector_store", {}).get("shared_index_factory", "IDMap2,Flat"),
+                    model_loader.config.get("vector_store", {}).get("shared_max_loaded_sessions", 256),
+                )
+                touch_session(index_path)
+                self.log.info("Shared FAISS index session loaded.", index_path=index_path)
+                return shared_index.as_retriever(shared_marker["session_id"], k=retriever_config.get("top_k", 5))
+            if is_sharded_index(index_path):
+                mmap = model_loader.config.get("vector_store", {}).get("mmap_shards", False)
+                touch_session(index_path)
+                self.log.info("Sharded FAISS index loaded.", index_path=index_path)
+                return get_sharded_index(index_path, embeddings, mmap=mmap).as_retriever(k=retriever_config.get("top_k", 5))
+
+            vectorstore = load_faiss_index(index_path, embeddings)
+            touch_session(index_path)
             self.log.info("FAISS vector store loaded successfully.", index_path=index_path)
-            return vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
+            return vectorstore.as_retriever(
+                search_type=retriever_config.get("search_type", "similarity"),
+                search_kwargs={"k": retriever_config.get("top_k", 5)},
+            )
         except Exception as e:
             self.log.error(f"Error loading FAISS vector store: {e}")
             raise DocumentException(f"Error loading FAISS vector store: {e}", sys)
         
-    def invoke(self, user_input:str)->str:
+    def batch(self, questions: list[str], max_concurrency: Optional[int] = None, tenant_id: Optional[str] = None) -> list[str]:
+        """
+        Answer many questions in one pass: one embedding request, one multi-query FAISS search and
+        concurrent answer prompts (up to `max_concurrency`), returned in question order.
+        The session history is used for context but batch answers are not appended to it.
+        """
         try:
-            response = self.chain.invoke(
-                {"input": user_input},
-                config={"configurable": {"session_id": self.session_id}}
-            )
+            history = self._get_session_history(self.session_id).messages
+            max_concurrency = max_concurrency or ModelLoader().config["retriever"].get("batch_max_concurrency", 8)
+            run_config = {"max_concurrency": max_concurrency}
+            estimated = sum(estimate_prompt_tokens(q, history, retrieval=True) for q in questions)
+            with admit(tenant_id, Priority.BATCH, estimated), span("rag.batch", session_id=self.session_id) as s:
+                queries = list(questions)
+                if history:
+                    rewriter = self.contextualize_prompt | traced("rag.rewrite", self.llm) | StrOutputParser()
+                    queries = rewriter.batch([{"input": q, "chat_history": history} for q in questions], config=run_config)
+                if get_vectorstore(self.retriever) is None:
+                    with span("rag.retrieve") as r:
+                        doc_lists = self.retriever.batch(queries, config=run_config)
+                        r.record(chunks=sum(len(d) for d in doc_lists))
+                else:
+                    with span("rag.embed_query") as r:
+                        vectors = embed_queries(self.retriever, queries)
+                        r.record(input_tokens=estimate_tokens(queries))
+                    with span("rag.search") as r:
+                        doc_lists = search_by_vectors(self.retriever, vectors)
+                        r.record(chunks=sum(len(d) for d in doc_lists))
+                answers = self.qa_chain.batch(
+                    [{"input": q, "context": docs, "chat_history": history} for q, docs in zip(questions, doc_lists)],
+                    config=run_config,
+                )
+                s.record(chunks=len(questions))
+            self.log.info("Batch answered", session_id=self.session_id, questions=len(questions), max_concurrency=max_concurrency)
+            return answers
+        except Exception as e:
+            self.log.error(f"Error in RAG batch: {e}", session_id=self.session_id)
+            raise DocumentException(f"Error in RAG batch: {e}", sys)
+
+    def invoke(self, user_input:str, tenant_id: Optional[str] = None)->str:
+        try:
+            history = self._get_session_history(self.session_id).messages
+            with admit(tenant_id, Priority.INTERACTIVE, estimate_prompt_tokens(user_input, history, retrieval=True)):
+                with span("rag.invoke", session_id=self.session_id):
+                    response = self.chain.invoke(
+                        {"input": user_input},
+                        config={"configurable": {"session_id": self.session_id}}
+                    )
             answer = response.get("answer", "No answer")
             if not answer:
                 self.log.warning("No answer found in the response.", session_id=self.session_id)
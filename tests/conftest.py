@@ -0,0 +1,58 @@
+import os
+import sys
+import hashlib
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Modules read config/config.yaml relative to the working directory
+os.chdir(ROOT)
+os.environ.setdefault("LLM_PROVIDER", "local")
+os.environ.setdefault("METRICS_FILE", "")
+os.environ.setdefault("METRICS_PORT", "0")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings: texts sharing words get close vectors.
+    """
+
+    def __init__(self, dimension: int = 64):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimension
+        for word in text.lower().split():
+            # hashlib, not hash(): str hashes are salted per process
+            vector[int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dimension] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def embeddings():
+    return FakeEmbeddings()
+
+
+def write_pdf(path, pages: list[str]) -> str:
+    """
+    Write a PDF with one text page per entry and return its path.
+    """
+    import fitz
+
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from utils import admission
+from utils.admission import AdmissionController, AdmissionRejected, Priority, TokenBucket
+
+
+def run_in_thread(controller, tenant, priority, tokens, order, hold=0.0):
+    def work():
+        with controller.admit(tenant, priority, tokens):
+            order.append((tenant, priority))
+            time.sleep(hold)
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    return thread
+
+
+def wait_queued(controller, n):
+    deadline = time.monotonic() + 5
+    while len(controller._waiting) < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_token_bucket_refills_and_caps_debt_at_one_burst():
+    bucket = TokenBucket(tokens_per_second=100, burst=200)
+    bucket.updated = 0.0
+    assert bucket.wait_time(5000, 0.0) == 0.0   # larger than the burst: runs on a full bucket
+    bucket.take(5000, 0.0)
+    assert bucket.tokens == -200
+    assert bucket.wait_time(100, 0.0) == pytest.approx(3.0)
+    assert bucket.wait_time(100, 3.0) == 0.0
+
+
+def test_interactive_requests_jump_ahead_of_queued_batch_work():
+    controller = AdmissionController(max_concurrent=1)
+    order = []
+    holder = run_in_thread(controller, "t", Priority.BATCH, 1, order, hold=0.2)
+    time.sleep(0.02)
+    threads = [run_in_thread(controller, "t", Priority.BATCH, 1, order)]
+    wait_queued(controller, 1)
+    threads.append(run_in_thread(controller, "t", Priority.ANALYSIS, 1, order))
+    wait_queued(controller, 2)
+    threads.append(run_in_thread(controller, "t", Priority.INTERACTIVE, 1, order))
+    wait_queued(controller, 3)
+    for thread in [holder, *threads]:
+        thread.join()
+    assert [p for _, p in order] == [Priority.BATCH, Priority.INTERACTIVE, Priority.ANALYSIS, Priority.BATCH]
+
+
+def test_rate_limited_tenant_does_not_block_other_tenants():
+    controller = AdmissionController(max_concurrent=4, tenant_tokens_per_minute=60, tenant_burst_tokens=100,
+                                     queue_timeout_seconds={"interactive": 0.3})
+    with controller.admit("noisy", Priority.INTERACTIVE, 100):
+        pass
+    order, rejected = [], []
+
+    def noisy_request():
+        try:
+            with controller.admit("noisy", Priority.INTERACTIVE, 50):
+                order.append(("noisy", Priority.INTERACTIVE))
+        except AdmissionRejected as e:
+            rejected.append(e)
+
+    noisy = threading.Thread(target=noisy_request)
+    noisy.start()
+    wait_queued(controller, 1)
+    start = time.monotonic()
+    run_in_thread(controller, "quiet", Priority.INTERACTIVE, 50, order).join()
+    assert order == [("quiet", Priority.INTERACTIVE)]
+    assert time.monotonic() - start < 0.2
+    noisy.join()
+    assert len(rejected) == 1 and order == [("quiet", Priority.INTERACTIVE)]
+
+
+def test_full_queue_is_rejected():
+    controller = AdmissionController(max_concurrent=1, max_queue={"batch": 1})
+    order = []
+    holder = run_in_thread(controller, "t", Priority.BATCH, 1, order, hold=0.2)
+    time.sleep(0.02)
+    queued = run_in_thread(controller, "t", Priority.BATCH, 1, order)
+    wait_queued(controller, 1)
+    with pytest.raises(AdmissionRejected):
+        with controller.admit("t", Priority.BATCH, 1):
+            pass
+    holder.join()
+    queued.join()
+
+
+def test_idle_full_buckets_are_evicted():
+    controller = AdmissionController(tenant_tokens_per_minute=6000, tenant_burst_tokens=100, idle_bucket_sweep_seconds=0)
+    for tenant in ("a", "b"):
+        with controller.admit(tenant, Priority.INTERACTIVE, 1):
+            pass
+    # Both buckets are back at (or next to) full after the sweep interval and nothing is queued
+    time.sleep(0.05)
+    with controller.admit("c", Priority.INTERACTIVE, 90):
+        pass
+    assert set(controller._buckets) == {("c", "interactive")}
+
+
+def test_requests_without_tenant_share_the_default_bucket(monkeypatch):
+    controller = AdmissionController(tenant_tokens_per_minute=60, tenant_burst_tokens=100)
+    monkeypatch.setattr(admission, "get_admission_controller", lambda: controller)
+    with admission.admit(None, Priority.INTERACTIVE, 80):
+        pass
+    assert set(controller._buckets) == {("default", "interactive")}
+    assert controller._buckets[("default", "interactive")].wait_time(80, time.monotonic()) > 0
+
+    with admission.tenant_scope("api-key-1"):
+        with admission.admit(None, Priority.INTERACTIVE, 80):
+            pass
+    assert ("api-key-1", "interactive") in controller._buckets
+
+
+def test_large_batch_request_cannot_starve_a_later_chat_turn():
+    controller = AdmissionController(tenant_tokens_per_minute=6000, tenant_burst_tokens=1000,
+                                     queue_timeout_seconds={"interactive": 1, "batch": 1})
+    # A huge comparison runs on a full bucket and leaves the tenant's batch budget in debt
+    with controller.admit("default", Priority.BATCH, 1_000_000):
+        pass
+    start = time.monotonic()
+    with controller.admit("default", Priority.INTERACTIVE, 500):
+        pass
+    assert time.monotonic() - start < 0.1
+    with pytest.raises(AdmissionRejected):
+        with controller.admit("default", Priority.BATCH, 500):
+            pass
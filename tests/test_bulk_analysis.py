@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from src.document_analyzer.bulk_analysis import BulkDocumentAnalyzer
+from tests.conftest import write_pdf
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    def analyze_document(self, text, session_id=None, priority=None):
+        self.calls.append(text)
+        if "broken" in text:
+            raise ValueError("unparseable")
+        return {"Title": text.split("---\n", 1)[-1].strip()[:20], "PageCount": 1}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("a", "b", "c"):
+        write_pdf(docs / f"{name}.pdf", [f"Document {name}"])
+    write_pdf(docs / "d.pdf", ["broken document"])
+    return docs
+
+
+def bulk(tmp_path, analyzer):
+    return BulkDocumentAnalyzer(str(tmp_path / "out" / "results.jsonl"), concurrency=2, extraction_workers=1, analyzer=analyzer)
+
+
+def test_run_skips_completed_documents_and_retries_errors(tmp_path, corpus):
+    analyzer = FakeAnalyzer()
+    assert bulk(tmp_path, analyzer).run(str(corpus)) == {"ok": 3, "error": 1, "skipped": 0}
+    again = FakeAnalyzer()
+    assert bulk(tmp_path, again).run(str(corpus)) == {"ok": 0, "error": 1, "skipped": 3}
+    assert len(again.calls) == 1
+
+
+def test_resume_after_crash_truncates_the_torn_line(tmp_path, corpus):
+    first = bulk(tmp_path, FakeAnalyzer())
+    key_a = first.document_key(corpus / "a.pdf")
+    first.output_path.write_text(json.dumps({"key": key_a, "status": "ok", "metadata": {"Title": "a"}}) + "\n" + '{"key": "b", "pa', encoding="utf-8")
+
+    analyzer = FakeAnalyzer()
+    counts = bulk(tmp_path, analyzer).run(str(corpus))
+    assert counts == {"ok": 2, "error": 1, "skipped": 1}
+    lines = first.output_path.read_text(encoding="utf-8").splitlines()
+    assert all(json.loads(line) for line in lines)   # no record glued onto the fragment
+    assert bulk(tmp_path, FakeAnalyzer())._completed_keys() == {first.document_key(corpus / f"{n}.pdf") for n in "abc"}
+
+
+def test_results_frame_keeps_latest_ok_record_and_skips_bad_lines(tmp_path):
+    b = bulk(tmp_path, FakeAnalyzer())
+    rows = [
+        {"key": "k1", "status": "ok", "metadata": {"Title": "old"}},
+        {"key": "k2", "status": "error", "error": "x"},
+        {"key": "k1", "status": "ok", "metadata": {"Title": "new"}},
+    ]
+    b.output_path.write_text("\n".join(json.dumps(r) for r in rows) + '\n{"key": "torn', encoding="utf-8")
+    df = b.results_frame()
+    assert df["key"].tolist() == ["k1"] and df["Title"].tolist() == ["new"]
+
+
+def test_results_frame_without_successes_is_empty(tmp_path):
+    b = bulk(tmp_path, FakeAnalyzer())
+    b.output_path.write_text(json.dumps({"key": "k", "status": "error"}) + "\n", encoding="utf-8")
+    df = b.results_frame()
+    assert df.empty and "key" in df.columns
+
+
+def test_export_parquet_round_trips(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    b = bulk(tmp_path, FakeAnalyzer())
+    b.output_path.write_text(json.dumps({"key": "k1", "status": "ok", "metadata": {"Title": "t"}}) + "\n", encoding="utf-8")
+    path = b.export_parquet(str(tmp_path / "out.parquet"))
+    assert pd.read_parquet(path)["Title"].tolist() == ["t"]
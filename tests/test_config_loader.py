@@ -0,0 +1,22 @@
+import os
+
+from utils.config_loader import load_config
+
+
+def test_config_is_parsed_once_per_version_and_copied(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("retriever:\n  top_k: 5\n")
+    first = load_config(str(path))
+    first["retriever"]["top_k"] = 99
+    assert load_config(str(path)) == {"retriever": {"top_k": 5}}
+
+    path.write_text("retriever:\n  top_k: 7\n")
+    stamp = os.stat(path).st_mtime + 5
+    os.utime(path, (stamp, stamp))
+    assert load_config(str(path))["retriever"]["top_k"] == 7
+
+
+def test_repository_config_loads():
+    config = load_config()
+    assert config["retriever"]["top_k"] == 5
+    assert config["admission"]["rag_context_tokens"] == config["retriever"]["top_k"] * config["retriever"]["chunk_size"]
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from utils.deduplication import MinHashDeduplicator, build_deduplicator, strip_page_furniture
+
+VOCABULARY = [f"word{i}" for i in range(500)]
+
+
+def paragraph(seed: int, length: int = 120) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(length))
+
+
+def test_furniture_lines_are_stripped_from_every_page():
+    pages = [
+        Document(page_content=f"ACME Corp Confidential\nBody about {'abcde'[i] * 3}\nPage {i + 1} of 5", metadata={"source": "a.pdf", "page": i})
+        for i in range(5)
+    ]
+    cleaned = strip_page_furniture(pages, min_pages=3, min_ratio=0.5)
+    for i, doc in enumerate(cleaned):
+        assert doc.page_content == f"Body about {'abcde'[i] * 3}"
+        assert doc.metadata == pages[i].metadata
+
+
+def test_numeric_table_pages_survive_furniture_stripping():
+    rng = random.Random(7)
+    pages = []
+    for i in range(6):
+        rows = [f"{rng.randint(1000, 9999)}\n{rng.randint(1000, 9999)}.{rng.randint(10, 99)}\n${rng.randint(1, 9)},{rng.randint(100, 999)}"
+                for _ in range(4)]
+        body = "\n".join(rows) + f"\n{rng.randint(1000, 9999)}"
+        pages.append(Document(page_content=body, metadata={"source": "t.pdf", "page": i}))
+    pages = [Document(page_content=f"ACME Corp Confidential\n{p.page_content}\n{i + 1}", metadata=p.metadata)
+             for i, p in enumerate(pages)]
+    cleaned = strip_page_furniture(pages, min_pages=3, min_ratio=0.5)
+    for page, doc in zip(pages, cleaned):
+        lines = page.page_content.splitlines()
+        # Header and increasing page number go; every number row (including the last) stays
+        assert doc.page_content.splitlines() == lines[1:-1]
+
+
+def test_bare_numbers_that_do_not_increase_are_not_page_numbers():
+    pages = [Document(page_content=f"Totals for region {'abcd'[i]}\n{value}", metadata={"source": "a.pdf", "page": i})
+             for i, value in enumerate([4500, 120, 880, 42])]
+    assert strip_page_furniture(pages, min_pages=3) == pages
+
+
+def test_short_documents_and_pageless_documents_are_untouched():
+    pages = [Document(page_content="Header\nbody", metadata={"source": "a.pdf", "page": i}) for i in range(2)]
+    loose = [Document(page_content="Header\nbody", metadata={"source": "b.txt"})]
+    assert strip_page_furniture(pages + loose, min_pages=3) == pages + loose
+
+
+def test_exact_and_near_duplicates_are_dropped_with_provenance():
+    base = paragraph(1)
+    words = base.split()
+    words[60] = "changed"
+    chunks = [
+        Document(page_content=base, metadata={"source": "a.pdf", "page": 0}),
+        Document(page_content=base, metadata={"source": "b.pdf", "page": 3}),
+        Document(page_content=" ".join(words), metadata={"source": "c.pdf", "page": 1}),
+        Document(page_content=paragraph(2), metadata={"source": "a.pdf", "page": 1}),
+    ]
+    kept = MinHashDeduplicator(threshold=0.8).deduplicate(chunks)
+    assert [d.page_content for d in kept] == [base, paragraph(2)]
+    assert kept[0].metadata["also_in"] == [{"source": "b.pdf", "page": 3}, {"source": "c.pdf", "page": 1}]
+    assert "also_in" not in chunks[0].metadata
+
+
+def test_distinct_chunks_are_all_kept():
+    chunks = [Document(page_content=paragraph(seed)) for seed in range(50)]
+    assert len(MinHashDeduplicator().deduplicate(chunks)) == 50
+
+
+def test_blank_chunks_are_dropped():
+    assert MinHashDeduplicator().deduplicate([Document(page_content="  \n")]) == []
+
+
+def test_invalid_banding_is_rejected():
+    with pytest.raises(ValueError):
+        MinHashDeduplicator(num_perm=64, bands=10)
+
+
+def test_build_from_config():
+    dedup = build_deduplicator({"near_duplicate_threshold": 0.7, "num_perm": 32, "bands": 8})
+    assert (dedup.threshold, dedup.num_perm, dedup.rows) == (0.7, 32, 4)
@@ -0,0 +1,55 @@
+import zipfile
+
+import pytest
+
+from tests.conftest import write_pdf
+from utils.document_loaders import get_process_pool, load_documents, supported_extensions
+
+
+def write_docx(path):
+    body = (
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        "<w:p><w:r><w:t>First</w:t><w:tab/><w:t>para</w:t></w:r></w:p>"
+        "<w:p><w:r><w:t>Second para</w:t></w:r></w:p>"
+        "</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", body)
+    return str(path)
+
+
+def test_supported_extensions():
+    assert {".pdf", ".txt", ".md", ".docx"} <= supported_extensions()
+
+
+def test_pdf_pages_have_pypdf_style_metadata(tmp_path):
+    path = write_pdf(tmp_path / "a.pdf", ["alpha page", "beta page"])
+    docs = load_documents([path])
+    assert [d.metadata["page"] for d in docs] == [0, 1]
+    assert docs[1].metadata == {"source": path, "page": 1, "page_label": "2", "total_pages": 2}
+    assert "beta page" in docs[1].page_content
+
+
+def test_docx_paragraphs_and_tabs(tmp_path):
+    docs = load_documents([write_docx(tmp_path / "a.docx")])
+    assert docs[0].page_content == "First\tpara\nSecond para"
+
+
+def test_parallel_load_keeps_input_order(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(f"file {i}", encoding="utf-8")
+        paths.append(path)
+    paths.append(write_pdf(tmp_path / "z.pdf", ["pdf text"]))
+    docs = load_documents(paths, max_workers=2)
+    assert [d.page_content for d in docs[:4]] == [f"file {i}" for i in range(4)]
+    assert "pdf text" in docs[4].page_content
+    assert get_process_pool()._mp_context.get_start_method() in ("forkserver", "spawn")
+
+
+def test_unknown_extension_is_rejected(tmp_path):
+    path = tmp_path / "a.xyz"
+    path.write_text("x")
+    with pytest.raises(ValueError):
+        load_documents([path])
@@ -0,0 +1,60 @@
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.multi_document_chat.data_ingestion import DocumentIngestor
+from utils import session_gc
+from utils.document_router import RoutedFaissIndex, RoutedRetriever, is_routed_index, remove_routing
+from utils.vector_search import search_by_vectors
+
+TOPICS = ["contract renewal", "budget forecast", "hiring plan", "office move", "security audit", "travel policy", "product launch", "tax filing"]
+
+
+def chunks(topics=TOPICS, per_document=4):
+    return [
+        Document(page_content=f"{topic} section {i} covers {topic.split()[1]} details", metadata={"source": f"{topic}.pdf", "n": i})
+        for topic in topics for i in range(per_document)
+    ]
+
+
+def test_routed_search_finds_the_flat_top_hits(tmp_path, embeddings):
+    routed = RoutedFaissIndex.build(str(tmp_path / "r"), chunks(), embeddings, top_documents=2)
+    assert is_routed_index(tmp_path / "r")
+    assert [d["count"] for d in routed.manifest["documents"]] == [4] * len(TOPICS)
+    flat = FAISS.from_documents(chunks(), embeddings)
+    for chunk in chunks()[::3]:
+        # An exact chunk text has one unambiguous nearest neighbour: itself
+        assert flat.similarity_search(chunk.page_content, k=1)[0].page_content == chunk.page_content
+        routed_hits = routed.similarity_search(chunk.page_content, k=3)
+        assert routed_hits[0].page_content == chunk.page_content
+        assert len(routed_hits) == 3
+
+
+def test_batched_routed_search_matches_single_queries(tmp_path, embeddings):
+    retriever = RoutedFaissIndex.build(str(tmp_path / "r"), chunks(), embeddings).as_retriever(k=3)
+    queries = ["contract", "tax filing", "launch"]
+    batched = search_by_vectors(retriever, embeddings.embed_documents(queries))
+    assert [[d.page_content for d in docs] for docs in batched] == [[d.page_content for d in retriever.invoke(q)] for q in queries]
+
+
+def test_routed_retriever_is_similarity_only(tmp_path, embeddings):
+    routed = RoutedFaissIndex.build(str(tmp_path / "r"), chunks(), embeddings)
+    assert routed.as_retriever(k=2, search_type="mmr").search_type == "similarity"
+    with pytest.raises(ValueError):
+        RoutedRetriever(vectorstore=routed, search_type="mmr")
+
+
+def test_reingesting_a_small_session_drops_stale_routing(tmp_path, embeddings, monkeypatch):
+    monkeypatch.setattr(session_gc, "_collector", object())
+    ingestor = DocumentIngestor(temp_dir=str(tmp_path / "data"), faiss_dir=str(tmp_path / "faiss"), session_id="session_reingest")
+    monkeypatch.setattr(ingestor.model_loader, "load_embeddings", lambda: embeddings)
+    min_documents = ingestor.model_loader.config["retriever"]["route_min_documents"]
+
+    assert isinstance(ingestor._create_retriever(chunks(TOPICS[:min_documents])), RoutedRetriever)
+    assert is_routed_index(ingestor.session_faiss_dir)
+
+    retriever = ingestor._create_retriever(chunks(TOPICS[:2]))
+    assert not isinstance(retriever, RoutedRetriever)
+    assert not is_routed_index(ingestor.session_faiss_dir)
+    assert not (ingestor.session_faiss_dir / "centroids.npy").exists()
+    remove_routing(ingestor.session_faiss_dir)  # idempotent
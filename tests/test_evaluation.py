@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from src.multi_document_chat.evaluation import RetrievalEvaluator
+from tests.conftest import write_pdf
+from utils.local_models import LocalHashEmbeddings
+
+GRID = {"chunk_size": [64], "chunk_overlap": [0], "index_type": ["Flat"], "k": [1, 2], "search_type": ["similarity"]}
+
+
+@pytest.fixture
+def evaluator(tmp_path):
+    pdf = write_pdf(tmp_path / "fruit.pdf", ["apples grow on trees", "apples are red", "bananas are yellow"])
+    labels = tmp_path / "labels.jsonl"
+    labels.write_text("\n".join(json.dumps(record) for record in [
+        {"question": "apples", "source": "fruit.pdf", "pages": [1, 2]},
+        {"question": "bananas are yellow", "source": "fruit.pdf", "page": 3},
+    ]), encoding="utf-8")
+    return RetrievalEvaluator([pdf], str(labels), embeddings=LocalHashEmbeddings(dimensions=256))
+
+
+def test_recall_counts_every_relevant_page_and_hit_rate_any(evaluator):
+    results = evaluator.run(GRID).set_index("k")
+    assert list(results.index) == [1, 2]
+    # k=1: both questions hit, but only one of the two apple pages is retrieved
+    assert results.loc[1, "hit_rate_at_k"] == 1.0
+    assert results.loc[1, "recall_at_k"] == pytest.approx(0.75)
+    assert results.loc[2, "recall_at_k"] == 1.0
+    assert results.loc[1, "mrr"] == 1.0
+
+
+def test_pick_cheapest_uses_recall(evaluator):
+    results = evaluator.run(GRID)
+    assert RetrievalEvaluator.pick_cheapest(results, min_recall=0.9)["k"] == 2
+    assert RetrievalEvaluator.pick_cheapest(results, min_recall=0.5)["k"] == 1
@@ -0,0 +1,94 @@
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+
+from utils.instrumentation import MetricsRegistry, estimate_tokens, span, current_span, get_registry, set_readiness, readiness
+
+
+def test_estimate_tokens_handles_nested_values():
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens([Document(page_content="abcd"), HumanMessage(content="abcd")]) == 2
+    assert estimate_tokens({"a": "abcd", "b": ["abcd", "abcd"]}) == 3
+
+
+def test_registry_renders_counters_and_cumulative_histograms():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("requests_total", 2, {"route": "chat"}, "Requests")
+    registry.inc("requests_total", 1, {"route": "chat"})
+    for value in (0.05, 0.5, 5.0):
+        registry.observe("latency_seconds", value, {"route": "chat"}, "Latency")
+    text = registry.render()
+    assert 'requests_total{route="chat"} 3.0' in text
+    assert 'latency_seconds_bucket{route="chat",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="chat",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="chat",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="chat"} 3' in text
+
+
+def test_registry_is_thread_safe():
+    registry = MetricsRegistry()
+
+    def work():
+        for _ in range(1000):
+            registry.inc("hits_total")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert "hits_total 8000.0" in registry.render()
+
+
+def test_nested_spans_inherit_session_and_export_metrics():
+    with span("test.outer", session_id="s1") as outer:
+        with span("test.inner") as inner:
+            assert current_span() is inner
+            inner.record(input_tokens=7, chunks=3)
+        assert inner.session_id == "s1"
+        assert current_span() is outer
+    assert current_span() is None
+    text = get_registry().render()
+    assert 'document_portal_stage_tokens_total{direction="input",stage="test.inner"} 7.0' in text
+    assert 'document_portal_stage_chunks_total{stage="test.inner"} 3.0' in text
+
+
+def test_span_counts_errors():
+    try:
+        with span("test.failing"):
+            raise KeyError("boom")
+    except KeyError:
+        pass
+    assert 'document_portal_stage_errors_total{error="KeyError",stage="test.failing"} 1.0' in get_registry().render()
+
+
+def test_readiness_flips():
+    set_readiness(False, phase="warming")
+    assert readiness() == {"ready": False, "phase": "warming"}
+    set_readiness(True)
+    assert readiness()["ready"] is True
+
+
+def test_traced_runnables_stay_async():
+    import asyncio
+    from langchain_core.runnables import RunnableLambda
+    from utils.instrumentation import traced
+
+    calls = []
+
+    def sync_call(x):
+        calls.append("sync")
+        return x + 1
+
+    async def async_call(x):
+        calls.append("async")
+        return x + 1
+
+    wrapped = traced("test.traced", RunnableLambda(sync_call, afunc=async_call))
+    assert wrapped.invoke(1) == 2
+    assert asyncio.run(wrapped.ainvoke(1)) == 2
+    assert calls == ["sync", "async"]
+    assert 'document_portal_stage_duration_seconds_count{stage="test.traced"} 2' in get_registry().render()
@@ -0,0 +1,149 @@
+import time
+import asyncio
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from utils.instrumentation import span
+from utils.llm_router import CircuitBreaker, HedgeBudget, HedgedChatModel, LatencyTracker
+
+
+class ScriptedChatModel(BaseChatModel):
+    reply: str = "ok"
+    delay_s: float = 0.0
+    fail: bool = False
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.delay_s)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+def test_breaker_open_half_open_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=0.05)
+    assert breaker.allow()
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is True
+    assert not breaker.available() and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.available()
+    assert breaker.allow()                      # the single half-open trial
+    assert not breaker.available() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()  # closed again
+
+
+def test_failed_trial_reopens_and_released_trial_can_be_retaken():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_latency_percentile():
+    tracker = LatencyTracker(window=10)
+    assert tracker.percentile(0.5) is None
+    for value in range(20):
+        tracker.add(float(value))
+    assert len(tracker) == 10
+    assert tracker.percentile(0.95) == 19.0
+
+
+def test_fast_primary_never_consumes_secondary_trial():
+    secondary = ScriptedChatModel(reply="secondary")
+    model = HedgedChatModel(primary=ScriptedChatModel(reply="primary"), secondary=secondary, default_hedge_delay_s=1.0,
+                            failure_threshold=1, reset_timeout_s=0.05)
+    model._breakers["secondary"].record_failure()
+    time.sleep(0.06)
+    for _ in range(3):
+        assert model.invoke("hi").content == "primary"
+    # The hedge never launched, so the secondary's half-open trial is still free
+    assert secondary.calls == 0
+    assert model._breakers["secondary"].allow()
+
+
+def test_slow_primary_is_hedged_and_secondary_wins():
+    model = HedgedChatModel(primary=ScriptedChatModel(reply="primary", delay_s=0.5), secondary=ScriptedChatModel(reply="secondary"),
+                            default_hedge_delay_s=0.05)
+    result = model.invoke("hi")
+    assert result.content == "secondary"
+    assert result.response_metadata["routed_provider"] == "secondary"
+
+
+def test_failing_primary_falls_over_and_opens_its_breaker():
+    primary = ScriptedChatModel(reply="primary", fail=True)
+    model = HedgedChatModel(primary=primary, secondary=ScriptedChatModel(reply="secondary"), failure_threshold=2, reset_timeout_s=60)
+    for _ in range(3):
+        assert model.invoke("hi").content == "secondary"
+    assert primary.calls == 2  # skipped once its breaker opened
+
+
+def test_async_hedge_cancels_loser_and_releases_its_trial():
+    model = HedgedChatModel(primary=ScriptedChatModel(reply="primary"), secondary=ScriptedChatModel(reply="secondary", delay_s=0.5),
+                            default_hedge_delay_s=0.01, failure_threshold=1, reset_timeout_s=0.01)
+    model._breakers["primary"].record_failure()
+    model._breakers["secondary"].record_failure()
+    time.sleep(0.02)
+    # Both breakers half-open; the primary answers after the hedge, so the secondary is cancelled
+    model.primary.delay_s = 0.05
+    assert asyncio.run(model.ainvoke("hi")).content == "primary"
+    assert model._breakers["secondary"].allow()
+
+
+def test_hedge_budget_caps_the_hedge_ratio():
+    budget = HedgeBudget(ratio=0.25, burst=1)
+    assert budget.try_spend() and not budget.try_spend()
+    for _ in range(4):
+        budget.deposit()
+    assert budget.try_spend() and not budget.try_spend()
+
+
+def test_exhausted_budget_stops_hedging():
+    secondary = ScriptedChatModel(reply="secondary")
+    model = HedgedChatModel(primary=ScriptedChatModel(reply="primary", delay_s=0.1), secondary=secondary,
+                            default_hedge_delay_s=0.01, hedge_budget_ratio=0.0, hedge_budget_burst=1)
+    assert model.invoke("hi").content == "secondary"
+    assert model.invoke("hi").content == "primary"
+    assert secondary.calls == 1
+
+
+def test_sync_hedging_pauses_while_abandoned_losers_run():
+    primary = ScriptedChatModel(reply="primary", delay_s=0.3)
+    model = HedgedChatModel(primary=primary, secondary=ScriptedChatModel(reply="secondary"),
+                            default_hedge_delay_s=0.01, max_abandoned_losers=1)
+    assert model.invoke("hi").content == "secondary"   # the primary is left running
+    assert model._abandoned.value == 1
+    assert model.invoke("hi").content == "primary"     # no second abandoned thread
+    time.sleep(0.35)
+    assert model._abandoned.value == 0
+
+
+def test_latency_is_tracked_per_call_type():
+    model = HedgedChatModel(primary=ScriptedChatModel(reply="primary"), secondary=ScriptedChatModel(reply="secondary"))
+    with span("rag.rewrite"):
+        model.invoke("hi")
+    model.invoke("hi")
+    assert set(model._latency) == {("primary", "rag.rewrite"), ("primary", "default")}
@@ -0,0 +1,39 @@
+import json
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from model.models import Metadata, SummaryResponse
+from utils.local_models import LocalChatModel, LocalHashEmbeddings
+
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_hash_embeddings_are_deterministic_and_normalized():
+    embeddings = LocalHashEmbeddings(dimensions=256)
+    a, b = embeddings.embed_documents(["quarterly budget review", "quarterly budget review"])
+    assert a == b == embeddings.embed_query("quarterly budget review")
+    assert abs(cosine(a, a) - 1.0) < 1e-9
+    related = embeddings.embed_query("budget review meeting")
+    unrelated = embeddings.embed_query("holiday travel photos")
+    assert cosine(a, related) > cosine(a, unrelated)
+
+
+def test_chat_model_emits_schema_valid_structured_output():
+    llm = LocalChatModel()
+    metadata = llm.invoke([HumanMessage(content='Return "SentimentTone" and more. Analyze this document:\n-- Page 1 --\nAnnual Report. It grew. It shrank.')])
+    parsed = Metadata.model_validate(json.loads(metadata.content))
+    assert parsed.Title == "Annual Report. It grew. It shrank." and parsed.PageCount == 1
+
+    comparison = llm.invoke([HumanMessage(content='Schema "changes" "Page". Input documents:\n--- Page 1 ---\na\n--- Page 2 ---\nb')])
+    assert [c.Page for c in SummaryResponse.model_validate(json.loads(comparison.content)).root] == ["1", "2"]
+
+
+def test_chat_model_rewrites_and_answers_from_context():
+    llm = LocalChatModel()
+    rewrite = llm.invoke([SystemMessage(content="Rewrite as a standalone question."), HumanMessage(content=" what changed? ")])
+    assert rewrite.content == "what changed?"
+    answer = llm.invoke([SystemMessage(content="Answer using context.\n\nrevenue grew twelve percent in the third quarter"), HumanMessage(content="q")])
+    assert answer.content.rstrip(".") in "revenue grew twelve percent in the third quarter"
+    assert answer.usage_metadata["output_tokens"] > 0
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from utils import page_cache
+from utils.page_cache import PageCache, cached_pages, content_hash, pdf_pages
+from tests.conftest import write_pdf
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / "cache"), max_size_mb=1)
+    monkeypatch.setattr(page_cache, "get_page_cache", lambda: cache)
+    return cache
+
+
+def test_put_then_read_single_pages_and_iterate(cache):
+    pages = [f"page {i} " + "x" * i for i in range(12)]
+    cache.put("ab" * 32, iter(pages), len(pages))
+    assert "ab" * 32 in cache
+    assert cache.page_count("ab" * 32) == 12
+    assert cache.read_page("ab" * 32, 7) == pages[7]
+    assert list(cache.iter_pages("ab" * 32)) == pages
+    with pytest.raises(IndexError):
+        cache.read_page("ab" * 32, 12)
+
+
+def test_short_writes_leave_no_entry(cache):
+    with pytest.raises(ValueError):
+        cache.put("cd" * 32, iter(["only one"]), 2)
+    assert "cd" * 32 not in cache
+    assert not list(cache.cache_dir.glob("*/*.tmp*"))
+
+
+def test_cached_pages_parses_once(tmp_path, cache):
+    path = write_pdf(tmp_path / "doc.pdf", ["First page", "Second page"])
+    calls = []
+
+    def counting_extract(p):
+        calls.append(p)
+        return pdf_pages(p)
+
+    first = list(cached_pages(path, counting_extract))
+    assert [t.strip() for t in first] == ["First page", "Second page"]
+    assert list(cached_pages(path, counting_extract)) == first
+    assert len(calls) == 1
+    assert content_hash(path) in cache
+
+
+def test_extractor_failure_propagates_and_is_not_cached(tmp_path, cache):
+    path = tmp_path / "doc.txt"
+    path.write_text("content")
+
+    def failing_extract(p):
+        def pages():
+            yield "page one"
+            raise RuntimeError("corrupt page 2")
+        return pages(), 3
+
+    with pytest.raises(RuntimeError, match="corrupt page 2"):
+        list(cached_pages(path, failing_extract))
+    assert content_hash(path) not in cache
+    assert not list(cache.cache_dir.glob("*/*.tmp*"))
+
+
+def test_cache_write_failure_still_returns_pages(tmp_path, cache, monkeypatch):
+    path = tmp_path / "doc.txt"
+    path.write_text("content")
+
+    def broken_writer(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache, "open_writer", broken_writer)
+    assert list(cached_pages(path, lambda p: (iter(["a", "b"]), 2))) == ["a", "b"]
+
+
+def test_pages_stream_on_miss_and_entry_needs_full_consumption(tmp_path, cache):
+    path = tmp_path / "doc.txt"
+    path.write_text("content")
+    parsed = []
+
+    def tracking_extract(p):
+        def pages():
+            for text in ("one", "two", "three"):
+                parsed.append(text)
+                yield text
+        return pages(), 3
+
+    stream = cached_pages(path, tracking_extract)
+    assert next(stream) == "one" and parsed == ["one"]   # nothing parsed ahead of the caller
+    stream.close()
+    assert content_hash(path) not in cache
+    assert not list(cache.cache_dir.glob("*/*.tmp*"))
+
+    assert list(cached_pages(path, tracking_extract)) == ["one", "two", "three"]
+    assert cache.page_count(content_hash(path)) == 3
+
+
+def test_unreadable_entry_is_reparsed(tmp_path, cache):
+    path = tmp_path / "doc.txt"
+    path.write_text("content")
+    cache._path(content_hash(path)).parent.mkdir(parents=True, exist_ok=True)
+    cache._path(content_hash(path)).write_bytes(b"garbage!" * 4)
+    assert list(cached_pages(path, lambda p: (iter(["fresh"]), 1))) == ["fresh"]
+    assert list(cache.iter_pages(content_hash(path))) == ["fresh"]
+
+
+def test_trim_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path / "cache"), compression_level=1, max_size_mb=0.035)
+    for i, key in enumerate(("aa" * 32, "bb" * 32, "cc" * 32)):
+        cache.put(key, iter([os.urandom(10000).hex()]), 1)   # ~11 kB compressed: random hex only halves
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    os.utime(cache._path("aa" * 32), (2000, 2000))   # read recently
+    cache.put("dd" * 32, iter([os.urandom(10000).hex()]), 1)
+    assert "bb" * 32 not in cache
+    assert all(key in cache for key in ("aa" * 32, "cc" * 32, "dd" * 32))
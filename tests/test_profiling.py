@@ -0,0 +1,81 @@
+import json
+import time
+import tracemalloc
+
+import pytest
+
+from utils import profiling
+from utils.instrumentation import span
+
+
+@pytest.fixture
+def profiling_on(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_settings", {
+        "enabled": True, "output_dir": str(tmp_path), "sample_interval_ms": 1,
+        "traceback_frames": 5, "top_allocations": 5, "min_duration_ms": 0,
+    })
+    return tmp_path
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_disabled_profiling_starts_nothing(monkeypatch):
+    monkeypatch.setattr(profiling, "_settings", {"enabled": False})
+    assert profiling.start_stage_profile("test.off", "s1") is None
+
+
+def test_span_writes_memory_and_cpu_report(profiling_on):
+    tracing_before = tracemalloc.is_tracing()
+    with span("test.profiled", session_id="s1"):
+        retained = [bytearray(1024) for _ in range(2000)]
+        busy(0.1)
+    assert tracemalloc.is_tracing() == tracing_before
+
+    reports = list((profiling_on / "s1").glob("*_test.profiled_*.json"))
+    assert len(reports) == 1
+    report = json.loads(reports[0].read_text())
+    assert report["stage"] == "test.profiled" and report["error"] is None
+    assert report["peak_traced_bytes"] >= 2000 * 1024
+    assert report["retained_bytes"] >= 2000 * 1024
+    assert any("test_profiling.py" in site["site"] for site in report["top_allocations"])
+    assert report["cpu_samples"] > 0
+    assert reports[0].with_suffix(".folded").exists()
+    del retained
+
+
+def test_nested_stages_each_report_and_errors_are_recorded(profiling_on):
+    with pytest.raises(ValueError):
+        with span("test.outer", session_id="s2"):
+            with span("test.inner"):
+                busy(0.02)
+            raise ValueError("boom")
+    reports = {json.loads(p.read_text())["stage"]: json.loads(p.read_text()) for p in (profiling_on / "s2").glob("*.json")}
+    assert set(reports) == {"test.outer", "test.inner"}
+    assert reports["test.outer"]["error"] == "ValueError"
+    assert reports["test.outer"]["duration_seconds"] >= reports["test.inner"]["duration_seconds"]
+    assert profiling._active == {}
+
+
+def test_short_stages_are_not_written(profiling_on, monkeypatch):
+    monkeypatch.setitem(profiling._settings, "min_duration_ms", 10_000)
+    profile = profiling.start_stage_profile("test.short", "s3")
+    assert profile.stop() is None
+    assert not (profiling_on / "s3").exists()
+
+
+def test_rss_is_reported_before_at_peak_and_after(profiling_on):
+    with span("test.rss", session_id="s4"):
+        native = bytearray(64 * 1024 * 1024)   # touched pages count towards RSS
+        native[::4096] = b"x" * len(native[::4096])
+        busy(0.05)
+        del native
+    report = json.loads(next((profiling_on / "s4").glob("*.json")).read_text())
+    if report["rss_start_bytes"] is None:
+        pytest.skip("no /proc/self/statm on this platform")
+    assert report["rss_peak_bytes"] >= report["rss_start_bytes"] + 60 * 1024 * 1024
+    assert report["rss_peak_bytes"] >= report["rss_end_bytes"]
+    assert report["max_rss_bytes"] > 0
@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+from utils import session_gc
+from utils.session_gc import SessionGarbageCollector, touch_session, last_access, session_lease
+
+
+@pytest.fixture(autouse=True)
+def no_background_collector(monkeypatch):
+    # touch_session would otherwise start the configured collector over the real stores
+    monkeypatch.setattr(session_gc, "_collector", object())
+
+
+def make_session(store, name, size, age=0.0):
+    path = store / name
+    path.mkdir(parents=True)
+    (path / "index.faiss").write_bytes(b"x" * size)
+    touch_session(path)
+    marker = store / session_gc.ACCESS_DIR / name
+    stamp = time.time() - age
+    os.utime(marker, (stamp, stamp))
+    return path
+
+
+def test_touch_session_records_access(tmp_path):
+    path = make_session(tmp_path, "session_a", 10, age=100)
+    before = last_access(path)
+    touch_session(path)
+    assert last_access(path) > before
+
+
+def test_evicts_least_recently_used_down_to_watermark(tmp_path):
+    make_session(tmp_path, "session_old", 400, age=300)
+    make_session(tmp_path, "session_mid", 400, age=200)
+    make_session(tmp_path, "session_new", 400, age=100)
+    gc = SessionGarbageCollector(stores=[str(tmp_path)], max_disk_bytes=1000, low_watermark=0.9)
+    gc.tick()
+    assert sorted(gc.scan()) == ["session_mid", "session_new"]
+    assert (tmp_path / session_gc.TRASH_DIR).is_dir()
+    gc.tick()
+    assert not any((tmp_path / session_gc.TRASH_DIR).rglob("*.faiss"))
+
+
+def test_leased_session_is_never_evicted(tmp_path):
+    old = make_session(tmp_path, "session_old", 600, age=300)
+    make_session(tmp_path, "session_new", 600, age=100)
+    gc = SessionGarbageCollector(stores=[str(tmp_path)], max_disk_bytes=1000)
+    with session_lease(old):
+        gc.tick()
+        assert sorted(gc.scan()) == ["session_old"]
+    assert not any((tmp_path / session_gc.LEASE_DIR).iterdir())
+
+
+def test_size_follows_nested_rewrites(tmp_path):
+    path = make_session(tmp_path, "session_a", 100)
+    gc = SessionGarbageCollector(stores=[str(tmp_path)])
+    assert gc.scan()["session_a"]["bytes"] == 100
+    dir_mtime = path.stat().st_mtime_ns
+    (path / "index.faiss").write_bytes(b"x" * 5000)
+    os.utime(path, ns=(dir_mtime, dir_mtime))
+    assert gc.scan()["session_a"]["bytes"] == 5000
+
+
+def test_bookkeeping_and_shared_entries_are_not_sessions(tmp_path):
+    make_session(tmp_path, "session_a", 10)
+    (tmp_path / "_shared").mkdir()
+    (tmp_path / "index.faiss").write_bytes(b"x")
+    assert list(SessionGarbageCollector(stores=[str(tmp_path)]).scan()) == ["session_a"]
@@ -0,0 +1,73 @@
+import io
+import os
+import time
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.single_document_chat.data_ingestion import SingleDocIngestor
+from src.single_document_chat.retrieval import ConversationalRAG
+from tests.conftest import write_pdf
+from utils.sharded_index import MANIFEST_NAME, ShardedFaissIndex, get_sharded_index, is_sharded_index
+
+TEXTS = [f"{topic} paragraph {i} {topic.split()[0]}" for topic in ("contract renewal", "budget forecast", "hiring plan", "office move") for i in range(6)]
+
+
+def docs(texts=TEXTS):
+    return [Document(page_content=t, metadata={"source": "doc.pdf", "n": i}) for i, t in enumerate(texts)]
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_sharded_search_matches_flat_search(tmp_path, embeddings, mmap):
+    index = ShardedFaissIndex.build(str(tmp_path / "s"), docs(), embeddings, num_shards=3, mmap=mmap)
+    assert is_sharded_index(tmp_path / "s")
+    assert [s["count"] for s in index.manifest["shards"]] == [8, 8, 8]
+    flat = FAISS.from_documents(docs(), embeddings)
+    for query in ("contract", "budget forecast", "office hiring"):
+        vector = embeddings.embed_query(query)
+        expected = [d.metadata["n"] for d in flat.similarity_search_by_vector(vector, k=5)]
+        assert [d.metadata["n"] for d in index.similarity_search_by_vector(vector, k=5)] == expected
+
+
+def test_more_shards_than_documents_and_empty_builds(tmp_path, embeddings):
+    small = ShardedFaissIndex.build(str(tmp_path / "small"), docs(TEXTS[:2]), embeddings, num_shards=8)
+    assert len(small.manifest["shards"]) == 2
+    assert len(small.similarity_search("contract", k=10)) == 2
+
+    empty = ShardedFaissIndex.build(str(tmp_path / "empty"), [], embeddings)
+    assert empty.manifest["shards"] == []
+    assert empty.similarity_search("anything") == []
+    assert empty.as_retriever(k=3).invoke("anything") == []
+
+
+def test_rebuilt_index_is_reopened_and_old_instance_stays_usable(tmp_path, embeddings):
+    path = str(tmp_path / "s")
+    ShardedFaissIndex.build(path, docs(), embeddings, num_shards=2)
+    first = get_sharded_index(path, embeddings)
+    assert get_sharded_index(path, embeddings) is first
+
+    ShardedFaissIndex.build(path, docs(TEXTS[:4]), embeddings, num_shards=2)
+    stamp = time.time() + 5
+    os.utime(tmp_path / "s" / MANIFEST_NAME, (stamp, stamp))
+    second = get_sharded_index(path, embeddings)
+    assert second is not first
+    assert len(second.similarity_search("contract", k=10)) == 4
+    # A request that fetched the old instance before the rebuild can still finish its search
+    assert first.similarity_search("contract", k=1)
+
+
+def test_single_document_chat_builds_and_reloads_sharded_indexes(tmp_path, monkeypatch):
+    pdf = write_pdf(tmp_path / "contract.pdf", TEXTS[:4])
+    upload = io.BytesIO(open(pdf, "rb").read())
+    upload.name = "contract.pdf"
+    ingestor = SingleDocIngestor(data_dir=str(tmp_path / "data"), faiss_dir=str(tmp_path / "faiss"), session_id="s1")
+    monkeypatch.setitem(ingestor.model_loader.config, "vector_store", {"mode": "sharded", "num_shards": 2})
+    monkeypatch.setitem(ingestor.model_loader.config, "deduplication", {"enabled": False})
+    retriever = ingestor.ingest_files([upload])
+    assert is_sharded_index(tmp_path / "faiss" / "s1")
+    assert retriever.invoke("contract")
+
+    reloaded = ConversationalRAG("s1", retriever=None).load_retriever_from_faiss(str(tmp_path / "faiss" / "s1"))
+    assert isinstance(reloaded.vectorstore, ShardedFaissIndex)
+    assert reloaded.invoke("contract")
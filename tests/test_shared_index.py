@@ -0,0 +1,103 @@
+import os
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from utils import session_gc
+from utils.session_gc import SessionGarbageCollector, touch_session
+from utils.shared_index import SharedFaissIndex, compact_index_dir, read_session_marker, write_session_marker
+
+
+@pytest.fixture(autouse=True)
+def no_background_collector(monkeypatch):
+    monkeypatch.setattr(session_gc, "_collector", object())
+
+
+def docs(*texts):
+    return [Document(page_content=t, metadata={"source": t}) for t in texts]
+
+
+def contents(results):
+    return [d.page_content for d in results]
+
+
+def test_searches_are_isolated_per_session(tmp_path, embeddings):
+    index = SharedFaissIndex(str(tmp_path), embeddings)
+    index.add_documents("a", docs("apples and pears", "red apples"))
+    index.add_documents("b", docs("apples in session b"))
+    vector = embeddings.embed_query("apples")
+    assert set(contents(index.similarity_search_by_vector("a", vector, k=5))) == {"apples and pears", "red apples"}
+    assert contents(index.similarity_search_by_vector("b", vector, k=5)) == ["apples in session b"]
+    assert index.similarity_search_by_vector("missing", vector) == []
+
+
+def test_two_writers_on_one_directory_lose_nothing(tmp_path, embeddings):
+    # Two instances stand in for two worker processes sharing the index directory
+    first = SharedFaissIndex(str(tmp_path), embeddings)
+    second = SharedFaissIndex(str(tmp_path), embeddings)
+    first.add_documents("a", docs("alpha one"))
+    second.add_documents("b", docs("beta two"))
+    first.add_documents("a", docs("alpha three"))
+    vector = embeddings.embed_query("alpha beta")
+    for index in (first, second, SharedFaissIndex(str(tmp_path), embeddings)):
+        assert set(contents(index.similarity_search_by_vector("a", vector, k=5))) == {"alpha one", "alpha three"}
+        assert contents(index.similarity_search_by_vector("b", vector, k=5)) == ["beta two"]
+
+
+def test_readding_a_tombstoned_session_does_not_revive_deleted_chunks(tmp_path, embeddings):
+    index = SharedFaissIndex(str(tmp_path), embeddings)
+    index.add_documents("a", docs("old chunk"))
+    index.delete_session("a")
+    vector = embeddings.embed_query("chunk")
+    assert index.similarity_search_by_vector("a", vector) == []
+    index.add_documents("a", docs("new chunk"))
+    assert contents(index.similarity_search_by_vector("a", vector, k=5)) == ["new chunk"]
+    assert index.compact() == 1
+    assert contents(index.similarity_search_by_vector("a", vector, k=5)) == ["new chunk"]
+
+
+def test_compaction_from_another_process_reaches_open_instances(tmp_path, embeddings):
+    index = SharedFaissIndex(str(tmp_path), embeddings)
+    index.add_documents("a", docs("one", "two"))
+    index.add_documents("b", docs("three"))
+    index.delete_session("a")
+    assert compact_index_dir(str(tmp_path)) == 2
+    index.similarity_search_by_vector("b", embeddings.embed_query("three"))
+    assert index.loaded_vectors() == 1
+
+
+def test_gc_eviction_tombstones_and_compacts_shared_sessions(tmp_path, embeddings):
+    store, shared_dir = tmp_path / "faiss_index", tmp_path / "faiss_index" / "_shared"
+    index = SharedFaissIndex(str(shared_dir), embeddings)
+    for name, age in (("session_old", 300), ("session_new", 100)):
+        index.add_documents(name, docs(f"text of {name} " * 50))
+        write_session_marker(store / name, name, str(shared_dir))
+        (store / name / "padding").write_bytes(b"x" * 600)
+        touch_session(store / name)
+        stamp = time.time() - age
+        os.utime(store / session_gc.ACCESS_DIR / name, (stamp, stamp))
+    assert read_session_marker(store / "session_old") == {"session_id": "session_old", "index_dir": str(shared_dir)}
+
+    SessionGarbageCollector(stores=[str(store)], max_disk_bytes=1000).tick()
+    assert not index.has_session("session_old")
+    assert index.has_session("session_new")
+    index.similarity_search_by_vector("session_new", embeddings.embed_query("text"))
+    assert index.loaded_vectors() == 1
+
+
+def test_only_searched_sessions_are_loaded_and_the_cap_evicts_the_oldest(tmp_path, embeddings):
+    SharedFaissIndex(str(tmp_path), embeddings).add_documents("a", docs("alpha one", "alpha two"))
+    writer = SharedFaissIndex(str(tmp_path), embeddings)
+    writer.add_documents("b", docs("beta"))
+    writer.add_documents("c", docs("gamma"))
+
+    reader = SharedFaissIndex(str(tmp_path), embeddings, max_loaded_sessions=2)
+    assert reader.loaded_vectors() == 0
+    vector = embeddings.embed_query("alpha")
+    assert len(reader.similarity_search_by_vector("a", vector, k=5)) == 2
+    assert reader.loaded_vectors() == 2
+    reader.similarity_search_by_vector("b", vector)
+    reader.similarity_search_by_vector("c", vector)
+    assert reader.loaded_vectors() == 2   # "a" was evicted
+    assert len(reader.similarity_search_by_vector("a", vector, k=5)) == 2
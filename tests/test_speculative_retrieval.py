@@ -0,0 +1,48 @@
+from langchain_community.vectorstores import FAISS
+from langchain_core.runnables import RunnableLambda
+
+from src.multi_document_chat.retrieval import ConversationalRAG
+from utils.instrumentation import get_registry
+
+TEXTS = ["invoice payment terms", "travel expense policy", "security audit findings", "holiday schedule"]
+
+
+def make_rag(embeddings, rewrite):
+    rag = ConversationalRAG("spec-session", FAISS.from_texts(TEXTS, embeddings).as_retriever(search_kwargs={"k": 1}))
+    rag.question_rewriter = RunnableLambda(lambda payload: rewrite)
+    return rag
+
+
+def outcome_count(outcome):
+    line = f'document_portal_speculative_retrieval_total{{outcome="{outcome}"}} '
+    for row in get_registry().render().splitlines():
+        if row.startswith(line):
+            return float(row.split()[-1])
+    return 0.0
+
+
+def test_identical_rewrite_reuses_speculative_hits(embeddings):
+    rag = make_rag(embeddings, "travel expense policy")
+    before = outcome_count("identical")
+    docs = rag._speculative_retrieve({"input": "travel expense policy", "chat_history": []})
+    assert [d.page_content for d in docs] == ["travel expense policy"]
+    assert outcome_count("identical") == before + 1
+
+
+def test_different_rewrite_searches_again(embeddings):
+    rag = make_rag(embeddings, "security audit findings")
+    docs = rag._speculative_retrieve({"input": "holiday", "chat_history": []})
+    assert [d.page_content for d in docs] == ["security audit findings"]
+
+
+def test_failed_speculative_search_falls_back_to_rewritten_query(embeddings):
+    rag = make_rag(embeddings, "invoice payment terms")
+
+    def broken(query):
+        raise RuntimeError("embedding provider down")
+
+    rag._search_raw = broken
+    before = outcome_count("error")
+    docs = rag._speculative_retrieve({"input": "what about invoices?", "chat_history": []})
+    assert [d.page_content for d in docs] == ["invoice payment terms"]
+    assert outcome_count("error") == before + 1
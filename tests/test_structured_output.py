@@ -0,0 +1,84 @@
+import pytest
+from pydantic import BaseModel
+
+from utils.instrumentation import get_registry
+from utils.llm_router import HedgedChatModel
+from utils.model_loader import ModelLoader
+from utils.structured_output import _extract_balanced, bind_native_json, parse_structured_output, repair_json
+
+
+class Summary(BaseModel):
+    title: str
+    pages: int
+
+
+class FailingFixer:
+    def parse(self, text):
+        raise AssertionError("the LLM fixer must not run")
+
+
+class EchoFixer:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def parse(self, text):
+        self.calls += 1
+        return self.result
+
+
+def test_extract_balanced_cuts_prose_and_closes_truncation():
+    assert _extract_balanced('Here you go: {"a": [1, 2]} hope it helps') == '{"a": [1, 2]}'
+    assert _extract_balanced('{"a": "}"} trailing') == '{"a": "}"}'
+    assert _extract_balanced('{"a": [1, {"b": "unterminated') == '{"a": [1, {"b": "unterminated"}]}'
+    with pytest.raises(ValueError):
+        _extract_balanced("no json here")
+
+
+@pytest.mark.parametrize("text", [
+    '<think>reasoning {not json}</think>{"title": "T", "pages": 3}',
+    'Sure!\n```json\n{"title": "T", "pages": 3,}\n```',
+    "{“title”: “T”, “pages”: 3}",
+    "{'title': 'T', 'pages': 3}",
+    '{"title": "T", "pages": 3',
+])
+def test_repair_json_fixes_common_defects(text):
+    assert repair_json(text) == {"title": "T", "pages": 3}
+
+
+def test_repair_json_rejects_garbage():
+    with pytest.raises(ValueError):
+        repair_json("{title: T pages 3}")
+
+
+def test_parse_prefers_direct_then_repair_and_counts_paths():
+    assert parse_structured_output('{"title": "T", "pages": 3}', Summary, FailingFixer(), "test.so") == {"title": "T", "pages": 3}
+    assert parse_structured_output('```json\n{"title": "T", "pages": "3",}\n```', Summary, FailingFixer(), "test.so") == {"title": "T", "pages": 3}
+    text = get_registry().render()
+    assert 'document_portal_structured_output_total{chain="test.so",path="direct"} 1.0' in text
+    assert 'document_portal_structured_output_total{chain="test.so",path="repaired"} 1.0' in text
+
+
+def test_parse_falls_back_to_llm_fixer():
+    fixer = EchoFixer({"title": "Fixed", "pages": 1})
+    assert parse_structured_output("the model refused", Summary, fixer, "test.fix") == {"title": "Fixed", "pages": 1}
+    assert fixer.calls == 1
+    assert parse_structured_output("still nothing", Summary, EchoFixer({"title": "x"}), "test.fix") == {"title": "x"}
+    text = get_registry().render()
+    assert 'document_portal_structured_output_total{chain="test.fix",path="llm_fixer"} 1.0' in text
+    assert 'document_portal_structured_output_total{chain="test.fix",path="llm_fixer_unvalidated"} 1.0' in text
+
+
+def test_native_json_is_bound_on_each_provider_of_a_hedged_router():
+    loader = ModelLoader()
+    loader.config = {**loader.config, "llm": {**loader.config["llm"], "local_backup": {**loader.config["llm"]["local"], "latency_ms": 0}},
+                     "llm_routing": {"enabled": True, "secondary": "local_backup"}}
+    router = loader.load_llm()
+    assert isinstance(router, HedgedChatModel)
+
+    bound = bind_native_json(router, Summary)
+    assert isinstance(bound, HedgedChatModel)
+    assert bound.primary.kwargs == bound.secondary.kwargs == {"response_format": {"type": "json_object"}}
+    assert bound._breakers is router._breakers and bound._latency is router._latency
+    assert router.primary is not bound.primary   # the shared router is left unbound
+    assert bound.invoke("hello").response_metadata["routed_provider"] in ("local", "local_backup")
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from utils.text_splitter import SentenceTokenSplitter, build_splitter
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda".split()
+
+
+def random_text(seed: int, sentences: int = 200) -> str:
+    rng = random.Random(seed)
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(20, 8), (32, 16), (64, 8), (10, 9)])
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_never_exceed_chunk_size(chunk_size, chunk_overlap, seed):
+    splitter = SentenceTokenSplitter(chunk_size, chunk_overlap, "approximate")
+    chunks = splitter.split_text(random_text(seed))
+    assert chunks
+    assert max(splitter._count_tokens(chunks)) <= chunk_size
+
+
+def test_chunks_cover_every_sentence_in_order():
+    text = random_text(1, sentences=50)
+    splitter = SentenceTokenSplitter(40, 10, "approximate")
+    chunks = splitter.split_text(text)
+    position = 0
+    for chunk in chunks:
+        found = text.find(chunk, max(0, position - len(chunk)))
+        assert found != -1
+        position = found + len(chunk)
+    assert chunks[-1].endswith(text.rstrip()[-10:])
+
+
+def test_overlap_is_whole_trailing_sentences():
+    splitter = SentenceTokenSplitter(12, 6, "approximate")
+    text = "One two three. Four five. Six seven eight. Nine ten. Eleven."
+    chunks = splitter.split_text(text)
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_sentence = chunk.split(". ")[0].rstrip(".") + "."
+        assert previous.endswith(first_sentence)
+
+
+def test_oversized_sentence_is_split_by_tokens():
+    splitter = SentenceTokenSplitter(10, 2, "approximate")
+    chunks = splitter.split_text(" ".join(["word"] * 35) + ".")
+    assert len(chunks) > 1
+    assert max(splitter._count_tokens(chunks)) <= 10
+
+
+def test_documents_keep_page_metadata_and_never_cross_pages():
+    splitter = build_splitter({"chunk_size": 16, "chunk_overlap": 4, "tokenizer": "approximate"})
+    docs = [Document(page_content=random_text(i, 10), metadata={"page": i}) for i in range(3)]
+    chunks = splitter.split_documents(docs)
+    for chunk in chunks:
+        assert chunk.page_content in docs[chunk.metadata["page"]].page_content
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        SentenceTokenSplitter(10, 10, "approximate")
@@ -0,0 +1,41 @@
+from langchain_community.vectorstores import FAISS
+
+from utils.vector_search import embed_queries, embed_query, get_vectorstore, search_by_vector, search_by_vectors
+
+TEXTS = [f"{topic} note {i}" for topic in ("invoice payment", "travel policy", "security audit", "holiday schedule") for i in range(5)]
+QUERIES = ["invoice", "travel", "audit findings", "holiday", "payment schedule"]
+
+
+def retriever(embeddings, **kwargs):
+    return FAISS.from_texts(TEXTS, embeddings).as_retriever(**kwargs)
+
+
+def contents(docs):
+    return [d.page_content for d in docs]
+
+
+def test_batched_search_matches_per_query_search(embeddings):
+    r = retriever(embeddings, search_kwargs={"k": 4})
+    vectors = embed_queries(r, QUERIES)
+    assert vectors[0] == embed_query(r, QUERIES[0])
+    batched = search_by_vectors(r, vectors)
+    assert [contents(docs) for docs in batched] == [contents(search_by_vector(r, v)) for v in vectors]
+    assert [contents(docs) for docs in batched] == [contents(r.invoke(q)) for q in QUERIES]
+
+
+def test_batched_search_handles_k_beyond_index_size(embeddings):
+    r = retriever(embeddings)
+    results = search_by_vectors(r, embed_queries(r, QUERIES[:2]), k=len(TEXTS) + 5)
+    assert all(len(docs) == len(TEXTS) for docs in results)
+    assert search_by_vectors(r, []) == []
+
+
+def test_mmr_falls_back_to_per_query_search(embeddings):
+    r = retriever(embeddings, search_type="mmr", search_kwargs={"k": 3, "fetch_k": 10})
+    vectors = embed_queries(r, QUERIES)
+    assert [contents(docs) for docs in search_by_vectors(r, vectors)] == [contents(search_by_vector(r, v)) for v in vectors]
+
+
+def test_unsplittable_retrievers_are_rejected(embeddings):
+    assert get_vectorstore(retriever(embeddings, search_type="similarity_score_threshold", search_kwargs={"score_threshold": 0.1})) is None
+    assert get_vectorstore(object()) is None
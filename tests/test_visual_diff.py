@@ -0,0 +1,63 @@
+import fitz
+import numpy as np
+import pytest
+
+from src.document_compare import visual_diff
+from src.document_compare.visual_diff import VisualDiffer, _PAGES_PER_TASK, _fingerprint_pages, dhash, fingerprint_pdf, hamming
+from tests.conftest import write_pdf
+from utils import page_cache
+from utils.page_cache import PageCache
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(page_cache, "get_page_cache", lambda: cache)
+    return cache
+
+
+def test_dhash_is_stable_under_uniform_brightness_shift():
+    gray = np.tile(np.arange(64, dtype=np.uint8), (48, 1))
+    assert hamming(dhash(gray), dhash(gray + 10)) == 0
+    assert hamming(dhash(gray), dhash(gray[:, ::-1].copy())) > 4
+
+
+def test_parallel_fingerprints_match_in_process(tmp_path):
+    path = write_pdf(tmp_path / "long.pdf", [f"Page number {i}" for i in range(_PAGES_PER_TASK + 5)])
+    parallel = fingerprint_pdf(path)
+    assert [fp["page"] for fp in parallel] == list(range(1, _PAGES_PER_TASK + 6))
+    assert parallel == _fingerprint_pages(path, list(range(_PAGES_PER_TASK + 5)), 36, 8)
+    assert [fp["page"] for fp in fingerprint_pdf(path, pages=[2, 7])] == [3, 8]
+
+
+def test_diff_flags_text_changes_shading_and_added_pages(tmp_path):
+    reference = write_pdf(tmp_path / "ref.pdf", ["Same text", "Old wording", "Plain page"])
+    actual = write_pdf(tmp_path / "act.pdf", ["Same  text", "New wording", "Plain page", "Appendix"])
+    with fitz.open(actual) as doc:
+        doc.load_page(2).draw_rect(fitz.Rect(100, 200, 500, 700), color=(0, 0, 0), fill=(0, 0, 0))
+        doc.saveIncr()
+
+    diffs, ref_texts, act_texts = VisualDiffer().diff(reference, actual)
+    assert [d.page for d in diffs] == [1, 2, 3, 4]
+    assert not diffs[0].changed  # whitespace-only reflow
+    assert "text differs" in diffs[1].reasons
+    assert diffs[2].changed and "text differs" not in diffs[2].reasons
+    assert diffs[3].reasons == ["page added"]
+    assert len(ref_texts) == 3 and act_texts[1].strip() == "New wording"
+
+
+def test_diff_reuses_cached_text_and_renders_only_same_text_pages(tmp_path, cache, monkeypatch):
+    reference = write_pdf(tmp_path / "ref.pdf", ["Same", "Old wording", "Also same"])
+    actual = write_pdf(tmp_path / "act.pdf", ["Same", "New wording", "Also same"])
+    VisualDiffer().diff(reference, actual)   # warms the page cache
+
+    def no_parse(path):
+        raise AssertionError("page text must come from the cache")
+
+    rendered = []
+    real_fingerprint = visual_diff.fingerprint_pdf
+    monkeypatch.setattr(visual_diff, "cached_pages", lambda path: page_cache.cached_pages(path, no_parse))
+    monkeypatch.setattr(visual_diff, "fingerprint_pdf", lambda path, dpi, hash_size, pages: rendered.append(pages) or real_fingerprint(path, dpi, hash_size, pages))
+    diffs, _, _ = VisualDiffer().diff(reference, actual)
+    assert [d.changed for d in diffs] == [False, True, False]
+    assert rendered == [[0, 2], [0, 2]]
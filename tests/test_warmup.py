@@ -0,0 +1,126 @@
+import os
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from utils import warmup
+from utils.index_cache import FaissIndexCache
+from utils.instrumentation import readiness, start_metrics_server
+
+
+def save_index(path, embeddings, texts):
+    FAISS.from_texts(texts, embeddings).save_local(str(path))
+    return str(path)
+
+
+def test_index_cache_reuses_reloads_on_rewrite_and_evicts_lru(tmp_path, embeddings):
+    cache = FaissIndexCache(max_entries=2)
+    a = save_index(tmp_path / "a", embeddings, ["alpha"])
+    b = save_index(tmp_path / "b", embeddings, ["beta"])
+    c = save_index(tmp_path / "c", embeddings, ["gamma"])
+
+    first = cache.load(a, embeddings)
+    assert cache.load(a, embeddings) is first
+    stamp = time.time() + 5
+    save_index(tmp_path / "a", embeddings, ["alpha", "again"])
+    os.utime(tmp_path / "a" / "index.faiss", (stamp, stamp))
+    reloaded = cache.load(a, embeddings)
+    assert reloaded is not first and reloaded.index.ntotal == 2
+
+    cache.load(b, embeddings)
+    cache.load(a, embeddings)
+    cache.load(c, embeddings)
+    assert a in cache and c in cache and b not in cache
+
+
+def test_index_cache_drops_deleted_indexes(tmp_path, embeddings):
+    cache = FaissIndexCache()
+    path = save_index(tmp_path / "gone", embeddings, ["text"])
+    cache.load(path, embeddings)
+    os.remove(tmp_path / "gone" / "index.faiss")
+    with pytest.raises(FileNotFoundError):
+        cache.load(path, embeddings)
+    assert len(cache) == 0
+
+
+class FakeLoader:
+    llm_failures = 0
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.config = {}
+
+    def load_embeddings(self):
+        return self.embeddings
+
+    def load_llm(self):
+        if FakeLoader.llm_failures:
+            FakeLoader.llm_failures -= 1
+            raise RuntimeError("no llm key")
+        return None
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(warmup.time, "sleep", lambda seconds: None)
+
+
+def test_warm_up_preloads_recent_sessions_and_reports_errors(tmp_path, embeddings, monkeypatch):
+    monkeypatch.setattr(FakeLoader, "llm_failures", 10)
+    monkeypatch.setattr(warmup, "ModelLoader", lambda: FakeLoader(embeddings))
+    cache = FaissIndexCache()
+    monkeypatch.setattr(warmup, "get_index_cache", lambda: cache)
+    for i, name in enumerate(["session_old", "session_new"]):
+        save_index(tmp_path / name, embeddings, [name])
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))
+
+    status = warmup.warm_up({"faiss_dir": str(tmp_path), "preload_sessions": 1, "max_attempts": 2})
+    assert status["preloaded_indexes"] == ["session_new"]
+    assert status["errors"] == ["clients: no llm key"]
+    assert status["attempts"] == 2
+    assert str(tmp_path / "session_new") in cache
+    state = readiness()
+    assert state["ready"] is False and state["phase"] == "degraded"
+
+
+def test_transient_failure_is_retried_until_ready(tmp_path, embeddings, monkeypatch):
+    monkeypatch.setattr(FakeLoader, "llm_failures", 1)
+    monkeypatch.setattr(warmup, "ModelLoader", lambda: FakeLoader(embeddings))
+    delays = []
+    monkeypatch.setattr(warmup.time, "sleep", delays.append)
+    status = warmup.warm_up({"faiss_dir": str(tmp_path), "max_attempts": 3, "retry_backoff_seconds": 0.5})
+    assert status["errors"] == [] and status["attempts"] == 2
+    assert delays == [0.5]
+    state = readiness()
+    assert state["ready"] is True and state["phase"] == "warm"
+
+
+def test_failed_model_loader_reports_degraded(monkeypatch):
+    def broken_loader():
+        raise RuntimeError("missing API keys")
+
+    monkeypatch.setattr(warmup, "ModelLoader", broken_loader)
+    status = warmup.warm_up({"faiss_dir": "does-not-exist", "max_attempts": 3})
+    assert status["errors"] == ["warmup: missing API keys"]
+    assert status["attempts"] == 3
+    state = readiness()
+    assert state["ready"] is False and state["phase"] == "degraded"
+
+
+def test_ready_endpoint_answers_503_while_degraded(monkeypatch):
+    def broken_loader():
+        raise RuntimeError("missing API keys")
+
+    monkeypatch.setattr(warmup, "ModelLoader", broken_loader)
+    warmup.warm_up({"faiss_dir": "does-not-exist", "max_attempts": 1})
+    server = start_metrics_server(0, host="127.0.0.1")
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/ready", timeout=5)
+        assert error.value.code == 503
+    finally:
+        server.shutdown()
+        server.server_close()
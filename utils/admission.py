@@ -0,0 +1,234 @@
+import time
+import itertools
+import contextvars
+import threading
+from enum import IntEnum
+from contextlib import contextmanager
+from typing import Optional
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.instrumentation import get_registry, estimate_tokens, METRIC_PREFIX
+
+log = CustomLogger().get_logger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower runs first."""
+    INTERACTIVE = 0   # chat turns
+    ANALYSIS = 1      # single document analysis
+    BATCH = 2         # document comparison, batched question sets
+
+
+# Caller identity for admission, set once per request by the API layer (see tenant_scope)
+_current_tenant: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("admission_tenant", default=None)
+
+
+@contextmanager
+def tenant_scope(tenant_id: Optional[str]):
+    """
+    Bill every admitted call in the block (and in threads started with a copied context) to
+    tenant_id, e.g. the API key or client id of the request being served.
+    """
+    token = _current_tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def current_tenant() -> Optional[str]:
+    return _current_tenant.get()
+
+
+def _bucket_class(priority: "Priority") -> str:
+    # Chat turns never pay for a tenant's analysis and comparison backlog
+    return "interactive" if priority == Priority.INTERACTIVE else "background"
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request cannot be queued or waited past its queue timeout."""
+
+
+class TokenBucket:
+    """
+    Per-tenant budget of provider tokens. A request larger than the burst is let through when
+    the bucket is full and leaves it in debt, so a huge document delays that tenant's next work
+    instead of being refused forever. Debt is capped at one burst, which bounds the delay.
+    """
+
+    def __init__(self, tokens_per_second: float, burst: float):
+        self.rate = tokens_per_second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """Seconds until `cost` can be taken (0 when it can be taken now)."""
+        self._refill(now)
+        needed = min(cost, self.burst)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, cost: float, now: float):
+        self._refill(now)
+        self.tokens = max(self.tokens - cost, -self.burst)
+
+
+class AdmissionController:
+    """
+    Gate in front of LLM-heavy calls. Each request carries a tenant, a priority and an estimate
+    of its prompt tokens. Each tenant has two token buckets, one for interactive turns and one for
+    analysis and batch work, so a large comparison cannot starve that tenant's chat. Requests run
+    only while fewer than `max_concurrent` are in flight and their bucket allows it; otherwise they wait in a priority queue (ties in
+    arrival order). A request whose tenant is rate limited does not block other tenants behind it.
+    Full queues and waits past the priority's timeout raise AdmissionRejected (backpressure).
+    Every `idle_bucket_sweep_seconds` the buckets that have refilled and have nothing queued are
+    dropped; a full bucket is exactly what a new tenant gets, so this only bounds memory.
+    """
+
+    def __init__(self, max_concurrent: int = 8, tenant_tokens_per_minute: float = 200_000, tenant_burst_tokens: float = 400_000,
+                 max_queue: Optional[dict] = None, queue_timeout_seconds: Optional[dict] = None, idle_bucket_sweep_seconds: float = 60.0):
+        self.max_concurrent = max_concurrent
+        self.tokens_per_second = tenant_tokens_per_minute / 60.0
+        self.burst = tenant_burst_tokens
+        self.max_queue = {Priority[k.upper()]: v for k, v in (max_queue or {}).items()}
+        self.queue_timeout = {Priority[k.upper()]: v for k, v in (queue_timeout_seconds or {}).items()}
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._waiting: list[tuple[int, int, str, float]] = []   # (priority, seq, tenant, tokens)
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.idle_bucket_sweep_seconds = idle_bucket_sweep_seconds
+        self._last_sweep = time.monotonic()
+
+    def _bucket(self, tenant_id: str, priority: int) -> TokenBucket:
+        key = (tenant_id, _bucket_class(priority))
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(self.tokens_per_second, self.burst)
+        return self._buckets[key]
+
+    def _evict_idle_buckets(self, now: float):
+        # Caller holds self._cond
+        if now - self._last_sweep < self.idle_bucket_sweep_seconds:
+            return
+        self._last_sweep = now
+        queued = {(ticket[2], _bucket_class(ticket[0])) for ticket in self._waiting}
+        idle = [key for key, bucket in self._buckets.items() if key not in queued and bucket.wait_time(bucket.burst, now) == 0.0]
+        for key in idle:
+            del self._buckets[key]
+        if idle:
+            log.info("Idle admission buckets dropped", tenants=len(idle), remaining=len(self._buckets))
+
+    def _next_runnable(self, now: float) -> tuple[Optional[tuple], float]:
+        """
+        The first waiting ticket in priority order whose tenant can pay now, and the shortest
+        rate-limit wait among the rest (to bound the next wake-up).
+        """
+        retry_after = float("inf")
+        for ticket in sorted(self._waiting):
+            wait = self._bucket(ticket[2], ticket[0]).wait_time(ticket[3], now)
+            if wait == 0.0:
+                return ticket, 0.0
+            retry_after = min(retry_after, wait)
+        return None, retry_after
+
+    @contextmanager
+    def admit(self, tenant_id: str, priority: Priority, estimated_tokens: float):
+        registry = get_registry()
+        labels = {"priority": priority.name.lower()}
+        start = time.monotonic()
+        deadline = start + self.queue_timeout.get(priority, 60.0)
+        with self._cond:
+            queued = sum(1 for t in self._waiting if t[0] == priority)
+            if queued >= self.max_queue.get(priority, 100):
+                registry.inc(f"{METRIC_PREFIX}_admission_rejected_total", 1, {**labels, "reason": "queue_full"}, "Requests refused by admission control")
+                raise AdmissionRejected(f"Admission queue full for {priority.name.lower()} requests ({queued} waiting)")
+            ticket = (int(priority), next(self._seq), tenant_id, float(estimated_tokens))
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    retry_after = float("inf")
+                    if self._in_flight < self.max_concurrent:
+                        runnable, retry_after = self._next_runnable(now)
+                        if runnable == ticket:
+                            break
+                    if now >= deadline:
+                        registry.inc(f"{METRIC_PREFIX}_admission_rejected_total", 1, {**labels, "reason": "timeout"}, "Requests refused by admission control")
+                        raise AdmissionRejected(f"Timed out after {now - start:.1f}s waiting for admission (tenant {tenant_id})")
+                    self._cond.wait(min(deadline - now, retry_after, 1.0))
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+                raise
+            self._waiting.remove(ticket)
+            self._bucket(tenant_id, priority).take(estimated_tokens, time.monotonic())
+            self._in_flight += 1
+
+        waited = time.monotonic() - start
+        registry.observe(f"{METRIC_PREFIX}_admission_wait_seconds", waited, labels, "Time spent queued by admission control")
+        registry.inc(f"{METRIC_PREFIX}_admission_tokens_total", estimated_tokens, labels, "Estimated prompt tokens admitted")
+        if waited > 1.0:
+            log.info("Request admitted after queueing", tenant_id=tenant_id, priority=priority.name.lower(), waited_s=round(waited, 2), estimated_tokens=int(estimated_tokens))
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._evict_idle_buckets(time.monotonic())
+                self._cond.notify_all()
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+_enabled: Optional[bool] = None
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """
+    The process-wide controller from the `admission` block of config.yaml, or None when disabled.
+    """
+    global _controller, _enabled
+    with _controller_lock:
+        if _enabled is None:
+            settings = load_config().get("admission", {}) or {}
+            _enabled = bool(settings.get("enabled", False))
+            if _enabled:
+                _controller = AdmissionController(
+                    max_concurrent=settings.get("max_concurrent", 8),
+                    tenant_tokens_per_minute=settings.get("tenant_tokens_per_minute", 200_000),
+                    tenant_burst_tokens=settings.get("tenant_burst_tokens", 400_000),
+                    max_queue=settings.get("max_queue"),
+                    queue_timeout_seconds=settings.get("queue_timeout_seconds"),
+                    idle_bucket_sweep_seconds=settings.get("idle_bucket_sweep_seconds", 60),
+                )
+        return _controller
+
+
+def estimate_prompt_tokens(*parts, retrieval: bool = False) -> int:
+    """
+    Prompt tokens a call will send: its text parts plus, for chat turns, the retrieved context
+    that is not known until after admission (`admission.rag_context_tokens`).
+    """
+    tokens = sum(estimate_tokens(part) for part in parts)
+    if retrieval:
+        tokens += (load_config().get("admission", {}) or {}).get("rag_context_tokens", 1280)
+    return tokens
+
+
+@contextmanager
+def admit(tenant_id: Optional[str], priority: Priority, estimated_tokens: float):
+    """
+    Hold an admission slot for the block; a no-op when admission control is disabled. The tenant
+    is tenant_id, else the one set by `tenant_scope` for the current request; requests with
+    neither share one "default" tenant rather than each session getting its own budget.
+    """
+    controller = get_admission_controller()
+    if controller is None:
+        yield
+        return
+    with controller.admit(tenant_id or current_tenant() or "default", priority, estimated_tokens):
+        yield
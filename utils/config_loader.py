@@ -1,10 +1,20 @@
+import os
+import copy
 import yaml
+from functools import lru_cache
 
-def load_config(config_path: str = 'config/config.yaml')->dict:
+
+@lru_cache(maxsize=8)
+def _read_config(config_path: str, mtime_ns: int) -> dict:
     with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
+        return yaml.safe_load(file)
+
+
+def load_config(config_path: str = 'config/config.yaml')->dict:
+    # Parsed once per file version; callers get their own copy to mutate
+    config = _read_config(config_path, os.stat(config_path).st_mtime_ns)
     # print(config)
-    return config
+    return copy.deepcopy(config)
 
 
-# load_config('config/config.yaml')
\ No newline at end of file
+# load_config('config/config.yaml')
@@ -0,0 +1,151 @@
+import re
+import zlib
+from collections import Counter, defaultdict
+import numpy as np
+from langchain_core.documents import Document
+
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+# "Page 3", "page 3 of 40", "3 of 40", "3/40", "- 3 -": the only lines whose digits are masked
+_PAGE_NUMBER_RE = re.compile(r"^[-\s]*(page\s*)?\d+(\s*(of|/)\s*\d+)?[-\s]*$", re.IGNORECASE)
+_BARE_NUMBER_RE = re.compile(r"^[-\s]*(\d+)[-\s]*$")
+_BARE_PAGE_NUMBER = "#"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _edge_lines(text: str, edge_lines: int) -> list[tuple[int, str, bool]]:
+    """
+    (line index, stripped line, outermost) for the first and last `edge_lines` non-empty lines
+    of a page; outermost marks the very first and very last line.
+    """
+    lines = [(i, line.strip()) for i, line in enumerate(text.splitlines()) if line.strip()]
+    if len(lines) > 2 * edge_lines:
+        lines = lines[:edge_lines] + lines[-edge_lines:]
+    return [(i, line, n in (0, len(lines) - 1)) for n, (i, line) in enumerate(lines)]
+
+
+def _furniture_key(line: str, outermost: bool, min_letters: int) -> str | None:
+    """
+    Comparison key of a candidate header/footer line, or None when it cannot be furniture.
+    Page-number lines are masked so "Page 3 of 40" matches "Page 4 of 40"; every other line is
+    compared exactly and needs `min_letters` letters, so table rows of numbers never qualify.
+    """
+    line = _SPACE_RE.sub(" ", line.lower())
+    if _BARE_NUMBER_RE.match(line):
+        return _BARE_PAGE_NUMBER if outermost else None
+    if _PAGE_NUMBER_RE.match(line):
+        return re.sub(r"\d+", "#", line)
+    if len(_LETTER_RE.findall(line)) < min_letters:
+        return None
+    return line
+
+
+def strip_page_furniture(documents: list[Document], min_pages: int = 3, min_ratio: float = 0.5, edge_lines: int = 3,
+                         min_letters: int = 4) -> list[Document]:
+    """
+    Remove headers, footers and page numbers repeated across the pages of a document. Only the
+    top and bottom `edge_lines` lines of a page are candidates, and a line is furniture when it
+    appears on at least `min_ratio` of a source's pages. A bare number only counts as a page
+    number on the first or last line of a page, and only when it increases from page to page.
+    """
+    pages_by_source: dict[str, list[int]] = defaultdict(list)
+    for i, doc in enumerate(documents):
+        if "page" in doc.metadata:
+            pages_by_source[doc.metadata.get("source", "")].append(i)
+
+    furniture: dict[str, set[str]] = {}
+    for source, indexes in pages_by_source.items():
+        if len(indexes) < min_pages:
+            continue
+        counts = Counter()
+        bare_numbers = []
+        for i in sorted(indexes, key=lambda i: documents[i].metadata["page"]):
+            keys = set()
+            for _, line, outermost in _edge_lines(documents[i].page_content, edge_lines):
+                key = _furniture_key(line, outermost, min_letters)
+                if key == _BARE_PAGE_NUMBER:
+                    bare_numbers.append(int(_BARE_NUMBER_RE.match(line).group(1)))
+                if key is not None:
+                    keys.add(key)
+            counts.update(keys)
+        threshold = max(min_pages, min_ratio * len(indexes))
+        repeated = {key for key, count in counts.items() if count >= threshold}
+        if _BARE_PAGE_NUMBER in repeated and any(b <= a for a, b in zip(bare_numbers, bare_numbers[1:])):
+            repeated.discard(_BARE_PAGE_NUMBER)   # numbers in table rows, not page numbers
+        furniture[source] = repeated
+
+    cleaned = []
+    for doc in documents:
+        repeated = furniture.get(doc.metadata.get("source", "")) if "page" in doc.metadata else None
+        if not repeated:
+            cleaned.append(doc)
+            continue
+        drop = {i for i, line, outermost in _edge_lines(doc.page_content, edge_lines)
+                if _furniture_key(line, outermost, min_letters) in repeated}
+        kept = [line for i, line in enumerate(doc.page_content.splitlines()) if i not in drop]
+        cleaned.append(Document(page_content="\n".join(kept), metadata=doc.metadata))
+    return cleaned
+
+
+class MinHashDeduplicator:
+    """
+    Drops near-duplicate chunks using MinHash signatures over word shingles and LSH banding.
+    The first occurrence is kept and records where its duplicates came from under `also_in`,
+    so answers can still cite every page the text appeared on.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2^31 and 32-bit shingle hashes keep a * h + b inside uint64
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def _signature(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    def deduplicate(self, chunks: list[Document]) -> list[Document]:
+        kept: list[Document] = []
+        signatures: list[np.ndarray] = []
+        buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+
+        for chunk in chunks:
+            if not chunk.page_content.strip():
+                continue
+            signature = self._signature(chunk.page_content)
+            keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+            candidates = {i for key in keys for i in buckets.get(key, ())}
+            duplicate_of = next(
+                (i for i in sorted(candidates) if float(np.mean(signatures[i] == signature)) >= self.threshold),
+                None,
+            )
+            if duplicate_of is not None:
+                origin = {k: chunk.metadata[k] for k in ("source", "page") if k in chunk.metadata}
+                kept[duplicate_of].metadata.setdefault("also_in", []).append(origin)
+                continue
+            for key in keys:
+                buckets[key].append(len(kept))
+            signatures.append(signature)
+            kept.append(Document(page_content=chunk.page_content, metadata=dict(chunk.metadata)))
+        return kept
+
+
+def build_deduplicator(dedup_config: dict) -> MinHashDeduplicator:
+    return MinHashDeduplicator(
+        threshold=dedup_config.get("near_duplicate_threshold", 0.9),
+        num_perm=dedup_config.get("num_perm", 64),
+        bands=dedup_config.get("bands", 16),
+        shingle_size=dedup_config.get("shingle_size", 5),
+    )
@@ -0,0 +1,114 @@
+import os
+import zipfile
+import threading
+import multiprocessing
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Optional
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from langchain_core.documents import Document
+
+# A loader turns one file into a list of (page_content, metadata) pairs.
+# Plain tuples keep the payload sent back from worker processes small.
+LoaderFn = Callable[[str], list[tuple[str, dict]]]
+
+LOADERS: dict[str, LoaderFn] = {}
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def register_loader(*extensions: str):
+    """
+    Register a loader function for one or more file extensions (e.g. ".pdf").
+    """
+    def decorator(fn: LoaderFn) -> LoaderFn:
+        for ext in extensions:
+            LOADERS[ext.lower()] = fn
+        return fn
+    return decorator
+
+
+@register_loader(".pdf")
+def load_pdf(path: str) -> list[tuple[str, dict]]:
+    """
+    One entry per page with PyPDFLoader-compatible metadata (0-based `page`).
+    """
+    pages = []
+    with fitz.open(path) as doc:
+        total_pages = doc.page_count
+        for page_num in range(total_pages):
+            text = doc.load_page(page_num).get_text()  # type: ignore
+            pages.append((text, {"source": path, "page": page_num, "page_label": str(page_num + 1), "total_pages": total_pages}))
+    return pages
+
+
+@register_loader(".txt", ".md")
+def load_text(path: str) -> list[tuple[str, dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [(f.read(), {"source": path})]
+
+
+@register_loader(".docx")
+def load_docx(path: str) -> list[tuple[str, dict]]:
+    """
+    Read paragraph text straight from word/document.xml, no external converter needed.
+    """
+    with zipfile.ZipFile(path) as archive:
+        root = ET.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{_WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return [("\n".join(paragraphs), {"source": path})]
+
+
+def supported_extensions() -> set[str]:
+    return set(LOADERS)
+
+
+def _load_file(path: str) -> list[tuple[str, dict]]:
+    ext = Path(path).suffix.lower()
+    if ext not in LOADERS:
+        raise ValueError(f"No loader registered for '{ext}' files: {path}")
+    return LOADERS[ext](path)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    The process-wide pool for CPU-bound document work (parsing, page rendering). `max_workers`
+    only applies to the call that creates it. Workers start from forkserver (spawn where that is
+    unavailable), never fork: forking a server with live threads, locks and client sockets can
+    deadlock the child. Workers re-import this module, so only loaders registered at import
+    time are available in them.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def load_documents(paths: list, max_workers: Optional[int] = None) -> list[Document]:
+    """
+    Parse files concurrently in a shared process pool and return their Documents in input order.
+    A single file is parsed in-process to skip the IPC overhead.
+    """
+    paths = [str(p) for p in paths]
+    if len(paths) <= 1 or max_workers == 1:
+        results = [_load_file(p) for p in paths]
+    else:
+        results = list(get_process_pool(max_workers).map(_load_file, paths))
+    return [Document(page_content=text, metadata=metadata) for pages in results for text, metadata in pages]
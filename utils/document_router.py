@@ -0,0 +1,167 @@
+import os
+import json
+import heapq
+import threading
+from pathlib import Path
+from typing import Any, List
+from pydantic import field_validator
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_community.vectorstores import FAISS
+from logger.custom_logger import CustomLogger
+from utils.index_cache import get_index_cache, load_faiss_index
+
+log = CustomLogger().get_logger(__name__)
+
+MANIFEST_NAME = "routing.json"
+CENTROIDS_NAME = "centroids.npy"
+
+
+def is_routed_index(index_path) -> bool:
+    return (Path(index_path) / MANIFEST_NAME).exists()
+
+
+def remove_routing(index_path):
+    """
+    Delete routing files so a flat index saved to index_path is not loaded with stale ranges.
+    The manifest goes first: without it the directory is no longer detected as routed.
+    """
+    for name in (MANIFEST_NAME, CENTROIDS_NAME):
+        (Path(index_path) / name).unlink(missing_ok=True)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class RoutedFaissIndex:
+    """
+    A session FAISS index with two-stage retrieval. Chunks are stored grouped by source document,
+    so each document owns a contiguous range of index positions, and each document has a centroid
+    of its chunk vectors. A query is first scored against the centroids, then searched only inside
+    the ranges of its `top_documents` best documents, so cost follows the routed documents rather
+    than the whole session.
+    """
+
+    def __init__(self, index_dir: str, embeddings, top_documents: int = 3):
+        self.index_dir = Path(index_dir)
+        self.embeddings = embeddings
+        self.top_documents = top_documents
+        self.manifest = json.loads((self.index_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        self.centroids = np.load(self.index_dir / CENTROIDS_NAME)
+
+    @classmethod
+    def build(cls, index_dir: str, chunks: List[Document], embeddings, top_documents: int = 3) -> "RoutedFaissIndex":
+        """
+        Embed `chunks` once, save them as a regular FAISS index ordered by source document, and
+        write the per-document position ranges and centroids next to it.
+        """
+        index_dir = Path(index_dir)
+        groups: dict[str, list[Document]] = {}
+        for chunk in chunks:
+            groups.setdefault(str(chunk.metadata.get("source", "unknown")), []).append(chunk)
+        ordered = [chunk for group in groups.values() for chunk in group]
+        texts = [chunk.page_content for chunk in ordered]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+
+        vectorstore = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), embeddings, metadatas=[c.metadata for c in ordered])
+        vectorstore.save_local(str(index_dir))
+        get_index_cache().put(str(index_dir), vectorstore)
+
+        documents, centroids, start = [], [], 0
+        for source, group in groups.items():
+            documents.append({"source": source, "start": start, "count": len(group)})
+            centroids.append(vectors[start:start + len(group)].mean(axis=0))
+            start += len(group)
+        np.save(index_dir / CENTROIDS_NAME, _normalize(np.asarray(centroids, dtype="float32")))
+        tmp_path = index_dir / f"{MANIFEST_NAME}.tmp"
+        tmp_path.write_text(json.dumps({"documents": documents}, indent=2), encoding="utf-8")
+        os.replace(tmp_path, index_dir / MANIFEST_NAME)
+        log.info("Routed FAISS index built", index_dir=str(index_dir), documents=len(documents), chunks=len(ordered))
+        return cls(str(index_dir), embeddings, top_documents)
+
+    @property
+    def vectorstore(self) -> FAISS:
+        return load_faiss_index(str(self.index_dir), self.embeddings)
+
+    def route(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Indices of the `top_documents` documents closest to each query, best first.
+        """
+        scores = _normalize(matrix) @ self.centroids.T
+        top = min(self.top_documents, scores.shape[1])
+        return np.argsort(-scores, axis=1)[:, :top]
+
+    def search(self, vectors, k: int = 4) -> List[List[int]]:
+        """
+        Top-k index positions per query, searching only the routed documents' ranges and merging
+        the per-document top-k lists with a heap.
+        """
+        vectorstore = self.vectorstore
+        matrix = np.asarray(vectors, dtype="float32").reshape(len(vectors), -1)
+        if getattr(vectorstore, "_normalize_L2", False):
+            faiss.normalize_L2(matrix)
+        documents = self.manifest["documents"]
+        results = []
+        for row, routed in zip(matrix, self.route(matrix)):
+            candidates = []
+            for doc_index in routed:
+                doc = documents[int(doc_index)]
+                params = faiss.SearchParameters(sel=faiss.IDSelectorRange(doc["start"], doc["start"] + doc["count"], True))
+                distances, ids = vectorstore.index.search(row.reshape(1, -1), min(k, doc["count"]), params=params)
+                candidates.extend((float(d), int(i)) for d, i in zip(distances[0], ids[0]) if i >= 0)
+            results.append([position for _, position in heapq.nsmallest(k, candidates)])
+        return results
+
+    def documents(self, ids: List[int]) -> List[Document]:
+        vectorstore = self.vectorstore
+        docs = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in ids]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return self.documents(self.search([embedding], k)[0])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+    def as_retriever(self, k: int = 4, search_type: str = "similarity") -> "RoutedRetriever":
+        if search_type != "similarity":
+            log.warning("Routed index supports similarity search only, ignoring search_type", index_dir=str(self.index_dir), search_type=search_type)
+        return RoutedRetriever(vectorstore=self, search_kwargs={"k": k})
+
+
+class RoutedRetriever(BaseRetriever):
+    vectorstore: Any
+    search_type: str = "similarity"
+    search_kwargs: dict = {"k": 4}
+
+    @field_validator("search_type")
+    @classmethod
+    def _similarity_only(cls, value: str) -> str:
+        if value != "similarity":
+            raise ValueError(f"RoutedRetriever supports search_type='similarity' only, got {value!r}")
+        return value
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.vectorstore.similarity_search(query, k=self.search_kwargs.get("k", 4))
+
+
+_routed_indexes: dict[str, tuple[int, RoutedFaissIndex]] = {}
+_routed_lock = threading.Lock()
+
+
+def get_routed_index(index_dir: str, embeddings, top_documents: int = 3) -> RoutedFaissIndex:
+    """
+    Return the process-wide RoutedFaissIndex for a directory, reopening it if it was rebuilt.
+    """
+    key = str(Path(index_dir).resolve())
+    version = os.stat(Path(index_dir) / MANIFEST_NAME).st_mtime_ns
+    with _routed_lock:
+        cached = _routed_indexes.get(key)
+        if cached is None or cached[0] != version or cached[1].top_documents != top_documents:
+            _routed_indexes[key] = (version, RoutedFaissIndex(index_dir, embeddings, top_documents))
+        return _routed_indexes[key][1]
@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from langchain_community.vectorstores import FAISS
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+
+log = CustomLogger().get_logger(__name__)
+
+
+class FaissIndexCache:
+    """
+    LRU of deserialized FAISS session indexes, keyed by path and the index file's mtime so a
+    re-ingested session is reloaded and a collected one is dropped.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, FAISS]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(index_path: str) -> int:
+        return os.stat(Path(index_path) / "index.faiss").st_mtime_ns
+
+    def load(self, index_path: str, embeddings) -> FAISS:
+        key = str(Path(index_path).resolve())
+        try:
+            version = self._version(index_path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+            raise
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(key)
+                return cached[1]
+        vectorstore = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        self._store(key, version, vectorstore)
+        return vectorstore
+
+    def put(self, index_path: str, vectorstore: FAISS):
+        """
+        Cache an index that was just saved to index_path, sparing the first query a reload.
+        """
+        self._store(str(Path(index_path).resolve()), self._version(index_path), vectorstore)
+
+    def _store(self, key: str, version: int, vectorstore: FAISS):
+        with self._lock:
+            self._entries[key] = (version, vectorstore)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, index_path: str) -> bool:
+        return str(Path(index_path).resolve()) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_index_cache() -> FaissIndexCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = load_config().get("warmup", {}) or {}
+            _cache = FaissIndexCache(settings.get("index_cache_size", 16))
+        return _cache
+
+
+def load_faiss_index(index_path: str, embeddings) -> FAISS:
+    """
+    Load a session's FAISS index through the process-wide cache.
+    """
+    return get_index_cache().load(index_path, embeddings)
@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import atexit
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.profiling import start_stage_profile
+
+log = CustomLogger().get_logger(__name__)
+
+METRIC_PREFIX = "document_portal"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def estimate_tokens(value: Any) -> int:
+    """
+    Cheap token estimate (~4 characters per token) for strings, messages, prompts and documents.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return (len(value) + 3) // 4
+    if isinstance(value, Document):
+        return estimate_tokens(value.page_content)
+    if isinstance(value, BaseMessage):
+        return estimate_tokens(value.content if isinstance(value.content, str) else str(value.content))
+    if isinstance(value, PromptValue):
+        return estimate_tokens(value.to_string())
+    if isinstance(value, dict):
+        return sum(estimate_tokens(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_tokens(v) for v in value)
+    return 0
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process store of counters and histograms rendered in Prometheus text format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, list]] = {}
+        self._help: dict[str, str] = {}
+
+    @staticmethod
+    def _key(labels: Optional[dict]) -> tuple:
+        return tuple(sorted((labels or {}).items()))
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None, help_text: str = ""):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0.0) + value
+            self._help.setdefault(name, help_text)
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None, help_text: str = ""):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = self._key(labels)
+            state = series.get(key)
+            if state is None:
+                # [bucket counts..., +Inf count, sum]
+                state = series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+            self._help.setdefault(name, help_text)
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ""
+        escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        body = ",".join(f'{k}="{escape(v)}"' for k, v in pairs)
+        return "{" + body + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{self._labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, state):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._labels(key + (('le', bound),))} {cumulative}")
+                    cumulative += state[len(self.buckets)]
+                    lines.append(f"{name}_bucket{self._labels(key + (('le', '+Inf'),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._labels(key)} {state[-1]}")
+                    lines.append(f"{name}_count{self._labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class Span:
+    """
+    Timing and accounting for one pipeline stage. Values recorded here are exported when the span closes.
+    """
+
+    def __init__(self, stage: str, session_id: Optional[str] = None, **attrs):
+        self.stage = stage
+        self.session_id = session_id
+        self.attrs = attrs
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.chunks: Optional[int] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.duration = 0.0
+
+    def record(self, input_tokens: int = 0, output_tokens: int = 0, chunks: Optional[int] = None, cache_hit: Optional[bool] = None, **attrs):
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        if chunks is not None:
+            self.chunks = (self.chunks or 0) + chunks
+        if cache_hit is True:
+            self.cache_hits += 1
+        elif cache_hit is False:
+            self.cache_misses += 1
+        self.attrs.update(attrs)
+
+    def record_output(self, output: Any):
+        """
+        Record token usage reported by the provider, falling back to an estimate.
+        """
+        usage = getattr(output, "usage_metadata", None)
+        if usage:
+            self.record(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+            return
+        if isinstance(output, list) and output and isinstance(output[0], Document):
+            self.record(chunks=len(output))
+        self.record(output_tokens=estimate_tokens(output))
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+_settings: dict = {}
+
+
+def _load_settings() -> dict:
+    try:
+        settings = dict(load_config().get("instrumentation", {}) or {})
+    except Exception as e:
+        log.warning("Instrumentation config unavailable, using defaults", error=str(e))
+        settings = {}
+    settings["enabled"] = os.getenv("METRICS_ENABLED", str(settings.get("enabled", True))).lower() not in ("0", "false", "no")
+    settings["metrics_file"] = os.getenv("METRICS_FILE", settings.get("metrics_file"))
+    settings["metrics_port"] = int(os.getenv("METRICS_PORT", settings.get("metrics_port") or 0))
+    return settings
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Return the process-wide registry, starting the configured exporters on first use.
+    """
+    global _registry, _settings
+    if _registry is not None:
+        return _registry
+    with _registry_lock:
+        if _registry is None:
+            _settings = _load_settings()
+            _registry = MetricsRegistry(_settings.get("duration_buckets") or DEFAULT_BUCKETS)
+            if _settings["enabled"]:
+                if _settings.get("metrics_file"):
+                    _start_file_exporter(_registry, _settings["metrics_file"], float(_settings.get("export_interval_seconds", 15)))
+                if _settings["metrics_port"]:
+                    start_metrics_server(_settings["metrics_port"], _registry)
+    return _registry
+
+
+def _start_file_exporter(registry: MetricsRegistry, path: str, interval: float):
+    def _loop():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.write(path)
+            except Exception as e:
+                log.warning("Failed to export metrics file", path=path, error=str(e))
+
+    threading.Thread(target=_loop, name="metrics-file-exporter", daemon=True).start()
+    atexit.register(lambda: registry.write(path))
+    log.info("Metrics file exporter started", path=path, interval_seconds=interval)
+
+
+# None until a warm-up starts: processes that never warm up are always ready
+_readiness: Optional[dict] = None
+_readiness_lock = threading.Lock()
+
+
+def set_readiness(ready: bool, **detail):
+    global _readiness
+    with _readiness_lock:
+        _readiness = {"ready": ready, **detail}
+
+
+def readiness() -> dict:
+    with _readiness_lock:
+        return dict(_readiness) if _readiness is not None else {"ready": True}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/ready":
+            status = readiness()
+            body = json.dumps(status, default=str).encode("utf-8")
+            self.send_response(200 if status["ready"] else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, registry: Optional[MetricsRegistry] = None, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serve the registry on http://<host>:<port>/metrics, and readiness on /ready, from a daemon thread.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or get_registry()})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("Metrics endpoint started", host=host, port=port)
+    return server
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(stage: str, session_id: Optional[str] = None, **attrs):
+    """
+    Time a pipeline stage and export duration, tokens, chunks and cache hits for it.
+    Nested spans inherit the session id of their parent. With profiling on, each span also
+    writes a memory/CPU report (see utils.profiling).
+    """
+    parent = _current_span.get()
+    if session_id is None and parent is not None:
+        session_id = parent.session_id
+    current = Span(stage, session_id=session_id, **attrs)
+    token = _current_span.set(current)
+    profile = start_stage_profile(stage, session_id)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        if profile is not None:
+            profile.stop(error)
+        _export(current, error)
+
+
+def _export(s: Span, error: Optional[str]):
+    registry = get_registry()
+    if not _settings.get("enabled", True):
+        return
+    labels = {"stage": s.stage}
+    registry.observe(f"{METRIC_PREFIX}_stage_duration_seconds", s.duration, labels, "Wall-clock duration of a pipeline stage")
+    if s.input_tokens:
+        registry.inc(f"{METRIC_PREFIX}_stage_tokens_total", s.input_tokens, {**labels, "direction": "input"}, "Tokens consumed or produced by a stage")
+    if s.output_tokens:
+        registry.inc(f"{METRIC_PREFIX}_stage_tokens_total", s.output_tokens, {**labels, "direction": "output"}, "Tokens consumed or produced by a stage")
+    if s.chunks is not None:
+        registry.inc(f"{METRIC_PREFIX}_stage_chunks_total", s.chunks, labels, "Chunks handled by a stage")
+    if s.cache_hits:
+        registry.inc(f"{METRIC_PREFIX}_stage_cache_total", s.cache_hits, {**labels, "result": "hit"}, "Cache lookups made by a stage")
+    if s.cache_misses:
+        registry.inc(f"{METRIC_PREFIX}_stage_cache_total", s.cache_misses, {**labels, "result": "miss"}, "Cache lookups made by a stage")
+    if error:
+        registry.inc(f"{METRIC_PREFIX}_stage_errors_total", 1, {**labels, "error": error}, "Stages that raised")
+
+    log.info(
+        "Stage completed",
+        stage=s.stage,
+        session_id=s.session_id,
+        duration_ms=round(s.duration * 1000, 2),
+        input_tokens=s.input_tokens,
+        output_tokens=s.output_tokens,
+        chunks=s.chunks,
+        cache_hits=s.cache_hits,
+        cache_misses=s.cache_misses,
+        error=error,
+        **s.attrs,
+    )
+
+
+def traced(stage: str, runnable, session_id: Optional[str] = None) -> RunnableLambda:
+    """
+    Wrap a runnable so every invocation runs inside a span named after the stage. Async calls
+    (ainvoke/astream) await the wrapped runnable's ainvoke instead of blocking the event loop.
+    """
+    def _record(s: Span, inputs, output):
+        if getattr(output, "usage_metadata", None) is None:
+            s.record(input_tokens=estimate_tokens(inputs))
+        s.record_output(output)
+
+    def _invoke(inputs, config=None):
+        with span(stage, session_id=session_id) as s:
+            output = runnable.invoke(inputs, config=config)
+            _record(s, inputs, output)
+            return output
+
+    async def _ainvoke(inputs, config=None):
+        with span(stage, session_id=session_id) as s:
+            output = await runnable.ainvoke(inputs, config=config)
+            _record(s, inputs, output)
+            return output
+
+    return RunnableLambda(_invoke, afunc=_ainvoke, name=stage)
@@ -0,0 +1,373 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, List, Optional
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+from langchain_core.outputs import ChatGeneration, ChatResult
+from logger.custom_logger import CustomLogger
+from utils.instrumentation import get_registry, current_span, METRIC_PREFIX
+
+log = CustomLogger().get_logger(__name__)
+
+# Abandoned sync losers keep their thread until the provider answers; each router caps how many
+# it leaves running (max_abandoned_losers) and stops hedging sync calls at that cap
+_hedge_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive errors and rejects calls for `reset_timeout_s`,
+    then lets a single trial call through (half-open) before closing again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether `allow()` would currently let a call through, without taking the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            return time.monotonic() - self._opened_at >= self.reset_timeout_s and not self._trial_in_flight
+
+    def allow(self) -> bool:
+        """Permit a call, taking the half-open trial if the breaker is open. Call right before the request."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout_s or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def release(self):
+        """Give back a half-open trial whose call was cancelled before it could succeed or fail."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures, self._opened_at, self._trial_in_flight = 0, None, False
+
+    def record_failure(self) -> bool:
+        """Record an error; returns True when this error opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                newly_opened = self._opened_at is None
+                self._opened_at = time.monotonic()
+                return newly_opened
+            return False
+
+
+class LatencyTracker:
+    """
+    Sliding window of successful call latencies used to pick the hedge delay.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class HedgeBudget:
+    """
+    Caps hedged duplicates at about `ratio` of requests: every request deposits `ratio` tokens
+    (up to `burst`) and every hedge spends one, so a slow provider cannot double the load.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def refund(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class InFlightCounter:
+    """
+    Thread-safe count of abandoned calls still holding a hedge pool thread.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def add(self, delta: int):
+        with self._lock:
+            self._value += delta
+
+    @property
+    def value(self) -> int:
+        with self._lock:
+            return self._value
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Chat model that routes to a primary provider and, once a call runs past the primary's
+    `hedge_percentile` latency, sends the same request to the secondary and returns whichever
+    answers first. Providers with repeated errors are skipped by a circuit breaker.
+    Latency is tracked per provider and call type (the enclosing span's stage), so short rewrites
+    and long analyses get their own hedge delays. At most `hedge_budget_ratio` of requests are
+    hedged. Async callers get the loser cancelled; a thread cannot be cancelled, so sync callers
+    abandon it (its result is discarded) and stop hedging while `max_abandoned_losers` are running.
+    """
+
+    # Chat models, or chat models with bound options (see map_providers)
+    primary: Runnable
+    secondary: Optional[Runnable] = None
+    primary_name: str = "primary"
+    secondary_name: str = "secondary"
+    hedge_percentile: float = 0.95
+    default_hedge_delay_s: float = 2.0   # used until enough latency samples exist
+    min_hedge_delay_s: float = 0.05
+    min_samples: int = 20
+    latency_window: int = 200
+    failure_threshold: int = 5
+    reset_timeout_s: float = 30.0
+    hedge_budget_ratio: float = 0.1
+    hedge_budget_burst: float = 10.0
+    max_abandoned_losers: int = 8
+
+    _breakers: dict = PrivateAttr(default_factory=dict)
+    # (provider, call type) -> LatencyTracker, filled on first use
+    _latency: dict = PrivateAttr(default_factory=dict)
+    _hedge_budget: HedgeBudget = PrivateAttr()
+    _abandoned: InFlightCounter = PrivateAttr(default_factory=InFlightCounter)
+
+    def model_post_init(self, __context: Any):
+        for name in (self.primary_name, self.secondary_name):
+            self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout_s)
+        self._hedge_budget = HedgeBudget(self.hedge_budget_ratio, self.hedge_budget_burst)
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-chat"
+
+    def map_providers(self, fn) -> "HedgedChatModel":
+        """
+        Copy with `fn` applied to each provider (e.g. to bind call options such as a response
+        format). The copy shares this router's circuit breakers and latency history.
+        """
+        secondary = fn(self.secondary) if self.secondary is not None else None
+        return self.model_copy(update={"primary": fn(self.primary), "secondary": secondary})
+
+    def _candidates(self) -> list[tuple[str, Runnable]]:
+        # Breaker permits are taken in _launchable, when a call is actually sent: a hedge that
+        # never fires must not hold the secondary's half-open trial
+        providers = [(self.primary_name, self.primary)]
+        if self.secondary is not None:
+            providers.append((self.secondary_name, self.secondary))
+        return [(name, model) for name, model in providers if self._breakers[name].available()]
+
+    def _launchable(self, candidates: list, force: bool = False) -> Optional[tuple[str, Runnable]]:
+        """
+        Pop candidates until one's breaker permits a call. With nothing permitted on the first
+        call, `force` sends it to the primary anyway: trying it beats failing without a call.
+        """
+        while candidates:
+            name, model = candidates.pop(0)
+            if self._breakers[name].allow():
+                return name, model
+        if force:
+            log.warning("All LLM circuit breakers open, forcing primary", provider=self.primary_name)
+            return self.primary_name, self.primary
+        return None
+
+    @staticmethod
+    def _call_type() -> str:
+        # Read in the caller's context: loser callbacks run on pool threads without the span
+        active = current_span()
+        return active.stage if active is not None else "default"
+
+    def _tracker(self, name: str, call_type: str) -> LatencyTracker:
+        return self._latency.setdefault((name, call_type), LatencyTracker(self.latency_window))
+
+    def _hedge_delay(self, name: str, call_type: str) -> float:
+        tracker = self._tracker(name, call_type)
+        if len(tracker) < self.min_samples:
+            return self.default_hedge_delay_s
+        return max(tracker.percentile(self.hedge_percentile), self.min_hedge_delay_s)
+
+    def _may_hedge(self, sync: bool) -> bool:
+        """
+        Whether a hedge may be sent now; spends from the hedge budget when it may.
+        """
+        if sync and self._abandoned.value >= self.max_abandoned_losers:
+            reason = "abandoned_losers"
+        elif not self._hedge_budget.try_spend():
+            reason = "budget"
+        else:
+            return True
+        get_registry().inc(f"{METRIC_PREFIX}_llm_hedges_skipped_total", 1, {"reason": reason}, "Hedges not sent, by reason")
+        return False
+
+    def _record(self, name: str, outcome: str, seconds: Optional[float] = None, call_type: str = "default"):
+        if outcome in ("win", "lose"):
+            self._breakers[name].record_success()
+            self._tracker(name, call_type).add(seconds)
+        elif outcome == "error" and self._breakers[name].record_failure():
+            log.warning("LLM circuit breaker opened", provider=name)
+            get_registry().inc(f"{METRIC_PREFIX}_llm_breaker_open_total", 1, {"provider": name}, "Times a provider circuit breaker opened")
+        get_registry().inc(f"{METRIC_PREFIX}_llm_requests_total", 1, {"provider": name, "outcome": outcome}, "Routed LLM calls by provider and outcome")
+
+    @staticmethod
+    def _result(name: str, message: BaseMessage) -> ChatResult:
+        message.response_metadata["routed_provider"] = name
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _call(self, name: str, model: Runnable, messages, stop, kwargs):
+        start = time.perf_counter()
+        message = model.invoke(messages, stop=stop, **kwargs)
+        return name, message, time.perf_counter() - start
+
+    def _settle_loser(self, name: str, call_type: str, future):
+        # An abandoned call still tells us about the provider's health and latency
+        self._abandoned.add(-1)
+        if future.exception() is not None:
+            self._record(name, "error")
+        else:
+            self._record(name, "lose", future.result()[2], call_type)
+
+    def _hedge(self, launch, sync: bool):
+        if not self._may_hedge(sync):
+            return
+        hedged = launch()
+        if hedged is None:
+            self._hedge_budget.refund()
+        else:
+            get_registry().inc(f"{METRIC_PREFIX}_llm_hedges_total", 1, {"provider": hedged}, "Hedged duplicate LLM requests sent")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        candidates = self._candidates()
+        call_type = self._call_type()
+        self._hedge_budget.deposit()
+        pending = {}
+
+        def launch(force: bool = False) -> Optional[str]:
+            chosen = self._launchable(candidates, force)
+            if chosen is not None:
+                pending[_hedge_pool.submit(self._call, chosen[0], chosen[1], messages, stop, kwargs)] = chosen[0]
+                return chosen[0]
+            return None
+
+        first = launch(force=True)
+        timeout = self._hedge_delay(first, call_type) if candidates else None
+        last_error = None
+        while pending:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than its usual tail: hedge
+                self._hedge(launch, sync=True)
+                timeout = None
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    _, message, seconds = future.result()
+                except Exception as e:
+                    last_error = e
+                    self._record(name, "error")
+                    log.warning("LLM provider failed", provider=name, error=str(e)[:200])
+                    continue
+                self._record(name, "win", seconds, call_type)
+                for loser, loser_name in pending.items():
+                    if loser.cancel():
+                        self._breakers[loser_name].release()
+                    else:
+                        self._abandoned.add(1)
+                        loser.add_done_callback(lambda f, n=loser_name: self._settle_loser(n, call_type, f))
+                return self._result(name, message)
+            if not pending and candidates:
+                launch()
+                timeout = None
+        raise last_error
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        candidates = self._candidates()
+        call_type = self._call_type()
+        self._hedge_budget.deposit()
+        pending = {}
+
+        async def call(name, model):
+            start = time.perf_counter()
+            message = await model.ainvoke(messages, stop=stop, **kwargs)
+            return name, message, time.perf_counter() - start
+
+        def launch(force: bool = False) -> Optional[str]:
+            chosen = self._launchable(candidates, force)
+            if chosen is not None:
+                pending[asyncio.ensure_future(call(*chosen))] = chosen[0]
+                return chosen[0]
+            return None
+
+        first = launch(force=True)
+        timeout = self._hedge_delay(first, call_type) if candidates else None
+        last_error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._hedge(launch, sync=False)
+                    timeout = None
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        _, message, seconds = task.result()
+                    except Exception as e:
+                        last_error = e
+                        self._record(name, "error")
+                        log.warning("LLM provider failed", provider=name, error=str(e)[:200])
+                        continue
+                    self._record(name, "win", seconds, call_type)
+                    return self._result(name, message)
+                if not pending and candidates:
+                    launch()
+                    timeout = None
+            raise last_error
+        finally:
+            for task, name in pending.items():
+                task.cancel()
+                self._breakers[name].release()
+                get_registry().inc(f"{METRIC_PREFIX}_llm_requests_total", 1, {"provider": name, "outcome": "cancelled"}, "Routed LLM calls by provider and outcome")
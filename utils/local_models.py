@@ -0,0 +1,129 @@
+import re
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, List, Optional
+from pydantic import BaseModel
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from model.models import Metadata, SummaryResponse, ChangeFormat
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_PAGE_RE = re.compile(r"-{2,}\s*Page\s+(\d+)\s*-{2,}", re.IGNORECASE)
+
+
+def _stable_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class LocalHashEmbeddings(Embeddings, BaseModel):
+    """
+    Deterministic hashing-trick embeddings for offline load testing.
+    Identical texts always map to identical vectors and texts sharing words land close together.
+    """
+
+    dimensions: int = 1536
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        tokens = _WORD_RE.findall(text.lower()) or [text]
+        for token in tokens:
+            h = _stable_hash(token)
+            vector[h % self.dimensions] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    Deterministic chat model that answers the portal prompts without calling a provider.
+    Emits schema-valid JSON for Metadata and SummaryResponse prompts and simulates
+    provider latency as a fixed delay plus output tokens divided by throughput.
+    """
+
+    model_name: str = "local-fake-chat"
+    latency_ms: float = 0.0
+    tokens_per_second: float = 0.0
+    max_output_tokens: int = 2048
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-fake-chat"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._respond(messages)
+        time.sleep(self._simulated_delay(content))
+        return self._to_result(messages, content)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._respond(messages)
+        await asyncio.sleep(self._simulated_delay(content))
+        return self._to_result(messages, content)
+
+    def _simulated_delay(self, content: str) -> float:
+        delay = self.latency_ms / 1000.0
+        if self.tokens_per_second > 0:
+            delay += len(_WORD_RE.findall(content)) / self.tokens_per_second
+        return delay
+
+    def _to_result(self, messages: List[BaseMessage], content: str) -> ChatResult:
+        input_tokens = sum(len(_WORD_RE.findall(str(m.content))) for m in messages)
+        output_tokens = len(_WORD_RE.findall(content))
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"model_name": self.model_name})
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        prompt_text = "\n".join(str(m.content) for m in messages)
+        system_text = "\n".join(str(m.content) for m in messages if isinstance(m, SystemMessage))
+        human = [str(m.content) for m in messages if isinstance(m, HumanMessage)]
+        last_input = human[-1] if human else prompt_text
+
+        if '"SentimentTone"' in prompt_text:
+            return self._metadata_response(prompt_text.split("Analyze this document:", 1)[-1])
+        if '"changes"' in prompt_text and '"Page"' in prompt_text:
+            return self._comparison_response(prompt_text.split("Input documents:", 1)[-1])
+        if "standalone question" in system_text:
+            return last_input.strip()
+        return self._answer_response(system_text, last_input)
+
+    def _metadata_response(self, document_text: str) -> str:
+        lines = [line.strip() for line in document_text.splitlines() if line.strip() and not _PAGE_RE.match(line.strip())]
+        sentences = [s.strip() for s in _SENTENCE_RE.split(" ".join(lines)) if s.strip()]
+        pages = _PAGE_RE.findall(document_text)
+        metadata = Metadata(
+            Summary=sentences[:3] or ["No content available."],
+            Title=lines[0][:120] if lines else "Untitled",
+            Author="Unknown",
+            DateCreated="Unknown",
+            LastModified="Unknown",
+            Publisher="Unknown",
+            Language="English",
+            PageCount=len(set(pages)) if pages else "Not Available",
+            SentimentTone="Neutral",
+        )
+        return json.dumps(metadata.model_dump())
+
+    def _comparison_response(self, combined_docs: str) -> str:
+        pages = sorted({int(p) for p in _PAGE_RE.findall(combined_docs)}) or [1]
+        response = SummaryResponse([ChangeFormat(Page=str(page), changes="NO CHANGE") for page in pages])
+        return json.dumps(response.model_dump())
+
+    def _answer_response(self, context: str, question: str) -> str:
+        words = _WORD_RE.findall(context.split("\n\n", 1)[-1])
+        if not words:
+            return "I don't know."
+        start = _stable_hash(question) % max(len(words) - 40, 1)
+        return " ".join(words[start:start + min(40, self.max_output_tokens)]) + "."
@@ -1,14 +1,29 @@
 import os
 import sys
+import threading
 from dotenv import load_dotenv
 from utils.config_loader import load_config
 from langchain_groq import ChatGroq
 from logger.custom_logger import CustomLogger
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from exception.custom_exception import DocumentException
+from utils.local_models import LocalChatModel, LocalHashEmbeddings
+from utils.llm_router import HedgedChatModel
 
 log = CustomLogger().get_logger(__name__)
 
+# Clients are shared process-wide so connection pools (and TLS sessions) survive across requests
+_clients: dict = {}
+_clients_lock = threading.RLock()
+
+
+def _cached_client(key: tuple, factory):
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+
 class ModelLoader:
     """
     A utility class to load embedding models and LLM models.
@@ -16,17 +31,24 @@ class ModelLoader:
 
     def __init__(self):
         load_dotenv()
-        self._validate_env()
         self.config = load_config()
         log.info("Configuration loaded successfully", config_keys=list(self.config.keys()))
+        self._validate_env()
 
     def _validate_env(self):
         """
         Validate necessary environment variables.
-        Ensure API keys exist.
+        Ensure API keys exist. The local provider needs no keys.
         """
 
-        required_vars = ['OPENAI_API_KEY', 'GROQ_API_KEY']
+        self.llm_provider = os.getenv("LLM_PROVIDER", "openai")
+        default_embedding_provider = "local" if self.llm_provider == "local" else self.config["embedding_model"]["provider"]
+        self.embedding_provider = os.getenv("EMBEDDING_PROVIDER", default_embedding_provider)
+
+        if self.llm_provider == "local" and self.embedding_provider == "local":
+            required_vars = []
+        else:
+            required_vars = ['OPENAI_API_KEY', 'GROQ_API_KEY']
         self.api_keys = {key:os.getenv(key) for key in required_vars}
         missing_vars = [key for key, value in self.api_keys.items() if not value]
         if missing_vars:
@@ -40,9 +62,13 @@ class ModelLoader:
         """
 
         try:
-            log.info("loading embedding model")
-            model_name = self.config["embedding_model"]["model_name"]
-            return OpenAIEmbeddings(model=model_name)
+            log.info("loading embedding model", provider=self.embedding_provider)
+            embedding_config = self.config["embedding_model"]
+            if self.embedding_provider == "local":
+                dimensions = embedding_config.get("dimensions", 1536)
+                return _cached_client(("embeddings", "local", dimensions), lambda: LocalHashEmbeddings(dimensions=dimensions))
+            model_name = embedding_config["model_name"]
+            return _cached_client(("embeddings", "openai", model_name), lambda: OpenAIEmbeddings(model=model_name))
         except Exception as e:
             log.error("Failed to load embedding model", error=str(e))
             raise DocumentException("Failed to load embedding model", sys)
@@ -50,19 +76,55 @@ class ModelLoader:
     def load_llm(self):
         """
         Load and return the LLM model.
+        With `llm_routing.enabled`, returns a HedgedChatModel over the primary and secondary providers.
         """
         """Load LLM dynamically based on provider in config."""
 
-        llm_block = self.config["llm"]
-
         log.info("Loading LLM...")
 
-        provider_key = os.getenv("LLM_PROVIDER", "openai")  # Default openai
+        routing = self.config.get("llm_routing", {}) or {}
+        primary_key = self.llm_provider  # Default openai
+        secondary_key = routing.get("secondary")
+        if not routing.get("enabled") or not secondary_key or secondary_key == primary_key:
+            return self._load_provider_llm(primary_key)
+
+        # Shared so breaker and latency history are process-wide, not per chain
+        key = ("router", primary_key, secondary_key, repr(sorted(routing.items())))
+        return _cached_client(key, lambda: self._build_router(routing, primary_key, secondary_key))
+
+    def _build_router(self, routing: dict, primary_key: str, secondary_key: str) -> HedgedChatModel:
+        llm = HedgedChatModel(
+            primary=self._load_provider_llm(primary_key),
+            secondary=self._load_provider_llm(secondary_key),
+            primary_name=primary_key,
+            secondary_name=secondary_key,
+            hedge_percentile=routing.get("hedge_percentile", 0.95),
+            default_hedge_delay_s=routing.get("default_hedge_delay_seconds", 2.0),
+            min_samples=routing.get("min_samples", 20),
+            failure_threshold=routing.get("failure_threshold", 5),
+            reset_timeout_s=routing.get("reset_timeout_seconds", 30),
+            hedge_budget_ratio=routing.get("hedge_budget_ratio", 0.1),
+            hedge_budget_burst=routing.get("hedge_budget_burst", 10),
+            max_abandoned_losers=routing.get("max_abandoned_losers", 8),
+        )
+        log.info("Hedged LLM routing enabled", primary=primary_key, secondary=secondary_key, hedge_percentile=llm.hedge_percentile)
+        return llm
+
+    def _load_provider_llm(self, provider_key: str):
+        """
+        Return the chat model for one provider block of the `llm` config, built once per process.
+        """
+        llm_block = self.config["llm"]
+
         if provider_key not in llm_block:
             log.error("LLM provider not found in config", provider_key=provider_key)
             raise ValueError(f"Provider '{provider_key}' not found in config")
 
         llm_config = llm_block[provider_key]
+        key = ("llm", provider_key, repr(sorted(llm_config.items())))
+        return _cached_client(key, lambda: self._build_provider_llm(llm_config))
+
+    def _build_provider_llm(self, llm_config: dict):
         provider = llm_config.get("provider")
         model_name = llm_config.get("model_name")
         temperature = llm_config.get("temperature", 0.2)
@@ -84,6 +146,15 @@ class ModelLoader:
                 temperature=temperature,
             )
             return llm
+
+        elif provider == "local":
+            llm=LocalChatModel(
+                model_name=model_name,
+                latency_ms=llm_config.get("latency_ms", 0),
+                tokens_per_second=llm_config.get("tokens_per_second", 0),
+                max_output_tokens=max_tokens,
+            )
+            return llm
             
         # elif provider == "google":
         #     return ChatGoogleGenerativeAI(
@@ -0,0 +1,268 @@
+import os
+import struct
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+import fitz  # PyMuPDF
+import zstandard as zstd
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.instrumentation import get_registry, METRIC_PREFIX
+
+log = CustomLogger().get_logger(__name__)
+
+MAGIC = b"DPPC"
+VERSION = 1
+_HEADER = struct.Struct("<4sHI")      # magic, format version, page count
+_OFFSET = struct.Struct("<Q")
+_HASH_BLOCK = 1 << 20
+
+
+def content_hash(path) -> str:
+    """
+    sha256 of a file's bytes, read in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pdf_pages(path: str) -> tuple[Iterable[str], int]:
+    """
+    Lazily extracted text of every PDF page, and the page count.
+    """
+    doc = fitz.open(path)
+    if doc.is_encrypted:
+        doc.close()
+        raise ValueError(f"PDF is encrypted: {Path(path).name}")
+
+    def pages():
+        with doc:
+            for page_num in range(doc.page_count):
+                yield doc.load_page(page_num).get_text()
+
+    return pages(), doc.page_count
+
+
+class PageCache:
+    """
+    On-disk cache of parsed page text keyed by the source file's content hash, so the same PDF
+    uploaded again (e.g. a compare baseline) is never re-parsed. Each entry is one file: a header,
+    a table of page offsets, then one independent zstd frame per page, so a single page is read
+    with one seek and one small decompression. Writes stream page by page and reads never hold
+    more than a page, so memory stays fixed regardless of document size. The directory is
+    trimmed to `max_size_mb`, least recently used entries first.
+    """
+
+    def __init__(self, cache_dir: str = "cache/pages", compression_level: int = 3, max_size_mb: float = 512):
+        self.cache_dir = Path(cache_dir)
+        self.compression_level = compression_level
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pages"
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def put(self, key: str, pages: Iterable[str], page_count: int):
+        """
+        Store `page_count` page texts under `key`. The entry appears atomically once complete.
+        """
+        writer = self.open_writer(key, page_count)
+        try:
+            for text in pages:
+                writer.write(text)
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+
+    def open_writer(self, key: str, page_count: int) -> "_EntryWriter":
+        """
+        Writer that appends one page frame per `write`; nothing is visible until `commit`.
+        """
+        return _EntryWriter(self, key, page_count)
+
+    def _open(self, key: str):
+        f = open(self._path(key), "rb")
+        magic, version, page_count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            f.close()
+            raise ValueError(f"Unrecognized page cache entry: {key}")
+        return f, page_count
+
+    def page_count(self, key: str) -> int:
+        f, page_count = self._open(key)
+        f.close()
+        return page_count
+
+    def read_page(self, key: str, page_num: int) -> str:
+        """
+        Text of one page (0-based) without touching the rest of the entry.
+        """
+        f, page_count = self._open(key)
+        with f:
+            if not 0 <= page_num < page_count:
+                raise IndexError(f"Page {page_num} out of range for {page_count} pages")
+            f.seek(_HEADER.size + _OFFSET.size * page_num)
+            start, end = struct.unpack("<QQ", f.read(2 * _OFFSET.size))
+            f.seek(start)
+            return zstd.ZstdDecompressor().decompress(f.read(end - start)).decode("utf-8")
+
+    def iter_pages(self, key: str):
+        """
+        Yield every page's text in order, decompressing one frame at a time.
+        """
+        f, page_count = self._open(key)
+        with f:
+            offsets = [_OFFSET.unpack(f.read(_OFFSET.size))[0] for _ in range(page_count + 1)]
+            decompressor = zstd.ZstdDecompressor()
+            for start, end in zip(offsets, offsets[1:]):
+                f.seek(start)
+                yield decompressor.decompress(f.read(end - start)).decode("utf-8")
+        os.utime(self._path(key))
+
+    def _trim(self):
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob("*/*.pages"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                log.info("Page cache entry evicted", entry=path.name, size=size)
+
+
+class _EntryWriter:
+    """
+    Streams one cache entry to a temporary file, page frame by page frame.
+    """
+
+    def __init__(self, cache: PageCache, key: str, page_count: int):
+        self.cache = cache
+        self.path = cache._path(key)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_suffix(f".tmp{os.getpid()}_{threading.get_ident()}")
+        self.page_count = page_count
+        self._compressor = zstd.ZstdCompressor(level=cache.compression_level)
+        self._table_start = _HEADER.size
+        frames_start = self._table_start + _OFFSET.size * (page_count + 1)
+        self._file = open(self.tmp_path, "wb")
+        try:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, page_count))
+            self._file.seek(frames_start)
+        except BaseException:
+            self.abort()
+            raise
+        self._offsets = [frames_start]
+
+    def write(self, text: str):
+        self._file.write(self._compressor.compress(text.encode("utf-8")))
+        self._offsets.append(self._file.tell())
+
+    def commit(self):
+        try:
+            if len(self._offsets) != self.page_count + 1:
+                raise ValueError(f"Expected {self.page_count} pages, got {len(self._offsets) - 1}")
+            self._file.seek(self._table_start)
+            self._file.write(b"".join(_OFFSET.pack(o) for o in self._offsets))
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+        finally:
+            self.abort()
+        self.cache._trim()
+
+    def abort(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+_cache: Optional[PageCache] = None
+_enabled: Optional[bool] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """
+    The process-wide cache from the `page_cache` block of config.yaml, or None when disabled.
+    """
+    global _cache, _enabled
+    with _cache_lock:
+        if _enabled is None:
+            settings = load_config().get("page_cache", {}) or {}
+            _enabled = bool(settings.get("enabled", False))
+            if _enabled:
+                _cache = PageCache(
+                    cache_dir=settings.get("cache_dir", "cache/pages"),
+                    compression_level=settings.get("compression_level", 3),
+                    max_size_mb=settings.get("max_size_mb", 512),
+                )
+        return _cache
+
+
+def cached_pages(path, extract: Callable[[str], tuple[Iterable[str], int]] = pdf_pages) -> Iterator[str]:
+    """
+    Page texts of a file, yielded one at a time: streamed frame by frame from the cache when
+    this exact content was parsed before, otherwise from `extract(path)` (page texts, page count)
+    with each page written to the cache as it is parsed. Extraction errors propagate and leave no
+    entry; a failed cache write is logged and ignored. An entry is only committed once the caller
+    has consumed every page.
+    """
+    cache = get_page_cache()
+    if cache is None:
+        pages, _ = extract(str(path))
+        yield from pages
+        return
+    registry = get_registry()
+    key = content_hash(path)
+    if key in cache:
+        reader = cache.iter_pages(key)
+        try:
+            first = next(reader, None)
+        except Exception as e:
+            log.warning("Unreadable page cache entry, re-parsing", key=key, error=str(e))
+        else:
+            registry.inc(f"{METRIC_PREFIX}_page_cache_total", 1, {"outcome": "hit"}, "Parsed-page cache lookups")
+            if first is not None:
+                yield first
+                yield from reader
+            return
+    registry.inc(f"{METRIC_PREFIX}_page_cache_total", 1, {"outcome": "miss"}, "Parsed-page cache lookups")
+    pages, page_count = extract(str(path))
+    try:
+        writer = cache.open_writer(key, page_count)
+    except Exception as e:
+        log.warning("Could not write page cache entry", key=key, error=str(e))
+        writer = None
+    completed = False
+    try:
+        for text in pages:
+            if writer is not None:
+                try:
+                    writer.write(text)
+                except Exception as e:
+                    log.warning("Could not write page cache entry", key=key, error=str(e))
+                    writer.abort()
+                    writer = None
+            yield text
+        completed = True
+    finally:
+        if writer is not None and not completed:
+            writer.abort()
+    if writer is not None:
+        try:
+            writer.commit()
+        except Exception as e:
+            log.warning("Could not write page cache entry", key=key, error=str(e))
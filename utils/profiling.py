@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+log = CustomLogger().get_logger(__name__)
+
+_settings: Optional[dict] = None
+_settings_lock = threading.Lock()
+_state_lock = threading.Lock()
+_active: dict[int, list["StageProfile"]] = {}   # thread ident -> open stage profiles, innermost last
+_owns_tracing = False   # tracemalloc was started here, so it is stopped when the last stage ends
+# The profiler's own bookkeeping is not a finding
+_SELF_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+
+
+def profiling_settings() -> dict:
+    """
+    The `profiling` block of config.yaml, with PROFILING_ENABLED / PROFILING_DIR env overrides.
+    """
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            try:
+                settings = dict(load_config().get("profiling", {}) or {})
+            except Exception as e:
+                log.warning("Profiling config unavailable, using defaults", error=str(e))
+                settings = {}
+            if os.getenv("PROFILING_ENABLED") is not None:
+                settings["enabled"] = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+            settings["output_dir"] = os.getenv("PROFILING_DIR", settings.get("output_dir", "profiles"))
+            _settings = settings
+        return _settings
+
+
+def profiling_enabled() -> bool:
+    return bool(profiling_settings().get("enabled", False))
+
+
+def _rss_bytes() -> Optional[int]:
+    """
+    Current resident set size from /proc/self/statm; None where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss_bytes() -> Optional[int]:
+    """
+    Process lifetime RSS high-water mark from getrusage (KiB on Linux, bytes on macOS).
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class _Sampler:
+    """
+    One daemon thread that periodically reads sys._current_frames() and adds the stack of every
+    thread with an open stage to that stage's counter, and samples RSS for each open stage's peak.
+    Cost is per sample, not per function call.
+    """
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="stage-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_s)
+            with _state_lock:
+                if not _active:
+                    continue
+                watched = {ident: list(stages) for ident, stages in _active.items()}
+            rss = _rss_bytes()
+            frames = sys._current_frames()
+            for ident, stages in watched.items():
+                if rss is not None:
+                    for stage in stages:
+                        stage.peak_rss_bytes = max(stage.peak_rss_bytes, rss)
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                folded = ";".join(reversed(stack))
+                for stage in stages:
+                    stage.samples[folded] += 1
+
+
+_sampler: Optional[_Sampler] = None
+
+
+class StageProfile:
+    """
+    Memory and CPU profile of one stage: tracemalloc peak and top allocation sites retained by
+    the stage, RSS before, at peak and after (tracemalloc misses native buffers such as FAISS,
+    numpy and PyMuPDF), plus sampled stacks of the thread that ran it. Both are process-wide, so
+    with concurrent requests a stage's peaks are upper bounds that include its neighbours.
+    """
+
+    def __init__(self, stage: str, session_id: Optional[str]):
+        self.stage = stage
+        self.session_id = session_id
+        self.settings = profiling_settings()
+        self.samples: Counter = Counter()
+        self.peak_bytes = 0
+        self.peak_rss_bytes = 0
+        self._ident = threading.get_ident()
+
+    def start(self):
+        global _sampler, _owns_tracing
+        with _state_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.settings.get("traceback_frames", 10))
+                _owns_tracing = True
+            # reset_peak is process-wide: every open stage absorbs the peak so far before it is lost
+            peak_so_far = tracemalloc.get_traced_memory()[1]
+            for stages in _active.values():
+                for open_stage in stages:
+                    open_stage.peak_bytes = max(open_stage.peak_bytes, peak_so_far)
+            _active.setdefault(self._ident, []).append(self)
+            if _sampler is None:
+                _sampler = _Sampler(self.settings.get("sample_interval_ms", 10) / 1000)
+            _sampler.ensure_running()
+            self._start_current = tracemalloc.get_traced_memory()[0]
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(_SELF_FILTERS)
+            tracemalloc.reset_peak()
+        self._start_rss = _rss_bytes()
+        self._start_max_rss = _max_rss_bytes()
+        self.peak_rss_bytes = self._start_rss or 0
+        self._start_time = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    def stop(self, error: Optional[str] = None) -> Optional[Path]:
+        global _owns_tracing
+        duration = time.perf_counter() - self._start_time
+        cpu = time.process_time() - self._start_cpu
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes, peak)
+        end_rss, end_max_rss = _rss_bytes(), _max_rss_bytes()
+        self.peak_rss_bytes = max(self.peak_rss_bytes, end_rss or 0)
+        if end_max_rss is not None and self._start_max_rss is not None and end_max_rss > self._start_max_rss:
+            # The process high-water mark rose during the stage, so that is the stage's exact peak
+            self.peak_rss_bytes = max(self.peak_rss_bytes, end_max_rss)
+        top_n = self.settings.get("top_allocations", 15)
+        stats = []
+        if tracemalloc.is_tracing():
+            stats = tracemalloc.take_snapshot().filter_traces(_SELF_FILTERS).compare_to(self._snapshot, "lineno")
+        top = [
+            {"site": str(stat.traceback[0]), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff}
+            for stat in stats[:top_n] if stat.size_diff > 0
+        ]
+        with _state_lock:
+            stages = _active.get(self._ident, [])
+            if self in stages:
+                stages.remove(self)
+            if not stages:
+                _active.pop(self._ident, None)
+            if _owns_tracing and not _active:
+                tracemalloc.stop()
+                _owns_tracing = False
+
+        if duration * 1000 < self.settings.get("min_duration_ms", 50):
+            return None
+        return self._write({
+            "stage": self.stage,
+            "session_id": self.session_id,
+            "pid": os.getpid(),
+            "error": error,
+            "duration_seconds": round(duration, 4),
+            "cpu_seconds": round(cpu, 4),
+            "peak_traced_bytes": self.peak_bytes,
+            "retained_bytes": current - self._start_current,
+            "rss_start_bytes": self._start_rss,
+            "rss_peak_bytes": self.peak_rss_bytes or None,
+            "rss_end_bytes": end_rss,
+            "max_rss_bytes": end_max_rss,
+            "top_allocations": top,
+            "cpu_samples": sum(self.samples.values()),
+            "top_stacks": [{"stack": s, "samples": n} for s, n in self.samples.most_common(10)],
+        })
+
+    def _write(self, report: dict) -> Optional[Path]:
+        try:
+            session_dir = Path(self.settings["output_dir"]) / (self.session_id or "no_session")
+            session_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d_%H%M%S')}_{self.stage}_{os.getpid()}_{id(self):x}"
+            report_path = session_dir / f"{name}.json"
+            report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            if self.samples:
+                # Folded stacks, loadable by flamegraph.pl or speedscope
+                (session_dir / f"{name}.folded").write_text(
+                    "\n".join(f"{stack} {count}" for stack, count in self.samples.items()), encoding="utf-8"
+                )
+            log.info("Stage profile written", stage=self.stage, session_id=self.session_id, path=str(report_path),
+                     peak_mb=round(self.peak_bytes / 1e6, 2), peak_rss_mb=round(self.peak_rss_bytes / 1e6, 2),
+                     cpu_samples=report["cpu_samples"])
+            return report_path
+        except Exception as e:
+            log.warning("Failed to write stage profile", stage=self.stage, error=str(e))
+            return None
+
+
+def start_stage_profile(stage: str, session_id: Optional[str]) -> Optional[StageProfile]:
+    """
+    Start profiling a stage when profiling is switched on; returns None otherwise.
+    """
+    if not profiling_enabled():
+        return None
+    profile = StageProfile(stage, session_id)
+    profile.start()
+    return profile
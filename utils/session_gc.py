@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import threading
+from pathlib import Path
+from typing import Optional
+from contextlib import contextmanager
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.shared_index import tombstone_marked_session, compact_index_dir
+
+log = CustomLogger().get_logger(__name__)
+
+ACCESS_DIR = ".access"
+LEASE_DIR = ".leases"
+TRASH_DIR = ".trash"
+
+DEFAULT_STORES = [
+    "data/document_analysis",
+    "data/document_compare",
+    "data/single_document_chat",
+    "data/multi_document_chat",
+    "faiss_index",
+]
+
+
+def _touch(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a"):
+        pass
+    os.utime(path, None)
+
+
+def touch_session(session_path) -> None:
+    """
+    Record that a session was just used. Access times live in <store>/.access/<session>
+    so they work for both session directories and single session files.
+    """
+    try:
+        session_path = Path(session_path)
+        _touch(session_path.parent / ACCESS_DIR / session_path.name)
+        _ensure_collector()
+    except Exception as e:
+        log.warning("Failed to record session access", session_path=str(session_path), error=str(e))
+
+
+def last_access(session_path) -> float:
+    """
+    When a session was last used: its access marker, else the path's own mtime.
+    """
+    session_path = Path(session_path)
+    access_marker = session_path.parent / ACCESS_DIR / session_path.name
+    return access_marker.stat().st_mtime if access_marker.exists() else session_path.stat().st_mtime
+
+
+@contextmanager
+def session_lease(session_path):
+    """
+    Mark a session as in-flight for the duration of the block so the collector never evicts it.
+    Leases are files under <store>/.leases so other worker processes see them too.
+    """
+    session_path = Path(session_path)
+    lease = session_path.parent / LEASE_DIR / f"{session_path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    touch_session(session_path)
+    try:
+        _touch(lease)
+    except Exception as e:
+        log.warning("Failed to create session lease", session_path=str(session_path), error=str(e))
+    try:
+        yield
+    finally:
+        lease.unlink(missing_ok=True)
+        touch_session(session_path)
+
+
+class SessionGarbageCollector:
+    """
+    Enforces a global disk quota over all session stores with LRU eviction.
+
+    Sessions sharing a name across stores (e.g. data/multi_document_chat/<id> and faiss_index/<id>)
+    are evicted together. Evicted sessions are renamed into <store>/.trash, which is O(1), and the
+    trash is then drained a bounded number of files per tick so deletion never stalls requests.
+    Sessions kept in the shared FAISS index are tombstoned there when evicted and compacted at the
+    end of the tick.
+    """
+
+    def __init__(self, stores: Optional[list[str]] = None, max_disk_bytes: int = 5 * 1024 ** 3, low_watermark: float = 0.9,
+                 interval_seconds: float = 30.0, max_deletes_per_tick: int = 500, lease_ttl_seconds: float = 6 * 3600):
+        self.stores = [Path(s) for s in (stores or DEFAULT_STORES)]
+        self.max_disk_bytes = max_disk_bytes
+        self.low_watermark = low_watermark
+        self.interval_seconds = interval_seconds
+        self.max_deletes_per_tick = max_deletes_per_tick
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _is_session(entry: Path) -> bool:
+        # Dot entries are GC bookkeeping, underscore entries are shared infrastructure (e.g. faiss_index/_shared)
+        if entry.name.startswith((".", "_")):
+            return False
+        # Loose files at a store root (e.g. a shared index.faiss) are not sessions unless named like one
+        return entry.is_dir() or entry.name.startswith("session_")
+
+    @staticmethod
+    def _size(entry: Path) -> int:
+        # Recomputed every sweep: files rewritten in place (e.g. index.faiss) do not touch directory mtimes
+        if entry.is_file():
+            return entry.stat().st_size
+        total = 0
+        for root, _, files in os.walk(entry):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _leased_sessions(self) -> set[str]:
+        leased, now = set(), time.time()
+        for store in self.stores:
+            lease_dir = store / LEASE_DIR
+            if not lease_dir.is_dir():
+                continue
+            for lease in lease_dir.iterdir():
+                try:
+                    if now - lease.stat().st_mtime > self.lease_ttl_seconds:
+                        lease.unlink(missing_ok=True)  # left behind by a crashed worker
+                        continue
+                except FileNotFoundError:
+                    continue
+                leased.add(lease.name.rsplit(".", 2)[0])
+        return leased
+
+    def scan(self) -> dict[str, dict]:
+        """
+        Return {session_name: {"paths", "bytes", "last_access"}} across all stores.
+        """
+        sessions: dict[str, dict] = {}
+        for store in self.stores:
+            if not store.is_dir():
+                continue
+            for entry in store.iterdir():
+                try:
+                    if not self._is_session(entry):
+                        continue
+                    info = sessions.setdefault(entry.name, {"paths": [], "bytes": 0, "last_access": 0.0})
+                    info["paths"].append(entry)
+                    info["bytes"] += self._size(entry)
+                    info["last_access"] = max(info["last_access"], last_access(entry))
+                except FileNotFoundError:
+                    continue  # removed while scanning
+        return sessions
+
+    def _evict(self, name: str, info: dict) -> set[str]:
+        shared_dirs = set()
+        for path in info["paths"]:
+            if path.is_dir():
+                try:
+                    shared_dir = tombstone_marked_session(path)
+                    if shared_dir:
+                        shared_dirs.add(shared_dir)
+                except Exception as e:
+                    log.warning("Failed to tombstone shared-index session", session=name, error=str(e))
+            trash = path.parent / TRASH_DIR
+            trash.mkdir(exist_ok=True)
+            os.rename(path, trash / f"{path.name}.{uuid.uuid4().hex[:8]}")
+            (path.parent / ACCESS_DIR / path.name).unlink(missing_ok=True)
+        log.info("Session evicted", session=name, bytes=info["bytes"], last_access=info["last_access"])
+        return shared_dirs
+
+    def _drain_trash(self, budget: int) -> int:
+        deleted = 0
+        for store in self.stores:
+            trash = store / TRASH_DIR
+            if not trash.is_dir():
+                continue
+            for root, dirs, files in os.walk(trash, topdown=False):
+                for name in files:
+                    if deleted >= budget:
+                        return deleted
+                    os.unlink(os.path.join(root, name))
+                    deleted += 1
+                if Path(root) != trash and not os.listdir(root):
+                    os.rmdir(root)
+        return deleted
+
+    def tick(self):
+        """
+        One incremental GC step: drain part of the trash, then evict LRU sessions while over quota.
+        """
+        deleted = self._drain_trash(self.max_deletes_per_tick)
+        sessions = self.scan()
+        total = sum(info["bytes"] for info in sessions.values())
+        if total <= self.max_disk_bytes:
+            return deleted
+
+        target = self.max_disk_bytes * self.low_watermark
+        shared_dirs = set()
+        for name, info in sorted(sessions.items(), key=lambda item: item[1]["last_access"]):
+            if total <= target:
+                break
+            # Re-read leases per candidate so a job that started after the scan is still protected
+            if name in self._leased_sessions():
+                continue
+            shared_dirs |= self._evict(name, info)
+            total -= info["bytes"]
+        for shared_dir in shared_dirs:
+            try:
+                compact_index_dir(shared_dir)
+            except Exception as e:
+                log.warning("Shared index compaction failed", index_dir=shared_dir, error=str(e))
+        log.info("Session GC tick", usage_bytes=total, quota_bytes=self.max_disk_bytes, files_deleted=deleted)
+        return deleted
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.tick()
+            except Exception as e:
+                log.warning("Session GC tick failed", error=str(e))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="session-gc", daemon=True)
+            self._thread.start()
+            log.info("Session GC started", stores=[str(s) for s in self.stores], quota_bytes=self.max_disk_bytes)
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+_collector: Optional[SessionGarbageCollector] = None
+_collector_lock = threading.Lock()
+
+
+def _ensure_collector():
+    global _collector
+    if _collector is not None:
+        return
+    with _collector_lock:
+        if _collector is not None:
+            return
+        settings = load_config().get("session_gc", {}) or {}
+        _collector = SessionGarbageCollector(
+            stores=settings.get("stores"),
+            max_disk_bytes=int(settings.get("max_disk_mb", 5120)) * 1024 * 1024,
+            low_watermark=settings.get("low_watermark", 0.9),
+            interval_seconds=settings.get("interval_seconds", 30),
+            max_deletes_per_tick=settings.get("max_deletes_per_tick", 500),
+            lease_ttl_seconds=settings.get("lease_ttl_seconds", 6 * 3600),
+        )
+        if settings.get("enabled", False):
+            _collector.start()
@@ -0,0 +1,181 @@
+import os
+import json
+import heapq
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, List
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+MANIFEST_NAME = "shards.json"
+
+# FAISS releases the GIL inside search, so shard searches run truly in parallel on these threads
+_search_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="faiss-shard")
+
+
+def is_sharded_index(index_path) -> bool:
+    return (Path(index_path) / MANIFEST_NAME).exists()
+
+
+class ShardedFaissIndex:
+    """
+    A session index split into FAISS shards on disk. Shard i holds a contiguous range of global
+    chunk ids starting at its `offset`; chunk text lives in SQLite next to the shards. Shards are
+    loaded on first use (memory-mapped when `mmap` is on), so a large corpus can be served without
+    holding every vector in RAM, and searches fan out over all shards concurrently.
+    """
+
+    def __init__(self, index_dir: str, embeddings=None, mmap: bool = False):
+        self.index_dir = Path(index_dir)
+        self.embeddings = embeddings
+        self.mmap = mmap
+        self.manifest = json.loads((self.index_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        self._shards: dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_dir / "chunks.db", check_same_thread=False)
+
+    @classmethod
+    def build(cls, index_dir: str, documents: List[Document], embeddings, num_shards: int = 4,
+              index_factory: str = "Flat", mmap: bool = False) -> "ShardedFaissIndex":
+        """
+        Embed and write `documents` as `num_shards` shards. Each shard is embedded, written and
+        released before the next, so peak memory is one shard's vectors.
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        num_shards = max(1, min(num_shards, len(documents)))
+        # At least 1 so an empty session builds an index with no shards instead of range(0, 0, 0)
+        shard_size = max(1, -(-len(documents) // num_shards))
+        db = sqlite3.connect(index_dir / "chunks.db")
+        db.executescript("""
+            DROP TABLE IF EXISTS chunks;
+            CREATE TABLE chunks (id INTEGER PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL);
+        """)
+        shards, dimension = [], None
+        for shard_id, offset in enumerate(range(0, len(documents), shard_size)):
+            batch = documents[offset:offset + shard_size]
+            vectors = np.asarray(embeddings.embed_documents([d.page_content for d in batch]), dtype="float32")
+            dimension = vectors.shape[1]
+            index = faiss.index_factory(dimension, index_factory, faiss.METRIC_L2)
+            if not index.is_trained:
+                index.train(vectors)
+            index.add(vectors)
+            file_name = f"shard_{shard_id}.faiss"
+            faiss.write_index(index, str(index_dir / file_name))
+            db.executemany(
+                "INSERT INTO chunks (id, content, metadata) VALUES (?, ?, ?)",
+                [(offset + i, d.page_content, json.dumps(d.metadata, default=str)) for i, d in enumerate(batch)],
+            )
+            shards.append({"file": file_name, "offset": offset, "count": len(batch)})
+        db.commit()
+        db.close()
+        manifest = {"dimension": dimension, "index_factory": index_factory, "metric": "l2", "shards": shards}
+        tmp_path = index_dir / f"{MANIFEST_NAME}.tmp"
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_path, index_dir / MANIFEST_NAME)
+        log.info("Sharded FAISS index built", index_dir=str(index_dir), shards=len(shards), chunks=len(documents))
+        return cls(str(index_dir), embeddings, mmap=mmap)
+
+    def _shard(self, shard_id: int):
+        with self._lock:
+            index = self._shards.get(shard_id)
+            if index is None:
+                path = str(self.index_dir / self.manifest["shards"][shard_id]["file"])
+                index = None
+                if self.mmap:
+                    try:
+                        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                    except RuntimeError as e:
+                        log.warning("Shard cannot be memory-mapped, reading into RAM", shard=shard_id, error=str(e)[:200])
+                if index is None:
+                    index = faiss.read_index(path)
+                self._shards[shard_id] = index
+            return index
+
+    def preload(self):
+        """
+        Load (or map) every shard now instead of on the first search.
+        """
+        for shard_id in range(len(self.manifest["shards"])):
+            self._shard(shard_id)
+
+    def _search_shard(self, shard_id: int, matrix: np.ndarray, k: int):
+        offset = self.manifest["shards"][shard_id]["offset"]
+        distances, ids = self._shard(shard_id).search(matrix, k)
+        return distances, np.where(ids >= 0, ids + offset, -1)
+
+    def search(self, vectors, k: int = 4) -> List[List[int]]:
+        """
+        Top-k global chunk ids per query: every shard is searched in parallel and the per-shard
+        top-k lists are merged with a heap.
+        """
+        if not self.manifest["shards"]:
+            return [[] for _ in vectors]
+        matrix = np.asarray(vectors, dtype="float32").reshape(-1, self.manifest["dimension"])
+        results = list(_search_pool.map(lambda shard_id: self._search_shard(shard_id, matrix, k), range(len(self.manifest["shards"]))))
+        merged = []
+        for row in range(matrix.shape[0]):
+            candidates = (
+                (float(distances[row, j]), int(ids[row, j]))
+                for distances, ids in results for j in range(ids.shape[1]) if ids[row, j] >= 0
+            )
+            merged.append([chunk_id for _, chunk_id in heapq.nsmallest(k, candidates)])
+        return merged
+
+    def documents(self, ids: List[int]) -> List[Document]:
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = {r[0]: r for r in self._db.execute(f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})", ids)}
+        return [Document(page_content=rows[i][1], metadata=json.loads(rows[i][2])) for i in ids if i in rows]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return self.documents(self.search([embedding], k)[0])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+    def as_retriever(self, k: int = 4) -> "ShardedRetriever":
+        return ShardedRetriever(vectorstore=self, search_kwargs={"k": k})
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+            self._shards.clear()
+
+
+class ShardedRetriever(BaseRetriever):
+    vectorstore: Any
+    search_type: str = "similarity"
+    search_kwargs: dict = {"k": 4}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.vectorstore.similarity_search(query, k=self.search_kwargs.get("k", 4))
+
+
+_sharded_indexes: dict[str, tuple[int, ShardedFaissIndex]] = {}
+_sharded_lock = threading.Lock()
+
+
+def get_sharded_index(index_dir: str, embeddings, mmap: bool = False) -> ShardedFaissIndex:
+    """
+    Return the process-wide ShardedFaissIndex for a directory, reopening it if it was rebuilt.
+    A replaced instance is dropped, not closed: requests still searching it finish, and garbage
+    collection reclaims its connection and shards once the last of them lets go.
+    """
+    key = str(Path(index_dir).resolve())
+    version = os.stat(Path(index_dir) / MANIFEST_NAME).st_mtime_ns
+    with _sharded_lock:
+        cached = _sharded_indexes.get(key)
+        if cached is None or cached[0] != version:
+            _sharded_indexes[key] = (version, ShardedFaissIndex(index_dir, embeddings, mmap=mmap))
+        return _sharded_indexes[key][1]
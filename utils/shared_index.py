@@ -0,0 +1,318 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, List, Optional
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+# Vector ids are (session slot << 32) | chunk sequence, so a session's rows form one contiguous id range
+_SLOT_SHIFT = 32
+
+DB_NAME = "shared.db"
+# Written into faiss_index/<session> so the session GC and the retriever loaders can find the session
+SHARED_MARKER = "shared_index.json"
+
+_SCHEMA = """
+    PRAGMA journal_mode=WAL;
+    CREATE TABLE IF NOT EXISTS sessions (
+        slot INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        next_seq INTEGER NOT NULL DEFAULT 0,
+        deleted INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS sessions_by_id ON sessions (session_id, deleted);
+    CREATE TABLE IF NOT EXISTS chunks (
+        pos INTEGER PRIMARY KEY AUTOINCREMENT,
+        id INTEGER UNIQUE NOT NULL,
+        content TEXT NOT NULL,
+        metadata TEXT NOT NULL,
+        vector BLOB NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+
+def _connect(index_dir: Path) -> sqlite3.Connection:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(index_dir / DB_NAME, timeout=30, check_same_thread=False, isolation_level=None)
+    db.executescript(_SCHEMA)
+    return db
+
+
+class _SessionIndex:
+    """
+    In-memory FAISS index of one session's chunks and the last chunk row it has absorbed.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.synced_pos = 0
+
+
+class SharedFaissIndex:
+    """
+    One chunk store shared by every session, with a FAISS sub-index per session.
+
+    SQLite next to the index is the source of truth: chunk text, metadata and vectors are appended
+    per upload in one transaction, so an ingestion costs O(its own chunks) on disk and writers in
+    several worker processes serialize on the database instead of overwriting each other. A process
+    only builds the sub-indexes of sessions it searches or ingests, pulling rows it has not seen (by
+    the monotonic `pos`) before each search, so a search scans one session's vectors and memory
+    grows with the sessions a process serves, not with every tenant. At most `max_loaded_sessions`
+    stay in memory; the least recently used is dropped and rebuilt from SQLite on its next search.
+    Deleting a session writes a tombstone; `compact()` reclaims its rows later and bumps a
+    generation counter so every process drops the reclaimed sessions from memory.
+    """
+
+    def __init__(self, index_dir: str = "faiss_index/_shared", embeddings=None, index_factory: str = "IDMap2,Flat",
+                 max_loaded_sessions: int = 256):
+        self.index_dir = Path(index_dir)
+        self.embeddings = embeddings
+        self.index_factory = index_factory
+        self.max_loaded_sessions = max_loaded_sessions
+        self._db = _connect(self.index_dir)
+        self._db_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        # slot -> sub-index, in least-recently-used order
+        self._sessions: dict[int, _SessionIndex] = {}
+        self._generation = self._read_generation()
+        log.info("Shared FAISS index opened", index_dir=str(self.index_dir), max_loaded_sessions=max_loaded_sessions)
+
+    def _read_generation(self) -> int:
+        with self._db_lock:
+            return self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def _active_slot(self, session_id: str) -> Optional[int]:
+        with self._db_lock:
+            row = self._db.execute("SELECT slot FROM sessions WHERE session_id = ? AND deleted = 0", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def has_session(self, session_id: str) -> bool:
+        return self._active_slot(session_id) is not None
+
+    def loaded_vectors(self) -> int:
+        """
+        Vectors held in memory by this process, across its loaded sessions.
+        """
+        with self._index_lock:
+            return sum(s.index.ntotal for s in self._sessions.values() if s.index is not None)
+
+    def _sync(self, slot: int) -> _SessionIndex:
+        """
+        Load or refresh one session's sub-index with rows written by this or any other process.
+        Caller holds `_index_lock`.
+        """
+        generation = self._read_generation()
+        if generation != self._generation:
+            with self._db_lock:
+                live = {r[0] for r in self._db.execute("SELECT slot FROM sessions")}
+            for dropped in set(self._sessions) - live:
+                del self._sessions[dropped]
+            self._generation = generation
+        session = self._sessions.pop(slot, None) or _SessionIndex()
+        self._sessions[slot] = session
+        while True:
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT pos, id, vector FROM chunks WHERE id >= ? AND id < ? AND pos > ? ORDER BY pos LIMIT 10000",
+                    (slot << _SLOT_SHIFT, (slot + 1) << _SLOT_SHIFT, session.synced_pos),
+                ).fetchall()
+            if not rows:
+                break
+            vectors = np.stack([np.frombuffer(r[2], dtype="float32") for r in rows])
+            if session.index is None:
+                session.index = faiss.index_factory(vectors.shape[1], self.index_factory, faiss.METRIC_L2)
+            session.index.add_with_ids(vectors, np.array([r[1] for r in rows], dtype="int64"))
+            session.synced_pos = rows[-1][0]
+        while len(self._sessions) > self.max_loaded_sessions:
+            del self._sessions[next(iter(self._sessions))]
+        return session
+
+    def add_documents(self, session_id: str, documents: List[Document]) -> int:
+        """
+        Append chunks to the session. A tombstoned session id gets a fresh slot, so its deleted
+        chunks never come back.
+        """
+        if not documents:
+            return 0
+        vectors = np.asarray(self.embeddings.embed_documents([d.page_content for d in documents]), dtype="float32")
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT slot, next_seq FROM sessions WHERE session_id = ? AND deleted = 0", (session_id,)).fetchone()
+                if row is None:
+                    row = (self._db.execute("INSERT INTO sessions (session_id) VALUES (?)", (session_id,)).lastrowid, 0)
+                slot, next_seq = row
+                ids = np.arange(next_seq, next_seq + len(documents), dtype="int64") | (slot << _SLOT_SHIFT)
+                self._db.executemany(
+                    "INSERT INTO chunks (id, content, metadata, vector) VALUES (?, ?, ?, ?)",
+                    [(int(i), d.page_content, json.dumps(d.metadata, default=str), v.tobytes()) for i, d, v in zip(ids, documents, vectors)],
+                )
+                self._db.execute("UPDATE sessions SET next_seq = ? WHERE slot = ?", (next_seq + len(documents), slot))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        with self._index_lock:
+            session_vectors = self._sync(slot).index.ntotal
+        log.info("Chunks added to shared index", session_id=session_id, chunks=len(documents), session_vectors=session_vectors)
+        return len(documents)
+
+    def similarity_search_by_vector(self, session_id: str, vector: List[float], k: int = 4) -> List[Document]:
+        slot = self._active_slot(session_id)
+        if slot is None:
+            return []
+        with self._index_lock:
+            index = self._sync(slot).index
+            if index is None:
+                return []
+            _, ids = index.search(np.asarray([vector], dtype="float32"), k)
+        hits = [int(i) for i in ids[0] if i >= 0]
+        if not hits:
+            return []
+        placeholders = ",".join("?" * len(hits))
+        with self._db_lock:
+            rows = {r[0]: r for r in self._db.execute(f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})", hits)}
+        return [Document(page_content=rows[i][1], metadata=json.loads(rows[i][2])) for i in hits if i in rows]
+
+    def delete_session(self, session_id: str):
+        """
+        Tombstone a session: searches stop seeing it immediately; its rows are reclaimed by `compact()`.
+        """
+        slot = self._active_slot(session_id)
+        with self._db_lock:
+            tombstone_session(self._db, session_id)
+        with self._index_lock:
+            self._sessions.pop(slot, None)
+
+    def compact(self) -> int:
+        """
+        Physically remove tombstoned sessions from the chunk store; open instances drop them from
+        memory on their next search.
+        """
+        with self._db_lock:
+            return compact_db(self._db)
+
+    def as_retriever(self, session_id: str, k: int = 4) -> "SharedIndexRetriever":
+        return SharedIndexRetriever(vectorstore=_SessionView(self, session_id), search_kwargs={"k": k})
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+
+def tombstone_session(db: sqlite3.Connection, session_id: str):
+    db.execute("UPDATE sessions SET deleted = 1 WHERE session_id = ? AND deleted = 0", (session_id,))
+    log.info("Session tombstoned in shared index", session_id=session_id)
+
+
+def compact_db(db: sqlite3.Connection) -> int:
+    """
+    Delete the chunk rows of tombstoned sessions and bump the generation. Returns rows removed.
+    """
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        slots = [r[0] for r in db.execute("SELECT slot FROM sessions WHERE deleted = 1")]
+        removed = 0
+        for slot in slots:
+            low, high = slot << _SLOT_SHIFT, (slot + 1) << _SLOT_SHIFT
+            removed += db.execute("DELETE FROM chunks WHERE id >= ? AND id < ?", (low, high)).rowcount
+            db.execute("DELETE FROM sessions WHERE slot = ?", (slot,))
+        if slots:
+            db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    if slots:
+        log.info("Shared index compacted", sessions=len(slots), rows_removed=removed)
+    return removed
+
+
+def write_session_marker(session_dir, session_id: str, index_dir: str):
+    """
+    Record in the session's own directory that its chunks live in the shared index at index_dir.
+    """
+    session_dir = Path(session_dir)
+    session_dir.mkdir(parents=True, exist_ok=True)
+    (session_dir / SHARED_MARKER).write_text(json.dumps({"session_id": session_id, "index_dir": str(index_dir)}), encoding="utf-8")
+
+
+def read_session_marker(session_dir) -> Optional[dict]:
+    marker = Path(session_dir) / SHARED_MARKER
+    return json.loads(marker.read_text(encoding="utf-8")) if marker.exists() else None
+
+
+def tombstone_marked_session(session_dir) -> Optional[str]:
+    """
+    Tombstone the shared-index session recorded in session_dir, without loading any vectors.
+    Returns the shared index directory, or None when session_dir is not a shared-mode session.
+    """
+    marker = read_session_marker(session_dir)
+    if marker is None:
+        return None
+    db = _connect(Path(marker["index_dir"]))
+    try:
+        tombstone_session(db, marker["session_id"])
+    finally:
+        db.close()
+    return marker["index_dir"]
+
+
+def compact_index_dir(index_dir: str) -> int:
+    """
+    Compact the shared index at index_dir from any process; open instances catch up on their next search.
+    """
+    db = _connect(Path(index_dir))
+    try:
+        return compact_db(db)
+    finally:
+        db.close()
+
+
+class _SessionView:
+    """
+    Vector-store-like view of one session, so the embed/search stage split in utils.vector_search applies.
+    """
+
+    def __init__(self, shared: SharedFaissIndex, session_id: str):
+        self.shared = shared
+        self.session_id = session_id
+        self.embeddings = shared.embeddings
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return self.shared.similarity_search_by_vector(self.session_id, embedding, k)
+
+
+class SharedIndexRetriever(BaseRetriever):
+    vectorstore: Any
+    search_type: str = "similarity"
+    search_kwargs: dict = {"k": 4}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vector = self.vectorstore.embeddings.embed_query(query)
+        return self.vectorstore.similarity_search_by_vector(vector, k=self.search_kwargs.get("k", 4))
+
+
+_shared_indexes: dict[str, SharedFaissIndex] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_index(index_dir: str, embeddings, index_factory: str = "IDMap2,Flat",
+                     max_loaded_sessions: int = 256) -> SharedFaissIndex:
+    """
+    Return the process-wide SharedFaissIndex for a directory, opening it once.
+    """
+    key = str(Path(index_dir).resolve())
+    with _shared_lock:
+        if key not in _shared_indexes:
+            _shared_indexes[key] = SharedFaissIndex(index_dir, embeddings, index_factory, max_loaded_sessions)
+        return _shared_indexes[key]
@@ -0,0 +1,114 @@
+import re
+import ast
+import json
+from typing import Any
+from pydantic import BaseModel, ValidationError
+from logger.custom_logger import CustomLogger
+from utils.instrumentation import span, get_registry, METRIC_PREFIX
+from utils.llm_router import HedgedChatModel
+
+log = CustomLogger().get_logger(__name__)
+
+# Providers whose chat API can be forced to emit a JSON object
+NATIVE_JSON_LLM_TYPES = {"openai-chat", "local-fake-chat"}
+
+_THINK_RE = re.compile(r"<think>.*?(</think>|$)", re.DOTALL | re.IGNORECASE)
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def bind_native_json(llm, schema: type[BaseModel]):
+    """
+    Ask the provider for JSON output directly when it supports it and the schema is a JSON object.
+    Otherwise return the LLM unchanged. A hedged router gets each of its providers bound.
+    """
+    if isinstance(llm, HedgedChatModel):
+        return llm.map_providers(lambda model: bind_native_json(model, schema))
+    if getattr(llm, "_llm_type", "") not in NATIVE_JSON_LLM_TYPES:
+        return llm
+    if schema.model_json_schema().get("type") != "object":
+        return llm
+    return llm.bind(response_format={"type": "json_object"})
+
+
+def _extract_balanced(text: str) -> str:
+    """
+    Cut the first JSON object/array out of surrounding prose, closing brackets left open by truncation.
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise ValueError("No JSON object or array found")
+    stack, in_string, escaped = [], False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:i + 1]
+    return text[start:] + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Any:
+    """
+    Deterministic local repair of common LLM JSON defects: <think> preambles, code fences,
+    surrounding prose, smart quotes, trailing commas, Python literals and truncated brackets.
+    Raises ValueError when the text cannot be repaired.
+    """
+    text = _THINK_RE.sub("", text)
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    candidate = _TRAILING_COMMA_RE.sub(r"\1", _extract_balanced(text.translate(_SMART_QUOTES)))
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(candidate)
+    except (ValueError, SyntaxError) as e:
+        raise ValueError(f"Unrepairable JSON: {e}") from e
+
+
+def _validate(data: Any, schema: type[BaseModel]) -> Any:
+    return schema.model_validate(data).model_dump()
+
+
+def parse_structured_output(text: str, schema: type[BaseModel], fixing_parser, chain: str) -> Any:
+    """
+    Parse and validate LLM output against the schema, trying in order: plain JSON, local repair,
+    and only then the OutputFixingParser (an extra LLM round-trip). The path taken is counted in
+    document_portal_structured_output_total{chain, path}.
+    """
+    result, path = None, None
+    with span(f"{chain}.parse"):
+        try:
+            result, path = _validate(json.loads(text), schema), "direct"
+        except (json.JSONDecodeError, ValidationError):
+            try:
+                result, path = _validate(repair_json(text), schema), "repaired"
+            except (ValueError, ValidationError) as e:
+                log.warning("Structured output needs LLM fixing", chain=chain, error=str(e)[:200])
+
+    if path is None:
+        with span(f"{chain}.fix"):
+            result = fixing_parser.parse(text)
+        try:
+            result, path = _validate(result, schema), "llm_fixer"
+        except ValidationError:
+            path = "llm_fixer_unvalidated"
+
+    get_registry().inc(f"{METRIC_PREFIX}_structured_output_total", 1, {"chain": chain, "path": path}, "Structured output parses by repair path")
+    return result
@@ -0,0 +1,147 @@
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator
+import tiktoken
+from langchain_core.documents import Document
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+# Sentence ends followed by whitespace, or a blank line between paragraphs
+_BOUNDARY_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+# Offline approximation of BPE: words in pieces of up to 4 characters, punctuation on its own
+_APPROX_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def load_encoding(encoding_name: str):
+    """
+    Return the tiktoken encoding, or None to use the approximate counter when it is
+    requested explicitly ("approximate") or the BPE file cannot be loaded offline.
+    The result is cached so a missing BPE file is only looked up once per process.
+    """
+    if encoding_name == "approximate":
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        log.warning("Tokenizer unavailable, using approximate token counts", encoding=encoding_name, error=str(e)[:200])
+        return None
+
+
+class SentenceTokenSplitter:
+    """
+    Splits documents into chunks measured in model tokens, packing whole sentences and never
+    crossing a page (each input Document is split on its own, so page metadata stays exact).
+    Overlap is whole trailing sentences up to `chunk_overlap` tokens.
+    """
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 32, encoding_name: str = "cl100k_base"):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = load_encoding(encoding_name)
+
+    def _count_tokens(self, texts: list[str]) -> list[int]:
+        if self.encoding is None:
+            return [len(_APPROX_TOKEN_RE.findall(t)) for t in texts]
+        return [len(t) for t in self.encoding.encode_ordinary_batch(texts)]
+
+    @staticmethod
+    def _sentence_spans(text: str) -> list[tuple[int, int]]:
+        spans, start = [], 0
+        for match in _BOUNDARY_RE.finditer(text):
+            if match.start() > start:
+                spans.append((start, match.start()))
+            start = match.end()
+        if start < len(text) and text[start:].strip():
+            spans.append((start, len(text)))
+        return spans
+
+    def _oversized(self, sentence: str) -> list[str]:
+        step = self.chunk_size - self.chunk_overlap
+        if self.encoding is None:
+            spans = [m.span() for m in _APPROX_TOKEN_RE.finditer(sentence)]
+            return [sentence[spans[i][0]:spans[min(i + self.chunk_size, len(spans)) - 1][1]] for i in range(0, len(spans), step)]
+        tokens = self.encoding.encode_ordinary(sentence)
+        return [self.encoding.decode(tokens[i:i + self.chunk_size]) for i in range(0, len(tokens), step)]
+
+    def split_text(self, text: str) -> list[str]:
+        spans = self._sentence_spans(text)
+        if not spans:
+            return []
+        counts = self._count_tokens([text[s:e] for s, e in spans])
+
+        chunks, window, window_tokens = [], [], 0
+        for span, count in zip(spans, counts):
+            if count > self.chunk_size:
+                if window:
+                    chunks.append(text[window[0][0][0]:window[-1][0][1]])
+                    window, window_tokens = [], 0
+                chunks.extend(self._oversized(text[span[0]:span[1]]))
+                continue
+            if window and window_tokens + count > self.chunk_size:
+                chunks.append(text[window[0][0][0]:window[-1][0][1]])
+                # Keep trailing sentences as overlap, within the overlap budget
+                overlap, overlap_tokens = [], 0
+                for item in reversed(window):
+                    if overlap_tokens + item[1] > self.chunk_overlap:
+                        break
+                    overlap.insert(0, item)
+                    overlap_tokens += item[1]
+                # The overlap must leave room for the sentence that triggered the flush
+                while overlap and overlap_tokens + count > self.chunk_size:
+                    overlap_tokens -= overlap.pop(0)[1]
+                window, window_tokens = overlap, overlap_tokens
+            window.append((span, count))
+            window_tokens += count
+        if window:
+            chunks.append(text[window[0][0][0]:window[-1][0][1]])
+        return chunks
+
+    def iter_split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Stream chunks page by page, so callers can consume output while later pages are still loading.
+        """
+        for doc in documents:
+            for chunk in self.split_text(doc.page_content):
+                yield Document(page_content=chunk, metadata=dict(doc.metadata))
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        return list(self.iter_split_documents(documents))
+
+
+def build_splitter(retriever_config: dict) -> SentenceTokenSplitter:
+    """
+    Create the splitter from the `retriever` block of config.yaml (sizes in tokens).
+    """
+    return SentenceTokenSplitter(
+        chunk_size=retriever_config.get("chunk_size", 256),
+        chunk_overlap=retriever_config.get("chunk_overlap", 32),
+        encoding_name=retriever_config.get("tokenizer", "cl100k_base"),
+    )
+
+
+if __name__ == "__main__":
+    # Benchmark against the previous RecursiveCharacterTextSplitter(1000, 300) on a PDF repeated to N pages:
+    #   python -m utils.text_splitter <file.pdf> [pages]
+    import sys
+    import time
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from utils.document_loaders import load_documents
+
+    pages = load_documents([sys.argv[1]])
+    target = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    corpus = [pages[i % len(pages)] for i in range(target)]
+    token_splitter = SentenceTokenSplitter(256, 32)
+
+    for name, splitter in (
+        ("recursive_char(1000, 300)", RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=300)),
+        ("sentence_token(256, 32)", token_splitter),
+    ):
+        start = time.process_time()
+        chunks = splitter.split_documents(corpus)
+        cpu = time.process_time() - start
+        tokens = sum(token_splitter._count_tokens([c.page_content for c in chunks]))
+        print(f"{name:28s} pages={len(corpus)} chunks={len(chunks)} embedded_tokens={tokens} cpu_seconds={cpu:.3f}")
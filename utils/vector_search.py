@@ -0,0 +1,85 @@
+from typing import List, Optional
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from utils.sharded_index import ShardedFaissIndex
+from utils.document_router import RoutedFaissIndex
+
+
+def get_vectorstore(retriever):
+    """
+    Return the vector store behind a retriever, or None when it cannot be split into embed/search steps.
+    """
+    vectorstore = getattr(retriever, "vectorstore", None)
+    if vectorstore is None or getattr(vectorstore, "embeddings", None) is None:
+        return None
+    if getattr(retriever, "search_type", "similarity") not in ("similarity", "mmr"):
+        return None
+    return vectorstore
+
+
+def embed_query(retriever, query: str) -> List[float]:
+    return get_vectorstore(retriever).embeddings.embed_query(query)
+
+
+def search_by_vector(retriever, vector: List[float], k: Optional[int] = None) -> List[Document]:
+    """
+    Run the retriever's configured search for an already embedded query.
+    """
+    vectorstore = get_vectorstore(retriever)
+    search_kwargs = dict(getattr(retriever, "search_kwargs", {}) or {})
+    k = k or search_kwargs.pop("k", 4)
+    search_kwargs.pop("k", None)
+    if getattr(retriever, "search_type", "similarity") == "mmr":
+        return vectorstore.max_marginal_relevance_search_by_vector(vector, k=k, **search_kwargs)
+    return vectorstore.similarity_search_by_vector(vector, k=k, **search_kwargs)
+
+
+def embed_queries(retriever, queries: List[str]) -> List[List[float]]:
+    """
+    Embed many queries in one provider request.
+    """
+    return get_vectorstore(retriever).embeddings.embed_documents(list(queries))
+
+
+def _supports_batched_search(retriever, vectorstore, search_kwargs: dict) -> bool:
+    # One multi-query index.search matches similarity_search_by_vector only for plain top-k on a FAISS store
+    return (
+        getattr(retriever, "search_type", "similarity") == "similarity"
+        and hasattr(vectorstore, "index_to_docstore_id")
+        and hasattr(getattr(vectorstore, "index", None), "search")
+        and not search_kwargs
+    )
+
+
+def search_by_vectors(retriever, vectors: List[List[float]], k: Optional[int] = None) -> List[List[Document]]:
+    """
+    Run the retriever's search for many embedded queries. A FAISS store answers all of them with
+    a single vectorized index.search; other stores and MMR fall back to one search per query.
+    """
+    vectorstore = get_vectorstore(retriever)
+    search_kwargs = dict(getattr(retriever, "search_kwargs", {}) or {})
+    k = k or search_kwargs.pop("k", 4)
+    search_kwargs.pop("k", None)
+    if not vectors:
+        return []
+    if isinstance(vectorstore, (ShardedFaissIndex, RoutedFaissIndex)) and getattr(retriever, "search_type", "similarity") == "similarity":
+        return [vectorstore.documents(ids) for ids in vectorstore.search(vectors, k)]
+    if not _supports_batched_search(retriever, vectorstore, search_kwargs):
+        return [search_by_vector(retriever, vector, k) for vector in vectors]
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(matrix)
+    _, indices = vectorstore.index.search(matrix, k)
+    results = []
+    for row in indices:
+        docs = []
+        for i in row:
+            if i == -1:
+                continue
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(i)])
+            if isinstance(doc, Document):
+                docs.append(doc)
+        results.append(docs)
+    return results
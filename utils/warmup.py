@@ -0,0 +1,131 @@
+import time
+from pathlib import Path
+from typing import Optional
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.model_loader import ModelLoader
+from utils.index_cache import get_index_cache
+from utils.session_gc import last_access
+from utils.sharded_index import is_sharded_index, get_sharded_index
+from utils.instrumentation import span, set_readiness
+
+log = CustomLogger().get_logger(__name__)
+
+
+def recent_sessions(faiss_dir: str = "faiss_index", limit: int = 5) -> list[Path]:
+    """
+    The `limit` most recently used session indexes under faiss_dir.
+    """
+    root = Path(faiss_dir)
+    if not root.is_dir():
+        return []
+    sessions = []
+    for entry in root.iterdir():
+        if entry.name.startswith((".", "_")) or not ((entry / "index.faiss").exists() or is_sharded_index(entry)):
+            continue
+        try:
+            sessions.append((last_access(entry), entry))
+        except FileNotFoundError:
+            continue
+    return [entry for _, entry in sorted(sessions, reverse=True)[:limit]]
+
+
+def _warm_once(settings: dict, status: dict):
+    """
+    One warm-up pass; step failures are appended to status["errors"].
+    """
+    loader = ModelLoader()
+    embeddings = None
+    with span("warmup.clients"):
+        try:
+            embeddings = loader.load_embeddings()
+            llm = loader.load_llm()
+        except Exception as e:
+            status["errors"].append(f"clients: {e}")
+            llm = None
+
+    if settings.get("prime_requests", True):
+        with span("warmup.prime"):
+            if embeddings is not None:
+                try:
+                    embeddings.embed_query("warm-up")
+                except Exception as e:
+                    status["errors"].append(f"embeddings: {e}")
+            if llm is not None:
+                try:
+                    llm.invoke("Reply with OK.", max_tokens=1)
+                except Exception as e:
+                    status["errors"].append(f"llm: {e}")
+
+    if embeddings is not None:
+        with span("warmup.indexes") as s:
+            cache = get_index_cache()
+            for session_path in recent_sessions(settings.get("faiss_dir", "faiss_index"), settings.get("preload_sessions", 5)):
+                try:
+                    if is_sharded_index(session_path):
+                        vector_store_config = loader.config.get("vector_store", {})
+                        get_sharded_index(str(session_path), embeddings, mmap=vector_store_config.get("mmap_shards", False)).preload()
+                    else:
+                        cache.load(str(session_path), embeddings)
+                    status["preloaded_indexes"].append(session_path.name)
+                except Exception as e:
+                    status["errors"].append(f"index {session_path.name}: {e}")
+            s.record(chunks=len(status["preloaded_indexes"]))
+
+
+def warm_up(settings: Optional[dict] = None) -> dict:
+    """
+    Prepare a worker before it takes traffic: parse config, build the shared model clients,
+    send tiny priming requests so connections and TLS sessions are open, and deserialize the
+    most recently used session indexes into the index cache. A pass with errors is retried with
+    exponential backoff up to `max_attempts`; readiness (/ready on the metrics server) flips to
+    ready only after a clean pass, otherwise it reports "degraded" with the errors and /ready
+    keeps answering 503.
+    """
+    settings = settings if settings is not None else (load_config().get("warmup", {}) or {})
+    max_attempts = max(1, settings.get("max_attempts", 3))
+    delay = settings.get("retry_backoff_seconds", 2.0)
+    set_readiness(False, phase="warming")
+    start = time.perf_counter()
+
+    for attempt in range(1, max_attempts + 1):
+        status = {"preloaded_indexes": [], "errors": [], "attempts": attempt}
+        try:
+            with span("warmup"):
+                _warm_once(settings, status)
+        except Exception as e:
+            # e.g. ModelLoader without API keys: report it instead of leaving readiness at "warming"
+            status["errors"].append(f"warmup: {e}")
+        if not status["errors"] or attempt == max_attempts:
+            break
+        log.warning("Warm-up incomplete, retrying", attempt=attempt, errors=status["errors"], retry_in_seconds=delay)
+        set_readiness(False, phase="warming", **status)
+        time.sleep(delay)
+        delay = min(delay * 2, settings.get("max_backoff_seconds", 30.0))
+
+    status["seconds"] = round(time.perf_counter() - start, 3)
+    ready = not status["errors"]
+    set_readiness(ready, phase="warm" if ready else "degraded", **status)
+    if ready:
+        log.info("Warm-up complete", **status)
+    else:
+        log.error("Warm-up failed, worker reports degraded", **status)
+    return status
+
+
+if __name__ == "__main__":
+    # Run the warm-up on its own, e.g. to measure it:  python -m utils.warmup
+    # With --serve, keep serving /metrics and /ready on the given port afterwards.
+    import argparse
+    import threading
+    from utils.instrumentation import start_metrics_server
+
+    parser = argparse.ArgumentParser(description="Warm up model clients and hot FAISS indexes.")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT")
+    args = parser.parse_args()
+
+    if args.serve:
+        start_metrics_server(args.serve)
+    print(warm_up())
+    if args.serve:
+        threading.Event().wait()